@@ -5,10 +5,33 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
 
 from lava.models.models import Permission
-from lava.settings import ALLOW_EMAIL_AUTHENTICATION, ALLOW_USERNAME_AUTHENTICATION
+from lava.services.permission_cache import permission_cache
+from lava.settings import (
+    ALLOW_EMAIL_AUTHENTICATION,
+    ALLOW_USERNAME_AUTHENTICATION,
+    PERMISSION_CACHE_ENABLED,
+)
 
 
 class BaseModelBackEnd(ModelBackend):
+    def get_all_permissions(self, user_obj, obj=None):
+        if (
+            not PERMISSION_CACHE_ENABLED
+            or not user_obj.is_active
+            or user_obj.is_anonymous
+            or obj is not None
+            or hasattr(user_obj, "_perm_cache")
+        ):
+            return super().get_all_permissions(user_obj, obj=obj)
+
+        def get_permissions():
+            return super(BaseModelBackEnd, self).get_all_permissions(user_obj)
+
+        # The permission set is shared between requests, django's `_perm_cache`
+        # only lives as long as the user instance.
+        user_obj._perm_cache = permission_cache.get_or_set(user_obj, get_permissions)
+        return user_obj._perm_cache
+
     def _get_group_permissions(self, user_obj):
         user_groups_field = get_user_model()._meta.get_field("groups")
         user_groups_query = "group__group__%s" % user_groups_field.related_query_name()
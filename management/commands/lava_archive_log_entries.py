@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from lava import settings as lava_settings
+from lava.services.log_entry_archive import archive_log_entries
+
+
+class Command(BaseCommand):
+    help = """
+        Moves the months of log entries older than the retention period to
+        compressed JSON lines files in LOG_ENTRY_ARCHIVE_ROOT. The archived
+        entries are still returned by the journal searches that reach into
+        their months.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-months",
+            nargs="?",
+            default=lava_settings.LOG_ENTRY_RETENTION_MONTHS,
+            type=int,
+            help=(
+                "Number of months kept in the database, the current month "
+                "included, defaults to LOG_ENTRY_RETENTION_MONTHS."
+            ),
+        )
+        parser.add_argument(
+            "-batch-size",
+            nargs="?",
+            default=lava_settings.LOG_ENTRY_ARCHIVE_BATCH_SIZE,
+            type=int,
+            help=(
+                "Number of entries read and deleted at a time, defaults to "
+                "LOG_ENTRY_ARCHIVE_BATCH_SIZE."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["months"] < 1:
+            self.stderr.write("At least one month must be kept in the database.")
+            return
+
+        archives = archive_log_entries(
+            months=options["months"], batch_size=options["batch_size"]
+        )
+        for archive in archives:
+            self.stdout.write(f"{archive.file_name}: {archive.entries_count} entries")
+        self.stdout.write(f"{len(archives)} months archived.")
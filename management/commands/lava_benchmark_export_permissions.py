@@ -0,0 +1,79 @@
+import random
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from lava.models import Group, Permission
+from lava.services.import_export import export_permissions
+
+
+class Command(BaseCommand):
+    help = """
+        Times the export of the permissions matrix. The benchmark permissions
+        and groups are created in a transaction that is rolled back at the end,
+        the database is left unchanged.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-permissions",
+            nargs="?",
+            default=500,
+            type=int,
+            help="Number of permissions to create, defaults to 500.",
+        )
+        parser.add_argument(
+            "-groups",
+            nargs="?",
+            default=100,
+            type=int,
+            help="Number of groups to create, defaults to 100.",
+        )
+        parser.add_argument(
+            "-ratio",
+            nargs="?",
+            default=0.3,
+            type=float,
+            help="Probability for a group to have a permission, defaults to 0.3.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_data(options)
+
+            start = time.perf_counter()
+            result = export_permissions()
+            duration = time.perf_counter() - start
+            self.stdout.write(
+                f"{Permission.objects.count()} permissions x "
+                f"{Group.objects.count()} groups exported in {duration:.2f} s: "
+                f"{result.instance}"
+            )
+
+            transaction.set_rollback(True)
+
+    def create_data(self, options):
+        suffix = timezone.now().strftime("%Y%m%d%H%M%S")
+        content_type = ContentType.objects.get_for_model(Group)
+        permissions = Permission.objects.bulk_create(
+            [
+                Permission(
+                    name=f"Benchmark permission {index}",
+                    codename=f"benchmark_{suffix}_{index}",
+                    content_type=content_type,
+                )
+                for index in range(options["permissions"])
+            ]
+        )
+        for index in range(options["groups"]):
+            group = Group.objects.create(name=f"Benchmark {suffix} {index}")
+            group.permissions.add(
+                *[
+                    permission
+                    for permission in permissions
+                    if random.random() < options["ratio"]
+                ]
+            )
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lava.models import User
+from lava.views.api_views.base_api_views import BaseModelViewSet
+
+
+class BenchmarkUserViewSet(BaseModelViewSet):
+    queryset = User.objects.none()
+
+
+class Command(BaseCommand):
+    help = """
+        Times `get_permissions()` of a model viewset over many requests, the
+        cost of a call must be the same at the end as at the start. No database
+        query is made.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-requests",
+            nargs="?",
+            default=100000,
+            type=int,
+            help="Number of requests to simulate, defaults to 100000.",
+        )
+        parser.add_argument(
+            "-sample",
+            nargs="?",
+            default=1000,
+            type=int,
+            help=(
+                "Number of requests timed at the start and at the end, "
+                "defaults to 1000."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        requests = options["requests"]
+        sample = min(options["sample"], requests)
+        class_permissions = len(BenchmarkUserViewSet.permission_classes)
+
+        first_cost = self.run(sample)
+        self.run(requests - 2 * sample)
+        last_cost = self.run(sample)
+
+        self.stdout.write(
+            f"get_permissions() per request: {first_cost * 1e6:.2f} us for the "
+            f"first {sample} requests, {last_cost * 1e6:.2f} us for the last "
+            f"{sample} of {requests} requests."
+        )
+        self.stdout.write(
+            f"Permission classes of the viewset: {class_permissions} before, "
+            f"{len(BenchmarkUserViewSet.permission_classes)} after."
+        )
+
+    def run(self, requests):
+        """Returns the average duration of a request in seconds."""
+        if requests <= 0:
+            return 0
+
+        start = time.perf_counter()
+        for _ in range(requests):
+            view = BenchmarkUserViewSet()
+            view.action = "list"
+            view.get_permissions()
+        return (time.perf_counter() - start) / requests
@@ -0,0 +1,176 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from lava import settings as lava_settings
+from lava.models import (
+    ChatMessage,
+    Conversation,
+    MessageReceipt,
+    Preferences,
+    User,
+)
+
+
+class Command(BaseCommand):
+    help = """
+        Compares the unread messages counts when the read receipts are stored in
+        ChatMessage.read_by ("json") and in the MessageReceipt table ("table").
+        The benchmark data is created in a transaction that is rolled back at
+        the end, the database is left unchanged.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-messages",
+            nargs="?",
+            default=1000000,
+            type=int,
+            help="Number of messages to create, defaults to 1000000.",
+        )
+        parser.add_argument(
+            "-conversations",
+            nargs="?",
+            default=1000,
+            type=int,
+            help="Number of conversations to create, defaults to 1000.",
+        )
+        parser.add_argument(
+            "-users",
+            nargs="?",
+            default=5,
+            type=int,
+            help="Number of members of each conversation, defaults to 5.",
+        )
+        parser.add_argument(
+            "-read-ratio",
+            nargs="?",
+            default=0.9,
+            type=float,
+            help="Probability for a message to be read by a member, defaults to 0.9.",
+        )
+        parser.add_argument(
+            "-repeat",
+            nargs="?",
+            default=5,
+            type=int,
+            help="Number of times each query is timed, defaults to 5.",
+        )
+
+    def handle(self, *args, **options):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(
+                "This benchmark requires a database that returns the primary keys "
+                "of bulk inserts, eg: PostgreSQL."
+            )
+
+        storage = lava_settings.READ_RECEIPTS_STORAGE
+        try:
+            with transaction.atomic():
+                user, conversations = self.create_data(options)
+                if connection.vendor == "postgresql":
+                    with connection.cursor() as cursor:
+                        cursor.execute("ANALYZE")
+
+                for mode in ["json", "table"]:
+                    lava_settings.READ_RECEIPTS_STORAGE = mode
+                    self.run_benchmark(mode, user, conversations, options["repeat"])
+
+                transaction.set_rollback(True)
+        finally:
+            lava_settings.READ_RECEIPTS_STORAGE = storage
+
+    def create_data(self, options):
+        batch_size = 5000
+        suffix = timezone.now().strftime("%Y%m%d%H%M%S")
+
+        preferences = Preferences.objects.bulk_create(
+            [Preferences() for _ in range(options["users"])]
+        )
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=f"benchmark_{suffix}_{index}",
+                    email=f"benchmark_{suffix}_{index}@example.com",
+                    preferences=user_preferences,
+                )
+                for index, user_preferences in enumerate(preferences)
+            ]
+        )
+        members = {str(user.id): {"muted": False, "unmute_at": None} for user in users}
+        conversations = Conversation.objects.bulk_create(
+            [
+                Conversation(
+                    name=f"Benchmark {index}",
+                    is_group_conversation=True,
+                    members=members,
+                )
+                for index in range(options["conversations"])
+            ]
+        )
+        self.stdout.write(
+            f"Creating {options['messages']} messages in "
+            f"{len(conversations)} conversations..."
+        )
+
+        now = timezone.now()
+        read_at = now.strftime("%Y-%m-%d %H:%M:%S %z")
+        created = 0
+        while created < options["messages"]:
+            messages = []
+            readers = []
+            for index in range(min(batch_size, options["messages"] - created)):
+                sender = random.choice(users)
+                message_readers = [
+                    user
+                    for user in users
+                    if user != sender and random.random() < options["read_ratio"]
+                ]
+                messages.append(
+                    ChatMessage(
+                        sender=sender,
+                        conversation=random.choice(conversations),
+                        text="Benchmark message",
+                        type="text",
+                        created_at=now,
+                        read_by={str(user.id): read_at for user in message_readers},
+                    )
+                )
+                readers.append(message_readers)
+
+            ChatMessage.objects.bulk_create(messages)
+            MessageReceipt.objects.bulk_create(
+                [
+                    MessageReceipt(message=message, user=user, read_at=now)
+                    for message, message_readers in zip(messages, readers)
+                    for user in message_readers
+                ],
+                batch_size=batch_size,
+            )
+            created += len(messages)
+
+        return users[0], conversations
+
+    def run_benchmark(self, mode, user, conversations, repeat):
+        conversation = conversations[0]
+        queries = {
+            "unread counts of all the conversations": lambda: (
+                Conversation.get_unread_counts(conversations, user)
+            ),
+            "unread messages of one conversation": lambda: (
+                conversation.get_unread_messages(user).count()
+            ),
+        }
+        for name, query in queries.items():
+            durations = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                query()
+                durations.append(time.perf_counter() - start)
+            self.stdout.write(
+                f"[{mode}] {name}: {statistics.median(durations) * 1000:.2f} ms"
+            )
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lava.models import NotificationDelivery
+
+
+class Command(BaseCommand):
+    help = """
+        Sends the pending notification deliveries, including the failed ones
+        that are due for a retry. Run this command as a worker when the
+        NOTIFICATION_DISPATCH_BACKEND setting is "outbox" or "thread", the
+        latter losing the retries of the processes that are stopped.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-limit",
+            nargs="?",
+            default=100,
+            type=int,
+            help="Maximum number of deliveries processed at once, defaults to 100.",
+        )
+        parser.add_argument(
+            "-interval",
+            nargs="?",
+            default=None,
+            type=float,
+            help=(
+                "If set, the command runs until it is stopped and checks the "
+                "pending deliveries every `interval` seconds."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        limit = options["limit"]
+        interval = options["interval"]
+        while True:
+            total = count = NotificationDelivery.process_pending(limit=limit)
+            while count == limit:
+                count = NotificationDelivery.process_pending(limit=limit)
+                total += count
+
+            if interval is None:
+                self.stdout.write(f"{total} notification deliveries processed.")
+                break
+            time.sleep(interval)
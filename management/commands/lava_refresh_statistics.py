@@ -0,0 +1,43 @@
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from lava.services.statistics import refresh_statistics
+from lava.services.statistics_cache import statistics_cache
+
+
+class Command(BaseCommand):
+    help = """
+        Computes the dashboard statistics and stores them in the statistics
+        cache, so that the dashboard endpoints do not compute them.
+        STATISTICS_CACHE_BACKEND must be a cache shared with the server
+        processes (eg: Redis).
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-interval",
+            nargs="?",
+            default=None,
+            type=float,
+            help=(
+                "If set, the command runs until it is stopped and refreshes the "
+                "statistics every `interval` seconds."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if isinstance(statistics_cache.cache, LocMemCache):
+            raise CommandError(
+                f"The cache '{statistics_cache.backend}' is local to the process, "
+                "set STATISTICS_CACHE_BACKEND to a shared cache (eg: Redis)."
+            )
+
+        interval = options["interval"]
+        while True:
+            refresh_statistics()
+            if interval is None:
+                self.stdout.write("Statistics refreshed.")
+                break
+            time.sleep(interval)
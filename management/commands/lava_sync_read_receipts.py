@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from lava.services.read_receipts import sync_read_receipts
+
+
+class Command(BaseCommand):
+    help = """
+        Copies the read receipts of ChatMessage.read_by and Notification.seen_by
+        to the MessageReceipt and NotificationReceipt tables. The receipts are
+        only written to the storage in use, run this command right before
+        switching READ_RECEIPTS_STORAGE from "json" to "table".
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-batch-size",
+            nargs="?",
+            default=2000,
+            type=int,
+            help="Number of messages or notifications read at a time, defaults to 2000.",
+        )
+
+    def handle(self, *args, **options):
+        report = sync_read_receipts(batch_size=options["batch_size"])
+        for name, (created, deleted) in report.items():
+            self.stdout.write(
+                f"{name}: {created} receipts copied, {deleted} stale receipts deleted."
+            )
@@ -0,0 +1,162 @@
+import asyncio
+import random
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+
+from lava.models import ChatMessage, Conversation, Preferences, User
+from lava.ws.consumers import ChatConsumer
+
+
+class Command(BaseCommand):
+    help = """
+        Opens many chat WebSocket connections in the current process, makes
+        them send read receipts and reports the latency of the event loop
+        meanwhile. The benchmark data is deleted at the end.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-sockets",
+            nargs="?",
+            default=1000,
+            type=int,
+            help="Number of concurrent WebSocket connections, defaults to 1000.",
+        )
+        parser.add_argument(
+            "-receipts",
+            nargs="?",
+            default=10,
+            type=int,
+            help="Number of read receipts sent by each connection, defaults to 10.",
+        )
+        parser.add_argument(
+            "-messages",
+            nargs="?",
+            default=1000,
+            type=int,
+            help="Number of messages of the conversation, defaults to 1000.",
+        )
+        parser.add_argument(
+            "-in-memory",
+            action="store_true",
+            help="Use an in-memory channel layer instead of CHANNEL_LAYERS.",
+        )
+
+    def handle(self, *args, **options):
+        user, conversation = self.create_data(options["messages"])
+        try:
+            if options["in_memory"]:
+                channel_layers = {
+                    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+                }
+                with override_settings(CHANNEL_LAYERS=channel_layers):
+                    asyncio.run(self.run_load_test(user, conversation, options))
+            else:
+                asyncio.run(self.run_load_test(user, conversation, options))
+        finally:
+            users = User.objects.filter(pk__in=conversation.members.keys())
+            preferences_ids = list(users.values_list("preferences", flat=True))
+            conversation.delete(soft_delete=False)
+            users.delete()
+            Preferences.objects.filter(pk__in=preferences_ids).delete()
+
+    def create_data(self, messages_count):
+        suffix = timezone.now().strftime("%Y%m%d%H%M%S")
+        users = [
+            User.objects.create(
+                username=f"ws_load_test_{suffix}_{index}",
+                email=f"ws_load_test_{suffix}_{index}@example.com",
+                preferences=Preferences.objects.create(),
+            )
+            for index in range(2)
+        ]
+        user, sender = users
+        conversation = Conversation(
+            name=f"WebSocket load test {suffix}", is_group_conversation=True
+        )
+        conversation.create(sender, members=[user])
+        ChatMessage.objects.bulk_create(
+            [
+                ChatMessage(
+                    sender=sender,
+                    conversation=conversation,
+                    text="Load test message",
+                    type="text",
+                )
+                for _ in range(messages_count)
+            ]
+        )
+        return user, conversation
+
+    async def run_load_test(self, user, conversation, options):
+        message_ids = await sync_to_async(list)(
+            conversation.messages.values_list("pk", flat=True)
+        )
+        application = ChatConsumer.as_asgi()
+        scope = {
+            "type": "websocket",
+            "path": f"/ws/chat/{conversation.pk}/",
+            "headers": [],
+            "url_route": {"args": (), "kwargs": {"conversation_id": conversation.pk}},
+            "user": user,
+        }
+
+        lags = []
+        running = True
+
+        async def probe(interval=0.01):
+            while running:
+                start = time.perf_counter()
+                await asyncio.sleep(interval)
+                lags.append(time.perf_counter() - start - interval)
+
+        async def client():
+            communicator = ApplicationCommunicator(application, dict(scope))
+            await communicator.send_input({"type": "websocket.connect"})
+            response = await communicator.receive_output(timeout=60)
+            if response["type"] != "websocket.accept":
+                raise RuntimeError(f"Connection refused: {response}")
+
+            for message_id in random.sample(message_ids, options["receipts"]):
+                await communicator.send_input(
+                    {
+                        "type": "websocket.receive",
+                        "text": (
+                            '{"action": "mark_message_as_read", '
+                            f'"message_id": {message_id}}}'
+                        ),
+                    }
+                )
+                await asyncio.sleep(random.random() * 0.05)
+
+            for _ in range(options["receipts"]):
+                await communicator.receive_output(timeout=60)
+            await communicator.send_input(
+                {"type": "websocket.disconnect", "code": 1000}
+            )
+            await communicator.wait(timeout=60)
+
+        probe_task = asyncio.ensure_future(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*[client() for _ in range(options["sockets"])])
+        duration = time.perf_counter() - start
+        running = False
+        await probe_task
+
+        lags = sorted(lags)
+        self.stdout.write(
+            f"{options['sockets']} sockets, {options['receipts']} receipts each, "
+            f"in {duration:.2f} s"
+        )
+        self.stdout.write(
+            "Event loop latency: "
+            f"median {statistics.median(lags) * 1000:.2f} ms, "
+            f"p99 {lags[int(len(lags) * 0.99)] * 1000:.2f} ms, "
+            f"max {lags[-1] * 1000:.2f} ms"
+        )
@@ -0,0 +1,134 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:28
+
+from datetime import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+BATCH_SIZE = 2000
+
+
+def copy_read_receipts(apps, schema_editor):
+    """
+    Copies the read receipts stored in ChatMessage.read_by and
+    Notification.seen_by to the receipt tables.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    ChatMessage = apps.get_model("lava", "ChatMessage")
+    MessageReceipt = apps.get_model("lava", "MessageReceipt")
+    Notification = apps.get_model("lava", "Notification")
+    NotificationReceipt = apps.get_model("lava", "NotificationReceipt")
+
+    user_ids = set(User.objects.values_list("id", flat=True))
+
+    receipts = []
+    messages = ChatMessage.objects.values_list("id", "read_by", "created_at")
+    for message_id, read_by, created_at in messages.iterator(chunk_size=BATCH_SIZE):
+        for user_id, read_at in (read_by or {}).items():
+            if not user_id.isdigit() or int(user_id) not in user_ids:
+                continue
+            try:
+                read_at = datetime.strptime(read_at, "%Y-%m-%d %H:%M:%S %z")
+            except (TypeError, ValueError):
+                read_at = created_at or django.utils.timezone.now()
+            receipts.append(
+                MessageReceipt(message_id=message_id, user_id=int(user_id), read_at=read_at)
+            )
+        if len(receipts) >= BATCH_SIZE:
+            MessageReceipt.objects.bulk_create(receipts, ignore_conflicts=True)
+            receipts = []
+    MessageReceipt.objects.bulk_create(receipts, ignore_conflicts=True)
+
+    receipts = []
+    notifications = Notification.objects.values_list("id", "seen_by", "date")
+    for notification_id, seen_by, date in notifications.iterator(chunk_size=BATCH_SIZE):
+        for user_id in seen_by or []:
+            if user_id not in user_ids:
+                continue
+            receipts.append(
+                NotificationReceipt(
+                    notification_id=notification_id, user_id=user_id, read_at=date
+                )
+            )
+        if len(receipts) >= BATCH_SIZE:
+            NotificationReceipt.objects.bulk_create(receipts, ignore_conflicts=True)
+            receipts = []
+    NotificationReceipt.objects.bulk_create(receipts, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lava', '0005_alter_bankaccount_iban'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Read at')),
+            ],
+            options={
+                'verbose_name': 'Message receipt',
+                'verbose_name_plural': 'Message receipts',
+                'default_permissions': (),
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Read at')),
+            ],
+            options={
+                'verbose_name': 'Notification receipt',
+                'verbose_name_plural': 'Notification receipts',
+                'default_permissions': (),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['conversation', 'created_at'], name='lava_chatmsg_conv_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationreceipt',
+            name='notification',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='lava.notification', verbose_name='Notification'),
+        ),
+        migrations.AddField(
+            model_name='notificationreceipt',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_receipts', to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.AddField(
+            model_name='messagereceipt',
+            name='message',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='lava.chatmessage', verbose_name='Message'),
+        ),
+        migrations.AddField(
+            model_name='messagereceipt',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='message_receipts', to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationreceipt',
+            index=models.Index(fields=['user', 'notification'], name='lava_notifreceipt_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationreceipt',
+            constraint=models.UniqueConstraint(fields=('notification', 'user'), name='lava_notifreceipt_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='messagereceipt',
+            index=models.Index(fields=['user', 'message'], name='lava_msgreceipt_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='messagereceipt',
+            constraint=models.UniqueConstraint(fields=('message', 'user'), name='lava_msgreceipt_unique'),
+        ),
+        migrations.RunPython(copy_read_receipts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_conversation_activity(apps, schema_editor):
+    """
+    Sets the last message, the last activity date and the unread messages
+    counters of the existing conversations.
+    """
+    Conversation = apps.get_model("lava", "Conversation")
+    ChatMessage = apps.get_model("lava", "ChatMessage")
+
+    conversations = Conversation.objects.all()
+    for conversation in conversations.iterator(chunk_size=500):
+        messages = ChatMessage.objects.filter(
+            conversation=conversation, deleted_at__isnull=True
+        ).order_by("created_at")
+        unread_counts = {member_id: 0 for member_id in conversation.members.keys()}
+        last_message = None
+        rows = messages.values_list("id", "sender_id", "read_by", "created_at")
+        for message_id, sender_id, read_by, created_at in rows.iterator():
+            last_message = (message_id, created_at)
+            for member_id in unread_counts:
+                if member_id != str(sender_id) and member_id not in (read_by or {}):
+                    unread_counts[member_id] += 1
+
+        Conversation.objects.filter(pk=conversation.pk).update(
+            last_message_id=last_message[0] if last_message else None,
+            last_activity_at=last_message[1] if last_message else None,
+            unread_counts=unread_counts,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lava', '0006_read_receipts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last activity at'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='lava.chatmessage', verbose_name='Last message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='unread_counts',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Unread counts'),
+        ),
+        migrations.RunPython(fill_conversation_activity, migrations.RunPython.noop),
+    ]
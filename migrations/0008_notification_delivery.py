@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lava', '0007_conversation_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('websocket', 'WebSocket'), ('firebase', 'Firebase')], max_length=16, verbose_name='Channel')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=16, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('last_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='Last attempt at')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next attempt at')),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='lava.notification', verbose_name='Notification')),
+            ],
+            options={
+                'verbose_name': 'Notification delivery',
+                'verbose_name_plural': 'Notification deliveries',
+                'default_permissions': (),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notificationdelivery',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='lava_notifdelivery_due_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import lava.utils.handle_upload_filenames
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lava', '0008_notification_delivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export_type', models.CharField(choices=[('activity_journal', 'Activity journal')], max_length=32, verbose_name='Export type')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Parameters')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=16, verbose_name='Status')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Processed rows')),
+                ('total', models.PositiveIntegerField(blank=True, null=True, verbose_name='Total rows')),
+                ('export_file', models.FileField(blank=True, null=True, upload_to=lava.utils.handle_upload_filenames.get_export_file_filename, verbose_name='Export file')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished at')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Export job',
+                'verbose_name_plural': 'Export jobs',
+                'ordering': ('-created_at',),
+                'default_permissions': (),
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+# The journal is filtered by user, content type and date and ordered by date,
+# the indexes are created on the table of Django's admin LogEntry model which
+# holds these fields.
+LOG_ENTRY_INDEXES = [
+    models.Index(fields=["action_time"], name="lava_logentry_time_idx"),
+    models.Index(fields=["user", "action_time"], name="lava_logentry_user_time_idx"),
+    models.Index(
+        fields=["content_type", "action_time"], name="lava_logentry_ctype_time_idx"
+    ),
+]
+
+
+def add_log_entry_indexes(apps, schema_editor):
+    LogEntry = apps.get_model("admin", "LogEntry")
+    for index in LOG_ENTRY_INDEXES:
+        schema_editor.add_index(LogEntry, index)
+
+
+def remove_log_entry_indexes(apps, schema_editor):
+    LogEntry = apps.get_model("admin", "LogEntry")
+    for index in LOG_ENTRY_INDEXES:
+        schema_editor.remove_index(LogEntry, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("admin", "0003_logentry_add_action_flag_choices"),
+        ("lava", "0009_export_job"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_log_entry_indexes, remove_log_entry_indexes),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lava', '0010_logentry_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogEntryArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(unique=True, verbose_name='Period start')),
+                ('period_end', models.DateTimeField(verbose_name='Period end')),
+                ('file_name', models.CharField(max_length=128, verbose_name='File name')),
+                ('entries_count', models.PositiveIntegerField(default=0, verbose_name='Entries count')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('last_updated_at', models.DateTimeField(auto_now=True, verbose_name='Last updated at')),
+            ],
+            options={
+                'verbose_name': 'Log entries archive',
+                'verbose_name_plural': 'Log entries archives',
+                'ordering': ('-period_start',),
+                'default_permissions': (),
+            },
+        ),
+    ]
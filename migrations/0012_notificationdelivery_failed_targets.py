@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lava', '0011_log_entry_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationdelivery',
+            name='failed_targets',
+            field=models.JSONField(blank=True, default=list, verbose_name='Failed targets'),
+        ),
+    ]
@@ -5,11 +5,15 @@ from .models import (
     Preferences,
     Permission,
     LogEntry,
+    LogEntryArchive,
     Backup,
     BackupConfig,
     NotificationGroup,
+    NotificationReceipt,
+    NotificationDelivery,
+    ExportJob,
 )
 from .base_models import BaseModel, BaseModelMixin
 from .utility_models import Address, FileDocument
 from .organization_models import Account, Bank, BankAccount, Entity
-from .chat_models import ChatMessage, Conversation
+from .chat_models import ChatMessage, Conversation, MessageReceipt
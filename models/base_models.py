@@ -1,14 +1,29 @@
 import json
+from copy import deepcopy
 from datetime import datetime
+from functools import lru_cache
 import io
 import os
 import re
 
 from django.contrib.admin.models import DELETION, CHANGE, ADDITION
+from django.core.exceptions import FieldDoesNotExist
 from django.core.files import File
 from django.core.files.base import ContentFile
-from django.db import models
-from django.db.models import Q, ForeignKey, ManyToManyField, OneToOneField, FileField
+from django.db import models, connections, transaction
+from django.db.models import (
+    Q,
+    F,
+    Func,
+    Value,
+    ForeignKey,
+    ManyToManyField,
+    OneToOneField,
+    FileField,
+    ProtectedError,
+)
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Cast
 from django.contrib.admin.options import get_content_type_for_model
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
@@ -19,6 +34,78 @@ from lava.enums import DeletePolicy
 from lava.error_codes import NOT_CREATED_ERROR_CODE, REQUIRED_ERROR_CODE
 from lava.utils import Result
 from lava import settings as lava_settings
+from lava.services.audit_log import get_audit_log_writer
+from lava.services.statistics_cache import statistics_cache
+
+
+@lru_cache(maxsize=None)
+def _get_snapshot_index(model):
+    return {
+        field.attname: index
+        for index, field in enumerate(model._meta.concrete_fields)
+    }
+
+
+def _get_snapshot_value(instance, field):
+    value = getattr(instance, field.attname)
+    if isinstance(value, FieldFile):
+        return value.name
+    return value
+
+
+class _SerializedValue(str):
+    """JSON of a mutable value (JSON fields) stored in a snapshot."""
+
+    __slots__ = ()
+
+
+class JSONBConcat(Func):
+    """Merges jsonb values using the PostgreSQL `||` operator."""
+
+    arg_joiner = " || "
+    template = "(%(expressions)s)"
+    output_field = models.JSONField()
+
+
+class _Missing:
+    pass
+
+
+class ModelSnapshot:
+    """
+    Holds the values of the concrete fields of an instance as they are stored in
+    the database, so that the changes made to the instance can be computed
+    without fetching it again.
+    """
+
+    __slots__ = ("index", "values")
+
+    def __init__(self, model):
+        self.index = _get_snapshot_index(model)
+        self.values = [_Missing] * len(self.index)
+
+    def update(self, instance, fields):
+        for field in fields:
+            value = _get_snapshot_value(instance, field)
+            if isinstance(value, (dict, list)):
+                # Mutable values may be modified in place, they are serialized
+                # rather than copied as they are rarely read back.
+                try:
+                    value = _SerializedValue(
+                        json.dumps(value, cls=getattr(field, "encoder", None))
+                    )
+                except TypeError:
+                    value = deepcopy(value)
+            self.values[self.index[field.attname]] = value
+
+    def has(self, attname):
+        return self.values[self.index[attname]] is not _Missing
+
+    def get(self, attname):
+        value = self.values[self.index[attname]]
+        if isinstance(value, _SerializedValue):
+            return json.loads(value)
+        return value
 
 
 class BaseModelMixin:
@@ -29,6 +116,9 @@ class BaseModelMixin:
     duplicate_success_message = _("Object duplicated successfully.")
     restore_success_message = _("The object has been restored successfully.")
     default_delete_policy = DeletePolicy.SOFT_DELETE
+    soft_delete_change_message = "Deletion"
+    restore_change_message = "Restoration"
+    bulk_batch_size = lava_settings.BULK_ACTION_BATCH_SIZE
     excerpt_field_names = []
 
     def get_url(self):
@@ -119,7 +209,9 @@ class BaseModelMixin:
         if soft_delete:
             self.deleted_at = timezone.now()
             res = self.update(
-                user=user, update_fields=["deleted_at"], message="Deletion"
+                user=user,
+                update_fields=["deleted_at"],
+                message=self.soft_delete_change_message,
             )
             if res.is_error:
                 return res
@@ -184,40 +276,127 @@ class BaseModelMixin:
 
         self.deleted_at = None
         result = self.update(
-            user=user, update_fields=["deleted_at"], message="Restoration"
+            user=user,
+            update_fields=["deleted_at"],
+            message=self.restore_change_message,
         )
         if result.is_error:
             return result
 
         return Result.success(self.get_result_message("restore"))
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.take_snapshot()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.take_snapshot(kwargs.get("update_fields"))
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self.take_snapshot(fields)
+
+    def take_snapshot(self, field_names=None):
+        """
+        Stores the current values of the given fields (all the loaded fields by
+        default) as the values saved in the database.
+        """
+        snapshot = self.__dict__.get("_snapshot")
+        if snapshot is None:
+            snapshot = self._snapshot = ModelSnapshot(self._meta.concrete_model)
+
+        deferred_fields = self.get_deferred_fields()
+        snapshot.update(
+            self,
+            [
+                field
+                for field in self._meta.concrete_fields
+                if field.attname not in deferred_fields
+                and (
+                    field_names is None
+                    or field.name in field_names
+                    or field.attname in field_names
+                )
+            ],
+        )
+
+    def _get_old_related_object(self, field, old_self, value):
+        if old_self is not None:
+            return getattr(old_self, field.name, None)
+        if value is None:
+            return None
+        return field.related_model._base_manager.filter(
+            **{field.target_field.attname: value}
+        ).first()
+
     def get_changed_message(self, m2m_fields=None, update_fields=None):
 
         m2m_fields = m2m_fields or []
 
         changed_message = {"fields": {}}
         klass = self.__class__
-        old_self = klass.get_all_items().get(pk=self.pk)
         m2m_fields_dict = {}
         for m2mfield in m2m_fields:
             m2m_fields_dict[m2mfield[0]] = m2mfield[1]
 
-        for field in klass._meta.get_fields(include_parents=True):
-
-            field_name = field.name
-            if update_fields is not None and field_name not in update_fields:
-                continue
+        fields = [
+            field
+            for field in klass._meta.get_fields(include_parents=True)
+            if update_fields is None or field.name in update_fields
+        ]
 
-            old_value = getattr(old_self, field_name, None)
-            new_value = getattr(self, field_name, None)
+        # The old values are read from the snapshot taken when the object was
+        # loaded or saved, the object is only fetched again when there is none.
+        snapshot = self.__dict__.get("_snapshot")
+        old_self = None
+        if snapshot is None or not all(
+            snapshot.has(field.attname)
+            for field in fields
+            if field.concrete and not field.many_to_many
+        ):
+            old_self = klass.get_all_items().get(pk=self.pk)
 
-            if type(field) == ForeignKey:
-                old_value = f"{old_value.id}|{old_value}" if old_value else None
-                new_value = f"{new_value.id}|{new_value}" if new_value else None
+        for field in fields:
 
-            if type(field) == ManyToManyField and field_name in m2m_fields_dict:
+            field_name = field.name
+            if type(field) == ManyToManyField:
+                if field_name not in m2m_fields_dict:
+                    continue
+                new_value = getattr(self, field_name)
                 old_value = list(new_value.all().values_list("pk", flat=True))
                 new_value = [item.pk for item in m2m_fields_dict[field_name]]
+            elif not field.concrete or field.many_to_many:
+                # Reverse relations are not stored on the object.
+                continue
+            else:
+                if old_self is None:
+                    old_value = snapshot.get(field.attname)
+                else:
+                    old_value = _get_snapshot_value(old_self, field)
+                new_value = _get_snapshot_value(self, field)
+                if old_value == new_value:
+                    continue
+
+                # Related objects are only fetched for the changed fields.
+                if field.is_relation:
+                    old_object = self._get_old_related_object(
+                        field, old_self, old_value
+                    )
+                    new_object = getattr(self, field_name, None)
+                    if type(field) == ForeignKey:
+                        old_value = (
+                            f"{old_object.id}|{old_object}" if old_object else None
+                        )
+                        new_value = (
+                            f"{new_object.id}|{new_object}" if new_object else None
+                        )
+                    else:
+                        old_value, new_value = old_object, new_object
+                elif isinstance(field, FileField):
+                    old_value, new_value = old_value or "", new_value or ""
 
             if old_value != new_value:
                 changed_message["fields"][field_name] = {
@@ -231,15 +410,17 @@ class BaseModelMixin:
         if not user:
             return
 
-        from lava.models.models import LogEntry
-
-        LogEntry.objects.log_action(
-            user_id=user.pk,
-            content_type_id=get_content_type_for_model(self).pk,
-            object_id=self.pk,
-            object_repr=str(self),
-            action_flag=action_flag,
-            change_message=change_message,
+        # The entry is written by the AUDIT_LOG_WRITER_BACKEND writer, which may
+        # insert it after the current transaction is committed.
+        get_audit_log_writer().write(
+            {
+                "user_id": user.pk,
+                "content_type_id": get_content_type_for_model(self).pk,
+                "object_id": self.pk,
+                "object_repr": str(self),
+                "action_flag": action_flag,
+                "change_message": change_message,
+            }
         )
 
     def get_result_message(self, action):
@@ -257,40 +438,280 @@ class BaseModelMixin:
 
     @classmethod
     def bulk_delete(cls, queryset, user=None, **kwargs):
-        errors = {}
-        soft_delete = not kwargs.get("trash", False)
-        for obj in queryset:
-            result = obj.delete(user, soft_delete=soft_delete)
-            if result.is_error:
-                errors[str(obj)] = result.message
+        """
+        Deletes the objects of the queryset using one UPDATE (soft delete) or
+        DELETE (hard delete) statement per batch, and logs the action for all the
+        objects of the batch at once.
+
+        Models that override `delete()` are deleted one object at a time, unless
+        they also override `prepare_bulk_soft_delete()` to replicate their custom
+        behaviour on a whole batch.
+        """
+        soft_delete = (
+            not kwargs.get("trash", False)
+            and cls.default_delete_policy == DeletePolicy.SOFT_DELETE
+        )
+
+        supports_bulk_soft_delete = cls._supports_bulk_action(
+            "delete", "prepare_bulk_soft_delete"
+        )
+        if soft_delete and supports_bulk_soft_delete:
+            count, errors = cls._bulk_soft_delete(queryset, user)
+        elif not soft_delete and not cls._is_overridden("delete"):
+            count, errors = cls._bulk_hard_delete(queryset, user)
+        else:
+            count, errors = cls._bulk_apply(
+                queryset, "delete", user=user, soft_delete=soft_delete
+            )
+
+        # The bulk statements do not send the signals that invalidate the
+        # dashboard statistics.
+        if count:
+            statistics_cache.invalidate_model(cls)
 
         if errors:
             return Result.error(_("Some objects were not deleted."), errors=errors)
 
         return Result.success(
-            _(
-                "%(count)s objects have been deleted successfully."
-                % {"count": queryset.count()}
-            )
+            _("%(count)s objects have been deleted successfully.") % {"count": count}
         )
 
     @classmethod
     def bulk_restore(cls, queryset, user=None, **kwargs):
+        """
+        Restores the objects of the queryset using one UPDATE statement per batch.
+        Models that override `restore()` are restored one object at a time, unless
+        they also override `prepare_bulk_restore()`.
+        """
+        if cls._supports_bulk_action("restore", "prepare_bulk_restore"):
+            count, errors = cls._bulk_restore(queryset, user)
+        else:
+            count, errors = cls._bulk_apply(queryset, "restore", user=user)
+
+        if count:
+            statistics_cache.invalidate_model(cls)
+
+        if errors:
+            return Result.error(_("Some objects were not restored."), errors=errors)
+
+        return Result.success(
+            _("%(count)s objects have been restored successfully.") % {"count": count}
+        )
+
+    @classmethod
+    def prepare_bulk_soft_delete(cls, objects, deleted_at):
+        """
+        Applies the soft deletion side effects of `delete()` on a batch of objects
+        in memory, and returns the names of the fields that must be saved in
+        addition to `deleted_at`.
+        """
+        return []
+
+    @classmethod
+    def prepare_bulk_restore(cls, objects):
+        """
+        Applies the side effects of `restore()` on a batch of objects in memory,
+        and returns the names of the fields that must be saved in addition to
+        `deleted_at`.
+        """
+        return []
+
+    @classmethod
+    def _is_overridden(cls, method_name):
+        method = getattr(cls, method_name)
+        base_method = getattr(BaseModelMixin, method_name)
+        return getattr(method, "__func__", method) is not getattr(
+            base_method, "__func__", base_method
+        )
+
+    @classmethod
+    def _supports_bulk_action(cls, method_name, prepare_method_name):
+        try:
+            cls._meta.get_field("deleted_at")
+        except FieldDoesNotExist:
+            return False
+        return not cls._is_overridden(method_name) or cls._is_overridden(
+            prepare_method_name
+        )
+
+    @classmethod
+    def _iter_bulk_batches(cls, queryset):
+        """
+        Yields the objects of the queryset in batches of `bulk_batch_size`.
+        The primary keys are fetched first so that updating the rows does not
+        affect the batches that are not yet fetched.
+        """
+        model = queryset.model
+        pks = list(queryset.values_list("pk", flat=True))
+        for index in range(0, len(pks), cls.bulk_batch_size):
+            batch_pks = pks[index : index + cls.bulk_batch_size]
+            yield list(model._base_manager.filter(pk__in=batch_pks))
+
+    @classmethod
+    def _bulk_apply(cls, queryset, method_name, **kwargs):
+        count = 0
         errors = {}
         for obj in queryset:
-            result = obj.restore(user)
+            result = getattr(obj, method_name)(**kwargs)
             if result.is_error:
                 errors[str(obj)] = result.message
+            else:
+                count += 1
+        return count, errors
 
-        if errors:
-            return Result.error(_("Some objects were not restored."), errors=errors)
+    @classmethod
+    def _bulk_update_deleted_at(cls, objects, deleted_at, update_fields):
+        model = type(objects[0])
+        model._base_manager.filter(pk__in=[obj.pk for obj in objects]).update(
+            deleted_at=deleted_at
+        )
+        if update_fields:
+            model._base_manager.bulk_update(objects, update_fields)
 
-        return Result.success(
-            _(
-                "%(count)s objects have been restored successfully."
-                % {"count": queryset.count()}
+    @classmethod
+    def _bulk_soft_delete(cls, queryset, user=None):
+        count = 0
+        deleted_at = timezone.now()
+        for objects in cls._iter_bulk_batches(queryset):
+            # Objects that are already deleted are skipped, as `delete()` does.
+            objects = [obj for obj in objects if not obj.deleted_at]
+            if not objects:
+                continue
+
+            with transaction.atomic():
+                update_fields = cls.prepare_bulk_soft_delete(objects, deleted_at)
+                for obj in objects:
+                    obj.deleted_at = deleted_at
+                cls._bulk_update_deleted_at(objects, deleted_at, update_fields)
+                cls._bulk_log_action(
+                    objects, user, CHANGE, cls.soft_delete_change_message
+                )
+            count += len(objects)
+
+        return count, {}
+
+    @classmethod
+    def _bulk_restore(cls, queryset, user=None):
+        count = 0
+        errors = {}
+        for objects in cls._iter_bulk_batches(queryset):
+            deleted_objects = []
+            for obj in objects:
+                if obj.deleted_at:
+                    deleted_objects.append(obj)
+                else:
+                    errors[str(obj)] = _("Object is not deleted!")
+            if not deleted_objects:
+                continue
+
+            with transaction.atomic():
+                update_fields = cls.prepare_bulk_restore(deleted_objects)
+                for obj in deleted_objects:
+                    obj.deleted_at = None
+                cls._bulk_update_deleted_at(deleted_objects, None, update_fields)
+                cls._bulk_log_action(
+                    deleted_objects, user, CHANGE, cls.restore_change_message
+                )
+            count += len(deleted_objects)
+
+        return count, errors
+
+    @classmethod
+    def _bulk_hard_delete(cls, queryset, user=None):
+        count = 0
+        errors = {}
+        for objects in cls._iter_bulk_batches(queryset):
+            if not objects:
+                continue
+
+            model = type(objects[0])
+            try:
+                with transaction.atomic():
+                    cls._bulk_log_action(objects, user, DELETION)
+                    model._base_manager.filter(
+                        pk__in=[obj.pk for obj in objects]
+                    ).delete()
+                count += len(objects)
+                continue
+            except ProtectedError:
+                pass
+
+            # Some objects of the batch are protected, find them one by one.
+            for obj in objects:
+                try:
+                    with transaction.atomic():
+                        result = obj.delete(user, soft_delete=False)
+                except ProtectedError:
+                    result = Result.error(
+                        _("This object is referenced by other objects.")
+                    )
+                if result.is_error:
+                    errors[str(obj)] = result.message
+                else:
+                    count += 1
+
+        return count, errors
+
+    @classmethod
+    def _bulk_log_action(cls, objects, user, action_flag, change_message=""):
+        if not user or not objects:
+            return
+
+        from lava.models.models import LogEntry
+
+        content_type_id = get_content_type_for_model(objects[0]).pk
+        LogEntry.bulk_log_actions(
+            [
+                {
+                    "user_id": user.pk,
+                    "content_type_id": content_type_id,
+                    "object_id": obj.pk,
+                    "object_repr": str(obj),
+                    "action_flag": action_flag,
+                    "change_message": change_message,
+                }
+                for obj in objects
+            ],
+            batch_size=cls.bulk_batch_size,
+        )
+
+    @classmethod
+    def bulk_merge_json(cls, queryset, field_name, value):
+        """
+        Adds the keys of a dict `value` (or the items of a list `value`) to the
+        JSON field of the objects of the queryset that do not have them yet, and
+        returns the number of updated objects.
+
+        On PostgreSQL this is a single UPDATE statement using the jsonb `||`
+        operator, other backends use bulk_update.
+        """
+        is_dict = isinstance(value, dict)
+        if is_dict:
+            queryset = queryset.exclude(**{f"{field_name}__has_keys": list(value)})
+
+        if connections[queryset.db].vendor == "postgresql":
+            if not is_dict:
+                queryset = queryset.exclude(**{f"{field_name}__contains": value})
+            json_value = Cast(Value(json.dumps(value)), models.JSONField())
+            return queryset.update(
+                **{field_name: JSONBConcat(F(field_name), json_value)}
             )
+
+        objects = []
+        for obj in queryset.only("pk", field_name):
+            current_value = getattr(obj, field_name)
+            if is_dict:
+                current_value.update(value)
+            elif all(item in current_value for item in value):
+                continue
+            else:
+                current_value.extend(value)
+            objects.append(obj)
+
+        queryset.model._base_manager.bulk_update(
+            objects, [field_name], batch_size=cls.bulk_batch_size
         )
+        return len(objects)
 
     @classmethod
     def get_object_or_none(cls, **kwargs):
@@ -1,7 +1,7 @@
 from datetime import timedelta
 
-from django.db import models
-from django.db.models import Q, F
+from django.db import models, transaction
+from django.db.models import Q, F, Count, Exists, OuterRef, prefetch_related_objects
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 
@@ -39,19 +39,113 @@ class Conversation(BaseModel):
     # }
     members = models.JSONField(_("Members"), default=dict)
     pinned_at = models.DateTimeField(_("Pinned at"), null=True, blank=True)
+    last_message = models.ForeignKey(
+        "ChatMessage",
+        verbose_name=_("Last message"),
+        null=True,
+        blank=True,
+        related_name="+",
+        on_delete=models.SET_NULL,
+    )
+    last_activity_at = models.DateTimeField(
+        _("Last activity at"), null=True, blank=True
+    )
+    # Number of unread messages of each member, format: {"<id>": <count>, ...}
+    unread_counts = models.JSONField(_("Unread counts"), default=dict, blank=True)
 
     def __str__(self):
         return self.name
 
     def get_members(self):
+        members = getattr(self, "_prefetched_members", None)
+        if members is not None:
+            return members
         return User.objects.filter(pk__in=self.members.keys())
 
     def get_recipient(self, current_user):
         if self.is_group_conversation:
             return None
 
+        members = getattr(self, "_prefetched_members", None)
+        if members is not None:
+            return next(
+                (member for member in members if member.pk != current_user.pk), None
+            )
         return self.get_members().exclude(pk=current_user.pk).first()
 
+    @classmethod
+    def prefetch_members(cls, conversations):
+        """
+        Loads the members of all the conversations with a single query, they are
+        then returned by `get_members()` as a list instead of a queryset.
+        """
+        conversations = list(conversations)
+        member_ids = {
+            member_id
+            for conversation in conversations
+            for member_id in conversation.members.keys()
+        }
+        users = list(User.objects.filter(pk__in=member_ids))
+        for conversation in conversations:
+            conversation._prefetched_members = [
+                user for user in users if str(user.pk) in conversation.members
+            ]
+        return conversations
+
+    def get_unread_count(self, user):
+        return self.unread_counts.get(str(user.id), 0)
+
+    def update_unread_counts(self, increment=(), decrement=(), reset=(), **fields):
+        """
+        Updates the unread messages counters of the given members (ids), and
+        the other given fields in the same statement.
+        The row is locked while the counters are modified so that concurrent
+        messages are all counted.
+        """
+        with transaction.atomic():
+            unread_counts, last_activity_at = (
+                Conversation._base_manager.select_for_update()
+                .values_list("unread_counts", "last_activity_at")
+                .get(pk=self.pk)
+            )
+            for member_id in increment:
+                unread_counts[str(member_id)] = unread_counts.get(str(member_id), 0) + 1
+            for member_id in decrement:
+                count = unread_counts.get(str(member_id), 0)
+                unread_counts[str(member_id)] = max(count - 1, 0)
+            for member_id in reset:
+                unread_counts[str(member_id)] = 0
+
+            # A message created before the last activity must not replace the
+            # last message, which may happen when messages are sent concurrently.
+            activity_at = fields.get("last_activity_at")
+            if activity_at and last_activity_at and activity_at < last_activity_at:
+                fields.pop("last_message", None)
+                fields.pop("last_activity_at")
+
+            Conversation._base_manager.filter(pk=self.pk).update(
+                unread_counts=unread_counts, **fields
+            )
+        self.unread_counts = unread_counts
+        for field_name, value in fields.items():
+            setattr(self, field_name, value)
+
+    def add_message(self, message):
+        """
+        Records a new message: it becomes the last message of the conversation,
+        and it is counted as unread by all the members except its sender.
+        """
+        self.update_unread_counts(
+            increment=[
+                member_id
+                for member_id in self.members.keys()
+                if member_id != str(message.sender_id)
+            ],
+            last_message=message,
+            last_activity_at=message.created_at,
+            last_updated_at=timezone.now(),
+        )
+
     def get_name(self, current_user):
         return (
             self.name
@@ -67,8 +161,10 @@ class Conversation(BaseModel):
         )
 
     def get_unread_messages(self, user):
-        return self.messages.all().exclude(
-            Q(read_by__has_key=str(user.id)) | Q(sender=user)
+        return (
+            self.messages.all()
+            .exclude(sender=user)
+            .exclude(ChatMessage.get_read_filter(user))
         )
 
     def create(self, user, members=None, *args, **kwargs):
@@ -87,9 +183,15 @@ class Conversation(BaseModel):
         return super().create(user, *args, **kwargs)
 
     def mark_as_read(self, user):
-        for message in self.get_unread_messages(user):
-            result = message.mark_as_read(user)
-        return Result.success(_("Conversation has been marked as read."))
+        """
+        Marks all the messages of the conversation as read by the user.
+        The instance of the result is the number of updated messages.
+        """
+        result = ChatMessage.mark_as_read_bulk(self.get_unread_messages(user), user)
+        self.update_unread_counts(reset=[user.id])
+        return Result.success(
+            _("Conversation has been marked as read."), instance=result.instance
+        )
 
     def add_members(self, members, save=True):
         if not members:
@@ -146,15 +248,57 @@ class Conversation(BaseModel):
         conversations = cls.get_user_conversations(user)
         messages = (
             ChatMessage.objects.filter(conversation__in=conversations)
-            .exclude(Q(read_by__has_key=str(user.id)) | Q(sender=user))
+            .exclude(sender=user)
+            .exclude(ChatMessage.get_read_filter(user))
             .order_by("-created_at")
         )
         return messages
 
     @classmethod
-    def get_user_conversations(cls, user, trash=False, kwargs=None):
+    def get_unread_counts(cls, conversations, user):
+        """
+        Returns the number of unread messages of the user in each conversation
+        using one aggregate query: {<conversation_id>: <count>}.
+        Conversations without unread messages are not included.
+        """
+        counts = (
+            ChatMessage.objects.filter(conversation__in=conversations)
+            .exclude(sender=user)
+            .exclude(ChatMessage.get_read_filter(user))
+            .order_by()
+            .values("conversation")
+            .annotate(count=Count("pk"))
+        )
+        return {row["conversation"]: row["count"] for row in counts}
+
+    @classmethod
+    def prepare_bulk_soft_delete(cls, objects, deleted_at):
+        # The bulk UPDATE does not send the signals that invalidate the cached
+        # subscriptions of the members.
+        cls.invalidate_members_subscriptions(objects)
+        return []
+
+    @classmethod
+    def prepare_bulk_restore(cls, objects):
+        cls.invalidate_members_subscriptions(objects)
+        return []
+
+    @classmethod
+    def invalidate_members_subscriptions(cls, conversations):
+        from lava.services.subscription_cache import subscription_cache
+
+        member_ids = {
+            user_id
+            for conversation in conversations
+            for user_id in (conversation.members or {}).keys()
+        }
+        for user_id in member_ids:
+            subscription_cache.invalidate_user(user_id)
+
+    @classmethod
+    def get_user_conversations(cls, user, trash=False, params=None):
         return Conversation.filter(
-            user=user, trash=trash, params=kwargs
+            user=user, trash=trash, params=params
         ).filter(
             members__has_key=str(user.id)
         )
@@ -165,6 +309,12 @@ class ChatMessage(BaseModel):
         verbose_name = _("Message")
         verbose_name_plural = _("Messages")
         ordering = ("created_at",)
+        indexes = [
+            models.Index(
+                fields=["conversation", "created_at"],
+                name="lava_chatmsg_conv_created_idx",
+            ),
+        ]
 
     sender = models.ForeignKey(
         User,
@@ -202,21 +352,189 @@ class ChatMessage(BaseModel):
             return Result.error(_("You can not send messages to this conversation!"))
 
         result = super().create(user, *args, **kwargs)
-        # Trigger update to modify last_updated_at for ordering purposes
-        # @TODO: This method is not optimal, think about changing it later
-        self.conversation.update()
+        if result.is_error:
+            return result
+
+        # Bumps last_updated_at (used for ordering) along with the activity
+        # fields, without saving nor diffing the whole conversation.
+        self.conversation.add_message(self)
+        return result
+
+    def delete(self, user=None, soft_delete=None):
+        # The counters only change when a live message is deleted, not when a
+        # message is deleted again or removed from the trash.
+        is_live = not self.deleted_at
+        result = super().delete(user=user, soft_delete=soft_delete)
+        if result.is_error or not is_live:
+            return result
+
+        conversation = self.conversation
+        fields = {}
+        if conversation.last_message_id == self.pk:
+            fields["last_message"] = conversation.messages.order_by("created_at").last()
+        conversation.update_unread_counts(decrement=self.get_unread_by(), **fields)
+        return result
+
+    def restore(self, user=None):
+        result = super().restore(user=user)
+        if result.is_error:
+            return result
+
+        conversation = self.conversation
+        conversation.update_unread_counts(
+            increment=self.get_unread_by(),
+            last_message=conversation.messages.order_by("created_at").last(),
+        )
         return result
 
+    def get_unread_by(self):
+        """Returns the ids of the members who have not read the message."""
+        read_by = self.get_read_by()
+        return [
+            member_id
+            for member_id in self.conversation.members.keys()
+            if member_id not in read_by and member_id != str(self.sender_id)
+        ]
+
     def mark_as_read(self, user):
-        if user.id not in self.read_by:
-            self.read_by[user.id] = timezone.now().strftime("%Y-%m-%d %H:%M:%S %z")
-            self.save()
+        if self.is_read_by(user):
+            return Result.success(_("Message has been marked as read."))
+
+        if lava_settings.READ_RECEIPTS_STORAGE == "table":
+            MessageReceipt.objects.get_or_create(message=self, user=user)
+        else:
+            self.read_by[str(user.id)] = timezone.now().strftime(
+                "%Y-%m-%d %H:%M:%S %z"
+            )
+            self.save(update_fields=["read_by"])
+
+        if self.sender_id != user.id:
+            self.conversation.update_unread_counts(decrement=[user.id])
 
         return Result.success(_("Message has been marked as read."))
 
+    @classmethod
+    def mark_as_read_bulk(cls, messages, user):
+        """
+        Marks many messages as read by the user using a single statement.
+        The instance of the result is the number of updated messages.
+        """
+        if isinstance(messages, models.QuerySet):
+            message_ids = messages.values("pk")
+        else:
+            message_ids = [message.pk for message in messages]
+
+        queryset = cls.objects.filter(pk__in=message_ids)
+        unread_counts = (
+            queryset.exclude(sender=user)
+            .exclude(cls.get_read_filter(user))
+            .order_by()
+            .values("conversation")
+            .annotate(count=Count("pk"))
+        )
+        unread_counts = {row["conversation"]: row["count"] for row in unread_counts}
+
+        read_at = timezone.now()
+        if lava_settings.READ_RECEIPTS_STORAGE == "table":
+            unread_ids = list(
+                queryset.exclude(cls.get_read_filter(user)).values_list(
+                    "pk", flat=True
+                )
+            )
+            MessageReceipt.objects.bulk_create(
+                [
+                    MessageReceipt(message_id=message_id, user=user, read_at=read_at)
+                    for message_id in unread_ids
+                ],
+                batch_size=cls.bulk_batch_size,
+                ignore_conflicts=True,
+            )
+            count = len(unread_ids)
+        else:
+            count = cls.bulk_merge_json(
+                queryset,
+                "read_by",
+                {str(user.id): read_at.strftime("%Y-%m-%d %H:%M:%S %z")},
+            )
+
+        for conversation_id, unread_count in unread_counts.items():
+            Conversation(pk=conversation_id).update_unread_counts(
+                decrement=[user.id] * unread_count
+            )
+        return Result.success(_("Messages have been marked as read."), instance=count)
+
     def is_read_by(self, user):
-        return user.id in self.read_by
+        return str(user.id) in self.get_read_by()
+
+    def get_read_by(self):
+        """
+        Returns the users who have read the message and when:
+        {"<user_id>": "<read_at>"}, whatever the read receipts storage is.
+        """
+        if lava_settings.READ_RECEIPTS_STORAGE == "table":
+            return {
+                str(receipt.user_id): receipt.read_at.strftime("%Y-%m-%d %H:%M:%S %z")
+                for receipt in self.receipts.all()
+            }
+        return self.read_by
+
+    @classmethod
+    def prefetch_read_receipts(cls, messages):
+        """
+        Loads the read receipts of all the messages with a single query when
+        they are stored in the receipts table, for `get_read_by()`.
+        """
+        messages = [message for message in messages if message is not None]
+        if lava_settings.READ_RECEIPTS_STORAGE == "table":
+            prefetch_related_objects(messages, "receipts")
+        return messages
+
+    @classmethod
+    def get_read_filter(cls, user):
+        """Returns a filter that matches the messages read by the user."""
+        if lava_settings.READ_RECEIPTS_STORAGE == "table":
+            return Exists(
+                MessageReceipt.objects.filter(message=OuterRef("pk"), user=user)
+            )
+        return Q(read_by__has_key=str(user.id))
 
     @classmethod
     def get_unread_messages_for_user(cls, user):
-        return ChatMessage.objects.exclude(read_by__has_key=str(user.id))
+        return ChatMessage.objects.exclude(cls.get_read_filter(user))
+
+
+class MessageReceipt(models.Model):
+    """
+    Read receipt of a chat message, used instead of `ChatMessage.read_by` when
+    the READ_RECEIPTS_STORAGE setting is "table".
+    """
+
+    class Meta:
+        verbose_name = _("Message receipt")
+        verbose_name_plural = _("Message receipts")
+        default_permissions = ()
+        constraints = [
+            models.UniqueConstraint(
+                fields=["message", "user"], name="lava_msgreceipt_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "message"], name="lava_msgreceipt_user_idx"),
+        ]
+
+    message = models.ForeignKey(
+        ChatMessage,
+        verbose_name=_("Message"),
+        related_name="receipts",
+        on_delete=models.CASCADE,
+    )
+    user = models.ForeignKey(
+        User,
+        verbose_name=_("User"),
+        related_name="message_receipts",
+        on_delete=models.CASCADE,
+    )
+    read_at = models.DateTimeField(_("Read at"), default=timezone.now)
+
+    def __str__(self):
+        return f"{self.user} : {self.message}"
@@ -1,4 +1,6 @@
 import os
+import gzip
+import json
 import logging
 import threading
 import itertools
@@ -10,8 +12,14 @@ import schedule
 import zipfile
 
 from django.apps import apps
-from django.db import models
-from django.db.models import Q
+from django.db import (
+    models,
+    connections,
+    router,
+    transaction,
+    close_old_connections,
+)
+from django.db.models import Q, Exists, OuterRef, Prefetch
 from django.core.files import File
 from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
@@ -21,6 +29,7 @@ from django.contrib.auth.models import (
     Permission as BasePermissionModel,
     Group as BaseGroupModel,
 )
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.admin.models import (
     LogEntry as BaseLogEntryModel,
     ADDITION,
@@ -29,6 +38,8 @@ from django.contrib.admin.models import (
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _, gettext
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
 
 from easy_thumbnails.fields import ThumbnailerImageField
 
@@ -45,6 +56,7 @@ from lava.utils import (
     generate_password,
     strtobool,
     get_backup_file_filename,
+    get_export_file_filename,
     zipdir,
     zipf,
     dump_pgdb,
@@ -59,13 +71,10 @@ from lava.managers import (
     LavaUserManager,
     DefaultModelBaseManager,
 )
+from lava.services.firebase import FirebaseMulticastSender, firebase_messaging
+from lava.services.notification_dispatch import get_notification_dispatcher
 from lava.ws.services import send_ws_backup_status, send_ws_notification
 
-try:
-    from firebase_admin import messaging
-except ImportError:
-    messaging = None
-
 
 class Preferences(models.Model):
     LIST_LAYOUT_CHOICES = (
@@ -121,68 +130,227 @@ class LogEntry(BaseLogEntryModel):
             ("export_logentry", _("Can export activity journal")),
         )
 
+    @classmethod
+    def bulk_log_actions(cls, entries, batch_size=None):
+        """
+        Inserts many log entries using a constant number of queries per batch.
+
+        :entries:list:A list of dicts that accept the same keyword arguments as
+        `LogEntry.objects.log_action()`, and optionally an `action_time`.
+        """
+        if not entries:
+            return 0
+
+        connection = connections[router.db_for_write(cls)]
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # The parent rows ids are required to insert the child rows.
+            for entry in entries:
+                cls.objects.create(
+                    user_id=entry["user_id"],
+                    content_type_id=entry["content_type_id"],
+                    object_id=str(entry["object_id"]),
+                    object_repr=entry["object_repr"][:200],
+                    action_flag=entry["action_flag"],
+                    change_message=entry.get("change_message", ""),
+                    action_time=entry.get("action_time") or timezone.now(),
+                )
+            return len(entries)
+
+        parent_link = cls._meta.get_ancestor_link(BaseLogEntryModel)
+        insert_query = "INSERT INTO %s (%s) VALUES (%%s)" % (
+            connection.ops.quote_name(cls._meta.db_table),
+            connection.ops.quote_name(parent_link.column),
+        )
+        base_manager = BaseLogEntryModel.objects.using(connection.alias)
+        with transaction.atomic(using=connection.alias):
+            base_entries = base_manager.bulk_create(
+                [
+                    BaseLogEntryModel(
+                        user_id=entry["user_id"],
+                        content_type_id=entry["content_type_id"],
+                        object_id=str(entry["object_id"]),
+                        object_repr=entry["object_repr"][:200],
+                        action_flag=entry["action_flag"],
+                        change_message=entry.get("change_message", ""),
+                        action_time=entry.get("action_time") or timezone.now(),
+                    )
+                    for entry in entries
+                ],
+                batch_size=batch_size,
+            )
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    insert_query, [(base_entry.pk,) for base_entry in base_entries]
+                )
+
+        return len(base_entries)
+
+    @classmethod
+    def get_day_range(cls, value):
+        """
+        Returns the bounds of the day given as mm-dd-yyyy, the entries of the
+        day being filtered by range so that the `action_time` indexes are used.
+        """
+        start = datetime.strptime(value, "%m-%d-%Y")
+        if settings.USE_TZ:
+            start = timezone.make_aware(start)
+        return start, start + timedelta(days=1)
+
+    @classmethod
+    def get_content_type(cls, content_type):
+        """
+        Returns the content type given as app_name.class_name, it is read from
+        the content types cache.
+        """
+        app_name, model = content_type.split(".")
+        try:
+            return ContentType.objects.get_by_natural_key(app_name, model.lower())
+        except ContentType.DoesNotExist:
+            return None
+
+    @classmethod
+    def get_content_type_filter(cls, content_type):
+        """
+        Returns the filter of the entries of the given content type
+        (app_name.class_name), filtered by id so that the join is avoided.
+        """
+        content_type = cls.get_content_type(content_type)
+        if content_type is None:
+            return Q(pk__in=[])
+        return Q(content_type=content_type)
+
+    @classmethod
+    def get_date_range(cls, kwargs=None):
+        """
+        Returns the (start, end) datetimes of the entries selected by the date
+        filters (action_time, created_after, created_before), the bounds that
+        are not filtered are None.
+        """
+        if kwargs is None:
+            kwargs = {}
+
+        starts, ends = [], []
+        if "action_time" in kwargs:
+            start, end = cls.get_day_range(kwargs["action_time"])
+            starts.append(start)
+            ends.append(end)
+        if "created_after" in kwargs:
+            starts.append(cls.get_day_range(kwargs["created_after"])[0])
+        if "created_before" in kwargs:
+            ends.append(cls.get_day_range(kwargs["created_before"])[1])
+
+        return max(starts, default=None), min(ends, default=None)
+
     @classmethod
     def get_filter_params(cls, kwargs=None):
         filter_params = Q()
         if kwargs is None:
             kwargs = {}
-        
+
         if "query" in kwargs:
             filter_params &= (
-                Q(user__first_name__icontains=kwargs.get("query")) |
-                Q(user__last_name__icontains=kwargs.get("query")) |
-                Q(object_repr__icontains=kwargs.get("query")) |
-                Q(content_type__model__icontains=kwargs.get("query"))
+                Q(user__first_name__icontains=kwargs.get("query"))
+                | Q(user__last_name__icontains=kwargs.get("query"))
+                | Q(object_repr__icontains=kwargs.get("query"))
+                | Q(content_type__model__icontains=kwargs.get("query"))
             )
         if "user" in kwargs:
-            filter_params |= Q(user=kwargs.get("user"))
+            filter_params &= Q(user=kwargs.get("user"))
 
         if "action_type" in kwargs:
-            filter_params |= Q(action_flag=kwargs["action_type"])
+            filter_params &= Q(action_flag=kwargs["action_type"])
 
         if "content_type" in kwargs:
-            app_name, model = kwargs["content_type"].split(".")
-            filter_params |= Q(content_type__app_label=app_name) & Q(
-                content_type__model=model
-            )
+            filter_params &= cls.get_content_type_filter(kwargs["content_type"])
 
-        if "action_time" in kwargs:
-            date = datetime.strptime(kwargs["action_time"], "%m-%d-%Y")
-            filter_params &= Q(action_time__date=date)
-
-        if "created_after" in kwargs:
-            date = datetime.strptime(kwargs["created_after"], "%m-%d-%Y")
-            filter_params &= Q(action_time__date__lte=date)
-
-        if "created_before" in kwargs:
-            date = datetime.strptime(kwargs["created_before"], "%m-%d-%Y")
-            filter_params &= Q(action_time__date__gte=date)
+        start, end = cls.get_date_range(kwargs)
+        if start is not None:
+            filter_params &= Q(action_time__gte=start)
+        if end is not None:
+            filter_params &= Q(action_time__lt=end)
 
         return filter_params
 
     @classmethod
-    def filter(cls, user=None, params=None, include_admin_entries=False, trash=False, *args, **kwargs):
+    def filter(
+        cls,
+        user=None,
+        params=None,
+        include_admin_entries=False,
+        trash=False,
+        *args,
+        **kwargs,
+    ):
         filter_params = cls.get_filter_params(params)
-        exclude_params = {}
-
-        admin_users = User.objects.filter(username__in=["ekadmin", "eksuperuser"])
-        if user not in admin_users:
-            exclude_params["user__in"] = admin_users
 
-        base_queryset = cls.objects.none()
-        if include_admin_entries:
-            base_queryset = BaseLogEntryModel.objects.filter(filter_params).exclude(
-                **exclude_params
+        # The entries logged through the Django admin site only exist in the
+        # base model's table.
+        LogEntryModel = BaseLogEntryModel if include_admin_entries else cls
+        queryset = LogEntryModel.objects.filter(filter_params)
+
+        excluded_users = User.objects.none()
+        if user is None or not user.is_admin_user:
+            excluded_users = User.objects.filter(username__in=User.admin_usernames)
+            queryset = queryset.exclude(user__in=excluded_users)
+
+        # The searches that reach into the archived months also return the
+        # matching archived entries, after the live ones.
+        start, end = cls.get_date_range(params)
+        if (start or end) and LogEntryArchive.get_archives(start, end).exists():
+            from lava.services.log_entry_archive import LogEntrySearchResults
+
+            return LogEntrySearchResults.search(
+                queryset,
+                params,
+                include_admin_entries=include_admin_entries,
+                excluded_user_ids=set(excluded_users.values_list("id", flat=True)),
             )
 
-        queryset = cls.objects.filter(filter_params).exclude(**exclude_params)
-        print(" ---------------------------------------------- ")
-        print(queryset.count())
-        print(cls.objects.all().count())
-        print(filter_params)
-        print(" ---------------------------------------------- ")
+        return queryset
+
 
-        return queryset | base_queryset
+class LogEntryArchive(models.Model):
+    """
+    Log entries of a month moved from the database to a compressed JSON lines
+    file by the `lava_archive_log_entries` command.
+    """
+
+    class Meta:
+        verbose_name = _("Log entries archive")
+        verbose_name_plural = _("Log entries archives")
+        ordering = ("-period_start",)
+        default_permissions = ()
+
+    period_start = models.DateTimeField(_("Period start"), unique=True)
+    period_end = models.DateTimeField(_("Period end"))
+    file_name = models.CharField(_("File name"), max_length=128)
+    entries_count = models.PositiveIntegerField(_("Entries count"), default=0)
+    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+    last_updated_at = models.DateTimeField(_("Last updated at"), auto_now=True)
+
+    def __str__(self):
+        return f"{self.file_name} ({self.entries_count})"
+
+    @classmethod
+    def get_archives(cls, start=None, end=None):
+        """Returns the archives of the months overlapping the given period."""
+        archives = cls.objects.all()
+        if start is not None:
+            archives = archives.filter(period_end__gt=start)
+        if end is not None:
+            archives = archives.filter(period_start__lt=end)
+        return archives
+
+    def get_path(self):
+        return os.path.join(lava_settings.LOG_ENTRY_ARCHIVE_ROOT, self.file_name)
+
+    def iter_rows(self):
+        """Yields the archived entries as dicts."""
+        with gzip.open(self.get_path(), "rt", encoding="utf-8") as archive_file:
+            for line in archive_file:
+                row = json.loads(line)
+                row["action_time"] = parse_datetime(row["action_time"])
+                yield row
 
 
 class Permission(BaseModelMixin, BasePermissionModel):
@@ -440,6 +608,14 @@ class User(BaseModel, AbstractUser):
 
     objects = LavaUserManager()
 
+    soft_delete_change_message = "Soft Delete"
+    # The users created by `lava_setup`, they are hidden from the other users.
+    admin_usernames = ["ekadmin", "eksuperuser"]
+
+    @property
+    def is_admin_user(self):
+        return self.username in self.admin_usernames
+
     def get_choices_display(self):
         return f"{self.first_name} {self.last_name}"
 
@@ -449,7 +625,9 @@ class User(BaseModel, AbstractUser):
     def get_all_permissions(self):
         user_perms_ids = self.user_permissions.all().values_list("id", flat=True)
         groups_perms_ids = self.groups.all().values_list("permissions__id", flat=True)
-        return Permission.objects.filter(pk__in=[*user_perms_ids, *groups_perms_ids])
+        return Permission.objects.filter(
+            pk__in=[*user_perms_ids, *groups_perms_ids]
+        ).select_related("content_type")
 
     def create(
         self,
@@ -641,17 +819,12 @@ class User(BaseModel, AbstractUser):
         if soft_delete:
             # self.is_active = False
             self.deleted_at = timezone.now()
-            new_username = f"{self.username}_deleted"
-            try:
-                User.trash.get(username=new_username)
-                self.username = f"{new_username}{random.randint(1000, 9999)}"
-            except User.DoesNotExist:
-                self.username = new_username
+            User.prepare_bulk_soft_delete([self], self.deleted_at)
 
             self.update(
                 user=user,
                 update_fields=["deleted_at", "username"],
-                message="Soft Delete"
+                message=self.soft_delete_change_message,
             )
             return Result.success(message=success_message)
 
@@ -696,17 +869,53 @@ class User(BaseModel, AbstractUser):
         if result.is_error:
             return result
 
-        restored_username = self.username.split("_deleted")[0]
-        try:
-            User.objects.get(username=restored_username)
-            self.username = f"{restored_username}_restored"
-        except User.DoesNotExist:
-            self.username = restored_username
-
+        User.prepare_bulk_restore([self])
         self.save(update_fields=["username"])
 
         return Result.success(_("The user has been restored successfully."))
 
+    @classmethod
+    def prepare_bulk_soft_delete(cls, objects, deleted_at):
+        """
+        Renames the users so that their usernames can be reused, eg: `john`
+        becomes `john_deleted`.
+        """
+        new_usernames = {obj.pk: f"{obj.username}_deleted" for obj in objects}
+        taken_usernames = set(
+            User.trash.filter(username__in=new_usernames.values()).values_list(
+                "username", flat=True
+            )
+        )
+        for obj in objects:
+            new_username = new_usernames[obj.pk]
+            if new_username in taken_usernames:
+                new_username = f"{new_username}{random.randint(1000, 9999)}"
+            obj.username = new_username
+        return ["username"]
+
+    @classmethod
+    def prepare_bulk_restore(cls, objects):
+        """
+        Gives the users their original usernames back, unless they are taken
+        in the meantime, in which case the `_restored` suffix is added.
+        """
+        restored_usernames = {
+            obj.pk: obj.username.split("_deleted")[0] for obj in objects
+        }
+        taken_usernames = set(
+            User.objects.filter(username__in=restored_usernames.values()).values_list(
+                "username", flat=True
+            )
+        )
+        for obj in objects:
+            restored_username = restored_usernames[obj.pk]
+            if restored_username in taken_usernames:
+                obj.username = f"{restored_username}_restored"
+            else:
+                obj.username = restored_username
+                taken_usernames.add(restored_username)
+        return ["username"]
+
     def get_notification_groups(self):
         return NotificationGroup.objects.filter(user=self)
 
@@ -719,13 +928,20 @@ class User(BaseModel, AbstractUser):
             | Q(target_groups__in=self.get_notification_groups())
             | Q(target_groups__in=self.groups.all())
         )
+        if lava_settings.READ_RECEIPTS_STORAGE == "table":
+            # Only the receipts of the user are needed by `Notification.seen()`.
+            notifications = notifications.prefetch_related(
+                Prefetch(
+                    "receipts", queryset=NotificationReceipt.objects.filter(user=self)
+                )
+            )
         return notifications
 
     def get_unread_notifications(self):
         notifications = Notification.objects.filter(
             Q(target_users=self.id)
             | Q(target_groups__in=self.get_notification_groups())
-        ).exclude(seen_by__contains=self.id)
+        ).exclude(Notification.get_read_filter(self))
         return notifications
 
     def send_notification(
@@ -756,7 +972,7 @@ class User(BaseModel, AbstractUser):
         # Send the notification by e-mail?
 
         # Send the notification via firebase api
-        notification.send_firebase_notification()
+        notification.dispatch(["firebase"])
 
         return Result.success(_("The notification was sent successfully."))
 
@@ -766,6 +982,32 @@ class User(BaseModel, AbstractUser):
             self.save(update_fields=["device_id_list"])
         return Result.success()
 
+    @classmethod
+    def remove_devices(cls, device_ids, user_ids):
+        """
+        Removes the devices (Firebase registration tokens) from the devices
+        lists of the given users, eg: the devices that are no longer registered.
+        Returns the number of updated users.
+        """
+        device_ids = set(device_ids)
+        with transaction.atomic():
+            users = list(
+                cls.objects.select_for_update()
+                .filter(pk__in=user_ids)
+                .only("id", "device_id_list")
+            )
+            users = [
+                user for user in users if device_ids.intersection(user.device_id_list)
+            ]
+            for user in users:
+                user.device_id_list = [
+                    device_id
+                    for device_id in user.device_id_list
+                    if device_id not in device_ids
+                ]
+            cls.objects.bulk_update(users, ["device_id_list"])
+        return len(users)
+
     @classmethod
     def validate_password(cls, password):
         if not isinstance(password, str):
@@ -816,10 +1058,11 @@ class User(BaseModel, AbstractUser):
         filter_params = User.get_filter_params(params)
 
         base_queryset = super().filter(user=user, trash=trash, params=params, *args, **kwargs)
-        admin_users = User.objects.filter(username__in=["ekadmin", "eksuperuser"])
 
-        if user and user not in admin_users:
-            return base_queryset.filter(filter_params).exclude(pk__in=admin_users)
+        if user and not user.is_admin_user:
+            return base_queryset.filter(filter_params).exclude(
+                username__in=User.admin_usernames
+            )
 
         return base_queryset.filter(filter_params)
 
@@ -871,22 +1114,20 @@ class Notification(BaseModelMixin, models.Model):
         return f"{sender} : {self.title}"
 
     def seen(self, user):
+        if lava_settings.READ_RECEIPTS_STORAGE == "table":
+            return any(receipt.user_id == user.id for receipt in self.receipts.all())
         return user.id in self.seen_by
 
     def get_target_users(self):
         """Returns the sum of target users and the users in the target groups."""
-        target_users = self.target_users.all()
-        target_users_from_groups = User.objects.filter(
-            groups__in=self.target_groups.all()
-        )
-        target_users = target_users | target_users_from_groups
-        target_users = target_users.filter(is_active=True)
-        return target_users
+        return User.objects.filter(
+            Q(notifications=self) | Q(groups__notifications=self), is_active=True
+        ).distinct()
 
     def get_target_devices(self):
         target_users = self.get_target_users()
         devices_lists = list(target_users.values_list("device_id_list", flat=True))
-        return list(itertools.chain(*devices_lists))
+        return list(dict.fromkeys(itertools.chain(*devices_lists)))
 
     def create(self, send_notification=True, **kwargs):
         can_create = False
@@ -905,86 +1146,176 @@ class Notification(BaseModelMixin, models.Model):
         if not result.is_success:
             return result
 
-        target_notification_groups = list(
-            NotificationGroup.objects.filter(notifications=self)
-        )
-        target_groups = list(Group.objects.filter(notifications=self))
-        target_users = list(self.target_users.all())
-
         if send_notification:
-            send_ws_notification(
-                self,
-                target_groups=[*target_groups, *target_notification_groups],
-                target_users=target_users,
-            )
-
-        # Disable FireBase notifications until it's implemented
-        send_firebase_notification = False
-        if send_firebase_notification:
-            self.send_firebase_notification()
+            self.dispatch(["websocket"])
 
         return Result.success(
             _("The notification has been created successfully."), instance=self
         )
 
+    def dispatch(self, channels):
+        """
+        Records the deliveries of the notification through the given channels
+        ("websocket", "firebase") and hands them to the notification dispatcher,
+        the caller does not wait for them to be sent.
+        """
+        deliveries = [
+            NotificationDelivery.objects.create(notification=self, channel=channel)
+            for channel in channels
+        ]
+        get_notification_dispatcher().dispatch(deliveries)
+        return deliveries
+
+    def deliver(self, channel, targets=None):
+        """
+        Sends the notification through the given channel.
+        `targets` limits the delivery to these Firebase devices or channel
+        layer groups, eg: the ones a previous attempt could not reach. On
+        failure, the instance of the result is the list of the targets to send
+        the notification to again.
+        """
+        if channel == "firebase":
+            result = self.send_firebase_notification(tokens=targets)
+            if result.is_error:
+                return Result.error(
+                    result.message, instance=result.instance["failed_tokens"]
+                )
+            return result
+
+        if targets is None:
+            target_notification_groups = list(
+                NotificationGroup.objects.filter(notifications=self)
+            )
+            target_groups = list(Group.objects.filter(notifications=self))
+            target_users = list(self.target_users.all())
+        else:
+            target_groups = target_notification_groups = target_users = []
+        failures = send_ws_notification(
+            self,
+            target_groups=[*target_groups, *target_notification_groups],
+            target_users=target_users,
+            group_names=targets,
+        )
+        if failures:
+            return Result.error(
+                _("The notification could not be sent to: {}").format(
+                    ", ".join(failures.keys())
+                ),
+                instance=list(failures.keys()),
+            )
+        return Result.success()
+
     def mark_as_read(self, user):
         """Call this function when a user have seen the notification."""
-        if user.id not in self.seen_by:
+        if lava_settings.READ_RECEIPTS_STORAGE == "table":
+            NotificationReceipt.objects.get_or_create(notification=self, user=user)
+        elif user.id not in self.seen_by:
             self.seen_by.append(user.id)
             self.save(update_fields=["seen_by"])
 
     @classmethod
     def mark_as_read_bulk(cls, notifications, user):
         """
-        Marks many notifications as read by the user.
+        Marks many notifications as read by the user using a single statement.
+        The instance of the result is the number of updated notifications.
         """
-        for notification in notifications:
-            notification.mark_as_read(user)
+        if isinstance(notifications, models.QuerySet):
+            notification_ids = notifications.values("pk")
+        else:
+            notifications = list(notifications)
+            notification_ids = [notification.pk for notification in notifications]
+            if lava_settings.READ_RECEIPTS_STORAGE != "table":
+                for notification in notifications:
+                    if user.id not in notification.seen_by:
+                        notification.seen_by.append(user.id)
+
+        queryset = cls.objects.filter(pk__in=notification_ids)
+        if lava_settings.READ_RECEIPTS_STORAGE == "table":
+            unread_ids = list(
+                queryset.exclude(cls.get_read_filter(user)).values_list(
+                    "pk", flat=True
+                )
+            )
+            NotificationReceipt.objects.bulk_create(
+                [
+                    NotificationReceipt(notification_id=notification_id, user=user)
+                    for notification_id in unread_ids
+                ],
+                batch_size=cls.bulk_batch_size,
+                ignore_conflicts=True,
+            )
+            count = len(unread_ids)
+        else:
+            count = cls.bulk_merge_json(queryset, "seen_by", [user.id])
 
-        return Result.success(_("The selected notifications have been marked as read."))
+        return Result.success(
+            _("The selected notifications have been marked as read."), instance=count
+        )
 
     def mark_as_not_read(self, user):
         """Call this function when a user marks the notification as not read."""
-        if user.id in self.seen_by:
+        if lava_settings.READ_RECEIPTS_STORAGE == "table":
+            self.receipts.filter(user=user).delete()
+        elif user.id in self.seen_by:
             self.seen_by.remove(user.id)
             self.save()
 
-    def send_firebase_notification(self):
+    @classmethod
+    def get_read_filter(cls, user):
+        """Returns a filter that matches the notifications seen by the user."""
+        if lava_settings.READ_RECEIPTS_STORAGE == "table":
+            return Exists(
+                NotificationReceipt.objects.filter(
+                    notification=OuterRef("pk"), user=user
+                )
+            )
+        return Q(seen_by__contains=user.id)
+
+    def send_firebase_notification(self, messaging=None, tokens=None):
         """
         Send notification via firebase API.
+        The devices that are no longer registered are removed from the users
+        devices lists.
+        `messaging` replaces the `firebase_admin.messaging` module, eg: in tests.
+        `tokens` limits the notification to these devices of the target users.
         """
         if messaging is None:
-            logging.warning("Firebase is not installed.")
-            return Result.warning("Firebase is not installed.")
-        if not lava_settings.FIREBASE_ACTIVATED:
-            logging.warning("Firebase is not activated.")
-            return Result.warning("Firebase is not activated.")
-
-        registration_tokens = self.get_target_devices()
-        data_object = None
-        android_configs = messaging.AndroidConfig(
-            priority="high",
-            notification=messaging.AndroidNotification(
-                # click_action=self.url or None,
-                priority="high",
-            ),
-        )
-        message = messaging.MulticastMessage(
-            notification=messaging.Notification(title=self.title, body=self.content),
-            data=data_object,
-            tokens=registration_tokens,
-            android=android_configs,
-        )
-
-        # Send a message to the device corresponding to the provided
-        # registration tokens.
-        try:
-            messaging.send_multicast(message)
-        except Exception as e:
-            logging.error(e)
-            return Result.error(str(e))
+            if firebase_messaging is None:
+                logging.warning("Firebase is not installed.")
+                return Result.warning("Firebase is not installed.")
+            if not lava_settings.FIREBASE_ACTIVATED:
+                logging.warning("Firebase is not activated.")
+                return Result.warning("Firebase is not activated.")
+
+        devices = {}
+        target_users = self.get_target_users().values_list("id", "device_id_list")
+        for user_id, device_id_list in target_users:
+            for device_id in device_id_list:
+                devices.setdefault(device_id, []).append(user_id)
+        if tokens is not None:
+            devices = {
+                device_id: devices[device_id]
+                for device_id in tokens
+                if device_id in devices
+            }
+
+        sender = FirebaseMulticastSender(messaging=messaging)
+        report = sender.send(list(devices.keys()), title=self.title, body=self.content)
+
+        unregistered_devices = report["unregistered_tokens"]
+        if unregistered_devices:
+            User.remove_devices(
+                unregistered_devices,
+                user_ids={
+                    user_id
+                    for device_id in unregistered_devices
+                    for user_id in devices[device_id]
+                },
+            )
 
-        return Result.success()
+        if report["errors"]:
+            return Result.error("\n".join(report["errors"]), instance=report)
+        return Result.success(instance=report)
 
     @classmethod
     def get_filter_params(cls, kwargs=None):
@@ -1002,6 +1333,419 @@ class Notification(BaseModelMixin, models.Model):
         return Notification.objects.all()
 
 
+class NotificationReceipt(models.Model):
+    """
+    Read receipt of a notification, used instead of `Notification.seen_by` when
+    the READ_RECEIPTS_STORAGE setting is "table".
+    """
+
+    class Meta:
+        verbose_name = _("Notification receipt")
+        verbose_name_plural = _("Notification receipts")
+        default_permissions = ()
+        constraints = [
+            models.UniqueConstraint(
+                fields=["notification", "user"], name="lava_notifreceipt_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "notification"], name="lava_notifreceipt_user_idx"
+            ),
+        ]
+
+    notification = models.ForeignKey(
+        Notification,
+        verbose_name=_("Notification"),
+        related_name="receipts",
+        on_delete=models.CASCADE,
+    )
+    user = models.ForeignKey(
+        User,
+        verbose_name=_("User"),
+        related_name="notification_receipts",
+        on_delete=models.CASCADE,
+    )
+    read_at = models.DateTimeField(_("Read at"), default=timezone.now)
+
+    def __str__(self):
+        return f"{self.user} : {self.notification}"
+
+
+class NotificationDelivery(models.Model):
+    """
+    Delivery of a notification through a channel (WebSocket, Firebase), it is
+    processed by the notification dispatcher and retried when it fails.
+    """
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+    class Meta:
+        verbose_name = _("Notification delivery")
+        verbose_name_plural = _("Notification deliveries")
+        default_permissions = ()
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"],
+                name="lava_notifdelivery_due_idx",
+            ),
+        ]
+
+    notification = models.ForeignKey(
+        Notification,
+        verbose_name=_("Notification"),
+        related_name="deliveries",
+        on_delete=models.CASCADE,
+    )
+    channel = models.CharField(
+        _("Channel"),
+        max_length=16,
+        choices=(("websocket", _("WebSocket")), ("firebase", _("Firebase"))),
+    )
+    status = models.CharField(
+        _("Status"),
+        max_length=16,
+        default=PENDING,
+        choices=(
+            (PENDING, _("Pending")),
+            (SENT, _("Sent")),
+            (FAILED, _("Failed")),
+        ),
+    )
+    attempts = models.PositiveSmallIntegerField(_("Attempts"), default=0)
+    # Targets (Firebase tokens or channel layer groups) the last attempt could
+    # not reach, the next attempt only sends the notification to them. Empty to
+    # send it to all.
+    failed_targets = models.JSONField(_("Failed targets"), default=list, blank=True)
+    last_error = models.TextField(_("Last error"), blank=True, default="")
+    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+    last_attempt_at = models.DateTimeField(_("Last attempt at"), null=True, blank=True)
+    next_attempt_at = models.DateTimeField(_("Next attempt at"), default=timezone.now)
+
+    def __str__(self):
+        return f"{self.notification} : {self.channel} ({self.status})"
+
+    def process(self):
+        """
+        Sends the notification through the channel and records the result, a
+        failed delivery is retried later until NOTIFICATION_DELIVERY_MAX_ATTEMPTS
+        attempts have been made.
+        """
+        try:
+            result = self.notification.deliver(
+                self.channel, targets=self.failed_targets or None
+            )
+        except Exception as e:
+            logging.error(e)
+            result = Result.error(str(e))
+
+        self.attempts += 1
+        self.last_attempt_at = timezone.now()
+        if result.is_error:
+            self.last_error = result.message
+            if isinstance(result.instance, list):
+                self.failed_targets = result.instance
+            if self.attempts < lava_settings.NOTIFICATION_DELIVERY_MAX_ATTEMPTS:
+                delay = lava_settings.NOTIFICATION_DELIVERY_RETRY_DELAY * 2 ** (
+                    self.attempts - 1
+                )
+                self.status = self.PENDING
+                self.next_attempt_at = self.last_attempt_at + timedelta(seconds=delay)
+            else:
+                self.status = self.FAILED
+        else:
+            self.status = self.SENT
+            self.last_error = ""
+            self.failed_targets = []
+
+        self.save(
+            update_fields=[
+                "status",
+                "attempts",
+                "failed_targets",
+                "last_error",
+                "last_attempt_at",
+                "next_attempt_at",
+            ]
+        )
+        return result
+
+    @classmethod
+    def get_due_deliveries(cls):
+        """
+        Returns the pending deliveries that are due, locking their rows (but not
+        the notifications', which have several deliveries) and skipping the
+        ones being claimed by another worker. It must be called in a
+        transaction.
+        """
+        return (
+            cls.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(status=cls.PENDING, next_attempt_at__lte=timezone.now())
+            .select_related("notification")
+        )
+
+    @classmethod
+    def claim_due_deliveries(cls, limit=100, **filters):
+        """
+        Returns the pending deliveries that are due after postponing them by
+        NOTIFICATION_DELIVERY_CLAIM_TIMEOUT seconds, so that they can be sent
+        outside of the transaction without being claimed by another worker.
+        """
+        with transaction.atomic():
+            deliveries = list(
+                cls.get_due_deliveries()
+                .filter(**filters)
+                .order_by("next_attempt_at")[:limit]
+            )
+            if deliveries:
+                claimed_until = timezone.now() + timedelta(
+                    seconds=lava_settings.NOTIFICATION_DELIVERY_CLAIM_TIMEOUT
+                )
+                delivery_ids = [delivery.pk for delivery in deliveries]
+                cls.objects.filter(pk__in=delivery_ids).update(
+                    next_attempt_at=claimed_until
+                )
+        return deliveries
+
+    @classmethod
+    def process_pending(cls, limit=100):
+        """
+        Processes the pending deliveries that are due, the rows are claimed
+        first so that several workers can run at the same time.
+        Returns the number of processed deliveries.
+        """
+        deliveries = cls.claim_due_deliveries(limit=limit)
+        for delivery in deliveries:
+            delivery.process()
+        return len(deliveries)
+
+
+class ExportJob(models.Model):
+    """
+    Export run in a background thread, the requester is notified once the
+    file is written. The progress is updated after each exported chunk.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    class Meta:
+        verbose_name = _("Export job")
+        verbose_name_plural = _("Export jobs")
+        ordering = ("-created_at",)
+        default_permissions = ()
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_("User"),
+        related_name="export_jobs",
+        on_delete=models.CASCADE,
+    )
+    export_type = models.CharField(
+        _("Export type"),
+        max_length=32,
+        choices=lava_settings.EXPORT_JOB_TYPE_CHOICES,
+    )
+    params = models.JSONField(_("Parameters"), default=dict, blank=True)
+    status = models.CharField(
+        _("Status"),
+        max_length=16,
+        default=PENDING,
+        choices=(
+            (PENDING, _("Pending")),
+            (RUNNING, _("Running")),
+            (COMPLETED, _("Completed")),
+            (FAILED, _("Failed")),
+        ),
+    )
+    processed = models.PositiveIntegerField(_("Processed rows"), default=0)
+    total = models.PositiveIntegerField(_("Total rows"), null=True, blank=True)
+    export_file = models.FileField(
+        _("Export file"), null=True, blank=True, upload_to=get_export_file_filename
+    )
+    error = models.TextField(_("Error"), blank=True, default="")
+    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+    # Updated by the thread of the job after each exported chunk.
+    heartbeat_at = models.DateTimeField(_("Heartbeat at"), null=True, blank=True)
+    finished_at = models.DateTimeField(_("Finished at"), null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user} : {self.get_export_type_display()} ({self.status})"
+
+    def is_stale(self):
+        """
+        Returns True when the job is not finished and its thread has not given
+        any news for EXPORT_JOB_TIMEOUT seconds, eg: its process was stopped.
+        """
+        if self.status not in (self.PENDING, self.RUNNING):
+            return False
+        last_seen_at = self.heartbeat_at or self.created_at
+        return timezone.now() - last_seen_at > timedelta(
+            seconds=lava_settings.EXPORT_JOB_TIMEOUT
+        )
+
+    def fail_if_stale(self):
+        """
+        Marks the job as failed and notifies the user when it is stale.
+        Returns True if the job has been marked as failed.
+        """
+        if not self.is_stale():
+            return False
+
+        finished_at = timezone.now()
+        error = gettext("The export was interrupted.")
+        # The job is only failed once, even if it is checked concurrently.
+        updated = ExportJob.objects.filter(
+            pk=self.pk, status=self.status, heartbeat_at=self.heartbeat_at
+        ).update(status=self.FAILED, error=error, finished_at=finished_at)
+        if not updated:
+            self.refresh_from_db()
+            return False
+
+        self.status, self.error, self.finished_at = self.FAILED, error, finished_at
+        self.notify()
+        return True
+
+    @property
+    def progress(self):
+        """Returns the percentage of exported rows."""
+        if self.status == self.COMPLETED:
+            return 100
+        if not self.total:
+            return 0
+        return min(100, int(self.processed * 100 / self.total))
+
+    def get_filename(self):
+        return f"{self.created_at.strftime('%Y%m%d%H%M%S')}_{self.export_type}.xlsx"
+
+    def start(self):
+        """
+        Saves the job and runs it in a thread once the current transaction is
+        committed.
+        """
+        if self.export_type not in lava_settings.EXPORT_JOB_FUNCTIONS:
+            return Result.error(_("This export type is not supported."))
+
+        self.save()
+        transaction.on_commit(
+            lambda: threading.Thread(target=self.run_in_thread, daemon=True).start()
+        )
+        return Result.success(
+            _(
+                "The export has been started, you will get notified once it is "
+                "finished."
+            ),
+            instance=self,
+        )
+
+    def run_in_thread(self):
+        close_old_connections()
+        try:
+            self.run()
+        finally:
+            close_old_connections()
+
+    def set_progress(self, processed, total):
+        """
+        Records the progress of the export, which is stopped when the job is
+        no longer running, eg: it was marked as failed by `fail_if_stale()`.
+        """
+        self.processed, self.total = processed, total
+        self.heartbeat_at = timezone.now()
+        updated = ExportJob.objects.filter(pk=self.pk, status=self.RUNNING).update(
+            processed=processed, total=total, heartbeat_at=self.heartbeat_at
+        )
+        if not updated:
+            raise Exception(gettext("The export was interrupted."))
+
+    def run(self):
+        """
+        Writes the export file and notifies the user of the result, unless the
+        job has been marked as failed in the meantime.
+        """
+        self.heartbeat_at = timezone.now()
+        started = ExportJob.objects.filter(pk=self.pk, status=self.PENDING).update(
+            status=self.RUNNING, heartbeat_at=self.heartbeat_at
+        )
+        if not started:
+            return
+        self.status = self.RUNNING
+
+        try:
+            export = import_string(lava_settings.EXPORT_JOB_FUNCTIONS[self.export_type])
+            result = export(**self.params, progress=self.set_progress)
+            if result.is_error:
+                raise Exception(result.message)
+
+            tmp_filename = result.instance
+            try:
+                with open(tmp_filename, "rb") as export_file:
+                    self.export_file.save(
+                        self.get_filename(), File(export_file), save=False
+                    )
+            finally:
+                os.remove(tmp_filename)
+
+            self.status = self.COMPLETED
+            self.error = ""
+        except Exception as e:
+            logging.error(e)
+            self.status = self.FAILED
+            self.error = str(e)
+
+        self.finished_at = timezone.now()
+        # The job may have been failed by `fail_if_stale()`, eg: while the file
+        # was being uploaded, the user is not notified a second time.
+        updated = ExportJob.objects.filter(pk=self.pk, status=self.RUNNING).update(
+            status=self.status,
+            processed=self.processed,
+            total=self.total,
+            export_file=self.export_file.name or "",
+            error=self.error,
+            finished_at=self.finished_at,
+        )
+        if not updated:
+            if self.export_file:
+                self.export_file.delete(save=False)
+            self.refresh_from_db()
+            return
+
+        self.notify()
+
+    def notify(self):
+        if self.status == self.COMPLETED:
+            notification = Notification(
+                title=gettext("Export complete"),
+                content=gettext(
+                    "The %(type)s export that was started on %(date)s is finished "
+                    "successfully."
+                )
+                % {
+                    "type": self.get_export_type_display(),
+                    "date": self.created_at.strftime("%c"),
+                },
+                url=self.export_file.url,
+            )
+        else:
+            notification = Notification(
+                title=gettext("Export failed"),
+                content=gettext(
+                    "The %(type)s export that was started on %(date)s has failed."
+                    "\nError: %(e)s"
+                )
+                % {
+                    "type": self.get_export_type_display(),
+                    "date": self.created_at.strftime("%c"),
+                    "e": self.error,
+                },
+            )
+        return notification.create(m2m_fields=[("target_users", [self.user])])
+
+
 class BackupConfig(BaseModel):
     class Meta:
         verbose_name = _("Backup Configuration")
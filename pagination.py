@@ -1,4 +1,25 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import date, datetime, time
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from django.db.models.expressions import OrderBy
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    PageNumberPagination,
+    _positive_int,
+)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+from lava.utils import iter_queryset_chunks
 
 
 class LavaPageNumberPagination(PageNumberPagination):
@@ -17,3 +38,288 @@ def get_pagination_class(page_size):
             super().__init__(page_size=page_size)
 
     return PaginationClass
+
+
+class LavaCursorPagination(BasePagination):
+    """
+    Keyset (cursor) pagination: a page is selected with a condition on the
+    ordering fields of the last item of the previous page instead of an offset,
+    and the items are not counted, so deep pages are as fast as the first one.
+
+    The ordering of the queryset is used (eg: from `get_ordering_params`), or
+    the default ordering of the model, or `-created_at`. The primary key is
+    added as a tiebreaker so that the ordering is unique.
+    """
+
+    cursor_query_param = "cursor"
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = None
+
+    def __init__(self, page_size=None):
+        if page_size:
+            self.page_size = page_size
+        self.page = None
+        self.has_next = False
+        self.has_previous = False
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, queryset):
+        """
+        Returns the ordering keys of the queryset: [(<path>, <descending>,
+        <nullable>), ...], ending with the primary key.
+        """
+        model = queryset.model
+        pk_name = model._meta.pk.name
+        pk_path = model._meta.pk.attname
+        ordering = list(queryset.query.order_by) or list(model._meta.ordering)
+        if not ordering and any(
+            field.name == "created_at" for field in model._meta.concrete_fields
+        ):
+            ordering = ["-created_at"]
+
+        keys = []
+        for item in ordering:
+            if isinstance(item, str):
+                descending = item.startswith("-")
+                path = item.lstrip("-")
+            elif isinstance(item, OrderBy) and isinstance(item.expression, F):
+                descending = item.descending
+                path = item.expression.name
+            elif isinstance(item, F):
+                descending = False
+                path = item.name
+            else:
+                continue
+
+            if path == "?":
+                continue
+            if path == "pk":
+                path = pk_name
+            path, nullable = self.resolve_path(model, path)
+            keys.append((path, descending, nullable))
+            if path == pk_path:
+                break
+        else:
+            descending = keys[-1][1] if keys else True
+            keys.append((pk_path, descending, False))
+        return keys
+
+    def resolve_path(self, model, path):
+        """
+        Returns the path to order by and whether its value may be null, the
+        relations are ordered by their primary key.
+        """
+        nullable = False
+        parts = path.split("__")
+        try:
+            for index, part in enumerate(parts):
+                field = model._meta.get_field(part)
+                nullable = nullable or field.null
+                if field.is_relation:
+                    if index == len(parts) - 1 and field.concrete:
+                        parts[index] = field.attname
+                    model = field.related_model
+        except FieldDoesNotExist:
+            nullable = True
+        return "__".join(parts), nullable
+
+    def get_order_by(self, keys, reverse):
+        order_by = []
+        for path, descending, nullable in keys:
+            if reverse:
+                descending = not descending
+            expression = F(path).desc() if descending else F(path).asc()
+            if nullable:
+                # Explicit so that the conditions of `get_filter` do not depend
+                # on the database.
+                expression.nulls_last = not reverse
+                expression.nulls_first = reverse
+            order_by.append(expression)
+        return order_by
+
+    def get_filter(self, keys, values, reverse):
+        """
+        Returns the condition selecting the items after (or before when
+        `reverse` is set) the item whose ordering values are `values`.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (path, descending, nullable), value in zip(keys, values):
+            lookup = "lt" if descending != reverse else "gt"
+            if value is None:
+                after = Q(**{f"{path}__isnull": False}) if reverse else Q(pk__in=[])
+                same = Q(**{f"{path}__isnull": True})
+            else:
+                after = Q(**{f"{path}__{lookup}": value})
+                if nullable and not reverse:
+                    after |= Q(**{f"{path}__isnull": True})
+                same = Q(**{path: value})
+            condition |= equal & after
+            equal &= same
+        return condition
+
+    def get_values(self, item, keys):
+        """
+        Returns the ordering values of the item, dates are kept with their
+        microseconds.
+        """
+        values = []
+        for path, _descending, _nullable in keys:
+            value = item
+            for part in path.split("__"):
+                value = getattr(value, part, None) if value is not None else None
+            if isinstance(value, (datetime, date, time)):
+                value = value.isoformat()
+            values.append(value)
+        return values
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8")
+            cursor = json.loads(cursor)
+            return cursor["v"], bool(cursor["r"])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(_("Invalid cursor"))
+
+    def encode_cursor(self, values, reverse):
+        cursor = json.dumps({"v": values, "r": int(reverse)}, default=str)
+        encoded = urlsafe_b64encode(cursor.encode("utf-8")).decode("ascii")
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, encoded
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.keys = self.get_ordering(queryset)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[1]
+        queryset = queryset.order_by(*self.get_order_by(self.keys, reverse))
+        if cursor is not None:
+            if len(cursor[0]) != len(self.keys):
+                raise NotFound(_("Invalid cursor"))
+            queryset = queryset.filter(self.get_filter(self.keys, cursor[0], reverse))
+
+        items = list(queryset[: self.page_size + 1])
+        has_more = len(items) > self.page_size
+        items = items[: self.page_size]
+        if reverse:
+            items.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = items
+        return items
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_values(self.page[-1], self.keys), False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_values(self.page[0], self.keys), True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+
+def get_cursor_pagination_class(page_size):
+    class CursorPaginationClass(LavaCursorPagination):
+        def __init__(self):
+            super().__init__(page_size=page_size)
+
+    return CursorPaginationClass
+
+
+def stream_serialized_items(
+    queryset, serialize, chunk_size=500, max_rows=None, ndjson=False
+):
+    """
+    Yields the items of the queryset serialized `chunk_size` at a time with
+    `serialize(items)`, so that the memory used does not depend on the number
+    of items. At most `max_rows` items are sent.
+
+    The items are sent in the same envelope as the paginated lists, the count
+    and whether the items were truncated being known at the end only:
+    {"next": null, "previous": null, "results": [...], "count": <count>,
+    "truncated": <bool>}, or as one JSON object per line when `ndjson` is set.
+    """
+    encoder = JSONEncoder(ensure_ascii=False)
+    if max_rows:
+        queryset = queryset[: max_rows + 1]
+
+    count = 0
+    truncated = False
+    if not ndjson:
+        yield '{"next": null, "previous": null, "results": ['
+    for chunk in iter_queryset_chunks(queryset, chunk_size):
+        if max_rows and count + len(chunk) > max_rows:
+            chunk = chunk[: max_rows - count]
+            truncated = True
+        items = [encoder.encode(item) for item in serialize(chunk)]
+        if not items:
+            break
+        if ndjson:
+            yield "\n".join(items) + "\n"
+        else:
+            yield ("," if count else "") + ",".join(items)
+        count += len(items)
+    if not ndjson:
+        yield f'], "count": {count}, "truncated": {encoder.encode(truncated)}}}'
@@ -13,3 +13,4 @@ from .user_serializers import UserSerializer, UserExerptSerializer
 from .base_serializers import BaseModelSerializer, ReadOnlyBaseModelSerializer
 from .notification_serializers import NotificationSerializer
 from .backup_serializers import BackupSerializer
+from .export_job_serializers import ExportJobSerializer
@@ -11,6 +11,9 @@ class BaseModelSerializer(serializers.ModelSerializer):
 
     m2m_field_names = []
     file_field_names = []
+    # Relations used by the SerializerMethodFields, see `get_related_lookups()`.
+    select_related_fields = []
+    prefetch_related_fields = []
 
     def __init__(self, instance=None, data=empty, user=None, **kwargs):
         self.user = user
@@ -1,3 +1,4 @@
+from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 from rest_framework import serializers
@@ -18,6 +19,8 @@ class MessageListSerializer(ReadOnlyBaseModelSerializer):
     datetime = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
 
+    select_related_fields = ["sender"]
+
     class Meta:
         model = ChatMessage
         fields = [
@@ -46,6 +49,9 @@ class MessageListSerializer(ReadOnlyBaseModelSerializer):
 
 
 class ConversationMessageListSerializer(MessageListSerializer):
+
+    read_by = serializers.SerializerMethodField()
+
     class Meta:
         model = ChatMessage
         fields = [
@@ -62,6 +68,22 @@ class ConversationMessageListSerializer(MessageListSerializer):
     def get_sender(self, instance):
         return "me" if instance.sender.id == self.user.id else "opposite"
 
+    def get_read_by(self, instance):
+        return instance.get_read_by()
+
+
+class ConversationListListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Load the members of all the conversations at once instead of one query
+        # per conversation.
+        if isinstance(data, models.Manager):
+            data = data.all()
+        conversations = Conversation.prefetch_members(data)
+        ChatMessage.prefetch_read_receipts(
+            [conversation.last_message for conversation in conversations]
+        )
+        return super().to_representation(conversations)
+
 
 class ConversationListSerializer(ReadOnlyBaseModelSerializer):
 
@@ -72,6 +94,8 @@ class ConversationListSerializer(ReadOnlyBaseModelSerializer):
     unread = serializers.SerializerMethodField()
     datetime = serializers.SerializerMethodField()
 
+    select_related_fields = ["last_message__sender"]
+
     class Meta:
         model = Conversation
         fields = [
@@ -85,6 +109,7 @@ class ConversationListSerializer(ReadOnlyBaseModelSerializer):
             "datetime",
             "pinned_at",
         ]
+        list_serializer_class = ConversationListListSerializer
 
     def get_name(self, instance):
         return instance.get_name(self.user)
@@ -100,24 +125,25 @@ class ConversationListSerializer(ReadOnlyBaseModelSerializer):
         return url
 
     def get_members(self, instance):
-        members = instance.get_members().exclude(user=self.user)
+        members = [
+            member for member in instance.get_members() if member.pk != self.user.pk
+        ]
         serializer = UserExerptSerializer(members, many=True)
         return serializer.data
 
     def get_latest_message(self, instance):
-        message = instance.messages.last()
+        message = instance.last_message
         if message:
             serializer = ConversationMessageListSerializer(message, user=self.user)
             return serializer.data
         return None
 
     def get_unread(self, instance):
-        return instance.get_unread_messages(self.user).count()
+        return instance.get_unread_count(self.user)
 
     def get_datetime(self, instance):
-        latest_message = instance.messages.first()
-        if latest_message:
-            return humanize_datetime(latest_message.created_at)
+        if instance.last_activity_at:
+            return humanize_datetime(instance.last_activity_at)
         return None
 
 
@@ -154,7 +180,7 @@ class ConversationGetSerializer(ReadOnlyBaseModelSerializer):
         return url
 
     def get_messages(self, instance):
-        messages = instance.messages
+        messages = ChatMessage.prefetch_read_receipts(instance.messages.all())
         serializer = ConversationMessageListSerializer(
             messages, user=self.user, many=True, context=self.context
         )
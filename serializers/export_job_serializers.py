@@ -0,0 +1,19 @@
+from lava.models import ExportJob
+from lava.serializers.base_serializers import ReadOnlyBaseModelSerializer
+
+
+class ExportJobSerializer(ReadOnlyBaseModelSerializer):
+    class Meta:
+        model = ExportJob
+        fields = [
+            "id",
+            "export_type",
+            "status",
+            "processed",
+            "total",
+            "progress",
+            "export_file",
+            "error",
+            "created_at",
+            "finished_at",
+        ]
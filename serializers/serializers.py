@@ -158,6 +158,8 @@ class PermissionSerializer(BaseModelSerializer):
 
     codename = serializers.SerializerMethodField(label=_("Code name"))
 
+    select_related_fields = ["content_type"]
+
     class Meta:
         model = Permission
         fields = ["id", "name", "codename"]
@@ -0,0 +1,152 @@
+import atexit
+import logging
+import threading
+from functools import partial
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from lava import settings as lava_settings
+
+
+class BaseAuditLogWriter:
+    """
+    Writes the log entries of the actions performed on the objects, each entry
+    is a dict of the keyword arguments of `LogEntry.objects.log_action()`.
+    """
+
+    def write(self, entry):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SyncAuditLogWriter(BaseAuditLogWriter):
+    """Inserts each entry immediately, in the current transaction."""
+
+    def write(self, entry):
+        from lava.models.models import LogEntry
+
+        LogEntry.objects.log_action(**entry)
+
+
+class BufferedAuditLogWriter(BaseAuditLogWriter):
+    """
+    Queues the entries once the current transaction is committed, the entries
+    of the rolled back transactions being dropped, and inserts them in bulk
+    from a background thread every `max_records` entries or `flush_interval`
+    seconds. The queued entries are inserted when the process exits normally.
+    """
+
+    def __init__(self, max_records=500, flush_interval=1):
+        self.max_records = max_records
+        self.flush_interval = flush_interval
+        self._entries = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._flush_lock = threading.Lock()
+
+    def write(self, entry):
+        entry = {**entry, "action_time": entry.get("action_time") or timezone.now()}
+        transaction.on_commit(partial(self.enqueue, entry))
+
+    def enqueue(self, entry):
+        with self._condition:
+            self._entries.append(entry)
+            closed = self._closed
+            if not closed and self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.run, name="lava-audit-log", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+            if len(self._entries) >= self.max_records:
+                self._condition.notify()
+
+        if closed:
+            # The process is exiting, the entry is written right away.
+            self.flush()
+
+    def run(self):
+        failed = False
+        while True:
+            with self._condition:
+                if failed or (
+                    len(self._entries) < self.max_records and not self._closed
+                ):
+                    self._condition.wait(self.flush_interval)
+                if self._closed:
+                    return
+
+            close_old_connections()
+            try:
+                # The entries that could not be inserted are retried after
+                # `flush_interval` seconds.
+                failed = not self.flush() and bool(self._entries)
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """
+        Inserts the queued entries, they are queued again if the insertion
+        fails. Returns the number of inserted entries.
+        """
+        from lava.models.models import LogEntry
+
+        with self._flush_lock:
+            with self._condition:
+                entries, self._entries = self._entries, []
+            if not entries:
+                return 0
+
+            try:
+                LogEntry.bulk_log_actions(entries, batch_size=self.max_records)
+            except Exception as e:
+                logging.error(f"Audit log entries could not be written: {e}")
+                with self._condition:
+                    self._entries[:0] = entries
+                return 0
+            return len(entries)
+
+    def close(self):
+        """Stops the background thread and inserts the queued entries."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        return self.flush()
+
+
+AUDIT_LOG_WRITERS = {
+    "sync": SyncAuditLogWriter,
+    "buffered": BufferedAuditLogWriter,
+}
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_audit_log_writer(backend=None):
+    """
+    Returns the writer of the given backend, AUDIT_LOG_WRITER_BACKEND by
+    default. Writers are shared by the whole process.
+    """
+    backend = backend or lava_settings.AUDIT_LOG_WRITER_BACKEND
+    with _writers_lock:
+        if backend not in _writers:
+            writer_class = AUDIT_LOG_WRITERS.get(backend)
+            if writer_class is None:
+                writer_class = import_string(backend)
+            if writer_class is BufferedAuditLogWriter:
+                writer = writer_class(
+                    max_records=lava_settings.AUDIT_LOG_BUFFER_SIZE,
+                    flush_interval=lava_settings.AUDIT_LOG_FLUSH_INTERVAL,
+                )
+            else:
+                writer = writer_class()
+            _writers[backend] = writer
+        return _writers[backend]
@@ -0,0 +1,110 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from lava import settings as lava_settings
+
+try:
+    from firebase_admin import messaging as firebase_messaging
+except ImportError:
+    firebase_messaging = None
+
+
+# Maximum number of registration tokens of a Firebase multicast message.
+MULTICAST_MAX_TOKENS = 500
+
+
+def chunk_tokens(tokens, size=MULTICAST_MAX_TOKENS):
+    tokens = list(dict.fromkeys(tokens))
+    return [tokens[index : index + size] for index in range(0, len(tokens), size)]
+
+
+class FirebaseMulticastSender:
+    """
+    Sends a notification to any number of devices: the registration tokens are
+    split in batches of 500 (the limit of Firebase), sent concurrently by a
+    pool of threads.
+
+    `messaging` is the `firebase_admin.messaging` module, or any object with the
+    same interface (eg: a fake used in the tests).
+    """
+
+    def __init__(self, messaging=None, max_workers=None):
+        self.messaging = messaging or firebase_messaging
+        self.max_workers = max_workers or lava_settings.FIREBASE_SEND_WORKERS
+
+    def build_message(self, tokens, title, body, data=None):
+        messaging = self.messaging
+        return messaging.MulticastMessage(
+            notification=messaging.Notification(title=title, body=body),
+            data=data,
+            tokens=tokens,
+            android=messaging.AndroidConfig(
+                priority="high",
+                notification=messaging.AndroidNotification(priority="high"),
+            ),
+        )
+
+    def send_batch(self, tokens, title, body, data=None):
+        message = self.build_message(tokens, title, body, data)
+        # `send_multicast` is deprecated in the recent versions of firebase_admin.
+        send = getattr(self.messaging, "send_each_for_multicast", None)
+        if send is None:
+            send = self.messaging.send_multicast
+        return send(message)
+
+    def is_unregistered(self, exception):
+        unregistered_error = getattr(self.messaging, "UnregisteredError", None)
+        return unregistered_error is not None and isinstance(
+            exception, unregistered_error
+        )
+
+    def send(self, tokens, title, body, data=None):
+        """
+        Sends the notification to the devices and returns a report:
+        {
+            "success_count": <int>,
+            "failure_count": <int>,
+            "unregistered_tokens": [<token>, ...],
+            "failed_tokens": [<token>, ...],
+            "errors": [<str>, ...],
+        }
+        A batch that fails as a whole counts as a failure of all its tokens,
+        which are reported in `failed_tokens` to be sent again.
+        """
+        batches = chunk_tokens(tokens)
+        report = {
+            "success_count": 0,
+            "failure_count": 0,
+            "unregistered_tokens": [],
+            "failed_tokens": [],
+            "errors": [],
+        }
+        if not batches:
+            return report
+
+        def send_batch(batch):
+            try:
+                return batch, self.send_batch(batch, title, body, data), None
+            except Exception as e:
+                return batch, None, e
+
+        max_workers = min(self.max_workers, len(batches))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(send_batch, batches))
+
+        for batch, response, exception in results:
+            if exception is not None:
+                logging.error(exception)
+                report["failure_count"] += len(batch)
+                report["failed_tokens"].extend(batch)
+                report["errors"].append(str(exception))
+                continue
+
+            for token, token_response in zip(batch, response.responses):
+                if token_response.success:
+                    report["success_count"] += 1
+                    continue
+                report["failure_count"] += 1
+                if self.is_unregistered(token_response.exception):
+                    report["unregistered_tokens"].append(token)
+        return report
@@ -3,6 +3,7 @@ from django.utils.translation import gettext as __
 from django.contrib.admin.models import LogEntry as BaseLogEntryModel
 from django.db.models import Q
 
+from lava import settings as lava_settings
 from lava.models import Permission, Group
 from lava.models.models import LogEntry
 from lava.utils import Result
@@ -16,26 +17,33 @@ def export_permissions():
     as it's instance.
     """
 
-    permissions = Permission.objects.all()
-    groups = Group.objects.all().order_by("name")
+    permissions = list(Permission.objects.values_list("id", "name"))
+    groups = list(Group.objects.all().order_by("name").values_list("id", "name"))
     header_title = __("List of available permissions")
     description = __(
         "Note: Please Fill in the cells with 'X' to provide groups "
         "with their permissions."
     )
 
-    rows = permissions.values_list("name", flat=True)
-    columns = [name.upper() for name in groups.values_list("name", flat=True)]
+    rows = [name for _id, name in permissions]
+    columns = [name.upper() for _id, name in groups]
     columns = [__("Permissions"), *columns]
-    data_content = []
 
-    for permission in permissions:
-        perms = []
-        for group in groups:
-            has_perm = permission in group.permissions.all()
-            value = "X" if has_perm else ""
-            perms.append(value)
-        data_content.append(perms)
+    # All the permissions of the groups are fetched at once, the rows are
+    # generated while the file is written.
+    group_ids = [group_id for group_id, _name in groups]
+    group_permissions = set(
+        Group.permissions.through.objects.filter(group_id__in=group_ids).values_list(
+            "permission_id", "group_id"
+        )
+    )
+    data_content = (
+        [
+            "X" if (permission_id, group_id) in group_permissions else ""
+            for group_id in group_ids
+        ]
+        for permission_id, _name in permissions
+    )
 
     data = ExportDataType(row_titles=rows, col_titles=columns, data=data_content)
 
@@ -55,7 +63,7 @@ def export_permissions():
     return Result.success(_("File exported successfully"), instance=result.instance)
 
 
-def export_activity_journal(
+def get_activity_journal(
     user=None,
     start_date=None,
     end_date=None,
@@ -64,29 +72,56 @@ def export_activity_journal(
     use_base_entry_model=True,
 ):
     """
-    This function creates a tmp file that contains journal of all
-    registered actions in the system.
+    Returns the queryset of the journal entries matching the given filters.
 
     :content_type:str:app_name.class_name. ex: lava.User
     """
 
     filters = Q()
     if user:
-        filters |= Q(user=user)
-    if start_date and end_date:
-        filters |= Q(action_time__gte=start_date) & Q(action_time__lte=end_date)
-    elif start_date:
-        filters |= Q(action_time__gte=start_date)
-    elif end_date:
-        filters |= Q(action_time__lte=end_date)
+        filters &= Q(user=user)
+    if start_date:
+        filters &= Q(action_time__gte=start_date)
+    if end_date:
+        filters &= Q(action_time__lte=end_date)
     if action_type:
-        filters |= Q(action_flag=action_type)
+        filters &= Q(action_flag=action_type)
     if content_type:
-        app_name, model = content_type.split(".")
-        filters |= Q(content_type__app_label=app_name) & Q(content_type__model=model)
+        filters &= LogEntry.get_content_type_filter(content_type)
 
     LogEntryModel = BaseLogEntryModel if use_base_entry_model else LogEntry
-    journal = LogEntryModel.objects.filter(filters)
+    return LogEntryModel.objects.filter(filters)
+
+
+def export_activity_journal(
+    user=None,
+    start_date=None,
+    end_date=None,
+    content_type="",
+    action_type=0,
+    use_base_entry_model=True,
+    progress=None,
+):
+    """
+    This function creates a tmp file that contains journal of all
+    registered actions in the system.
+
+    The entries are read XLSX_EXPORT_CHUNK_SIZE at a time with a server side
+    cursor, the user and the content type being fetched by the same query.
+
+    :content_type:str:app_name.class_name. ex: lava.User
+    :progress:callable:Called with the number of exported entries and the
+    total number of entries after each chunk.
+    """
+
+    journal = get_activity_journal(
+        user=user,
+        start_date=start_date,
+        end_date=end_date,
+        content_type=content_type,
+        action_type=action_type,
+        use_base_entry_model=use_base_entry_model,
+    )
 
     header_title = __("Activity journal")
     description = __("This is the list of actions that were performed in the system.")
@@ -101,23 +136,48 @@ def export_activity_journal(
         __("Object ID"),
         __("Message"),
     ]
-    data_content = []
-
-    for action in journal:
-        data_content.append(
-            [
-                action.action_time.strftime("%Y/%m/%d %H:%M:%S"),
-                f"{action.user.first_name} {action.user.last_name}",
-                # action.user.id,
-                action.get_action_flag_display(),
-                action.content_type.model.upper(),
-                action.object_repr,
-                action.object_id,
-                action.change_message,
-            ]
+    action_flags = dict(journal.model._meta.get_field("action_flag").flatchoices)
+    chunk_size = lava_settings.XLSX_EXPORT_CHUNK_SIZE
+    total = journal.count() if progress else None
+
+    def get_rows():
+        entries = journal.values_list(
+            "action_time",
+            "user__first_name",
+            "user__last_name",
+            "action_flag",
+            "content_type__model",
+            "object_repr",
+            "object_id",
+            "change_message",
         )
+        processed = 0
+        for (
+            action_time,
+            first_name,
+            last_name,
+            action_flag,
+            model_name,
+            object_repr,
+            object_id,
+            change_message,
+        ) in entries.iterator(chunk_size=chunk_size):
+            yield [
+                action_time.strftime("%Y/%m/%d %H:%M:%S"),
+                f"{first_name or ''} {last_name or ''}".strip(),
+                str(action_flags.get(action_flag, action_flag)),
+                model_name.upper() if model_name else "",
+                object_repr,
+                object_id,
+                change_message,
+            ]
+            processed += 1
+            if progress and processed % chunk_size == 0:
+                progress(processed, total)
+        if progress:
+            progress(processed, total)
 
-    data = ExportDataType(col_titles=columns, data=data_content)
+    data = ExportDataType(col_titles=columns, data=get_rows())
 
     result = export_xlsx(
         data,
@@ -0,0 +1,370 @@
+import gzip
+import json
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.admin.models import LogEntry as BaseLogEntryModel
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from lava import settings as lava_settings
+from lava.models.models import LogEntry, LogEntryArchive, User
+
+
+ARCHIVED_FIELDS = [
+    "id",
+    "action_time",
+    "user_id",
+    "content_type_id",
+    "object_id",
+    "object_repr",
+    "action_flag",
+    "change_message",
+]
+
+
+def get_month_range(date):
+    """Returns the (start, end) datetimes of the month of the given date."""
+    if timezone.is_aware(date):
+        date = timezone.make_naive(date)
+    start = date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = (start + timedelta(days=32)).replace(day=1)
+    if settings.USE_TZ:
+        start, end = timezone.make_aware(start), timezone.make_aware(end)
+    return start, end
+
+
+def archive_log_entries(months=None, batch_size=None):
+    """
+    Archives the months of log entries older than the last `months` months
+    (LOG_ENTRY_RETENTION_MONTHS by default), the current month included.
+    Returns the archives that were written.
+    """
+    if months is None:
+        months = lava_settings.LOG_ENTRY_RETENTION_MONTHS
+
+    cutoff, _end = get_month_range(timezone.now())
+    for _ in range(months - 1):
+        cutoff, _end = get_month_range(cutoff - timedelta(days=1))
+
+    archives = []
+    entries = BaseLogEntryModel.objects.filter(action_time__lt=cutoff)
+    oldest_action_time = (
+        entries.order_by("action_time").values_list("action_time", flat=True).first()
+    )
+    while oldest_action_time is not None:
+        start, end = get_month_range(oldest_action_time)
+        archives.append(archive_month(start, end, batch_size=batch_size))
+        oldest_action_time = (
+            entries.filter(action_time__gte=end)
+            .order_by("action_time")
+            .values_list("action_time", flat=True)
+            .first()
+        )
+    return archives
+
+
+def archive_month(start, end, batch_size=None):
+    """
+    Moves the log entries of the month starting at `start` to the month's
+    archive file, the entries are appended to the file if the month has
+    already been archived.
+    """
+    batch_size = batch_size or lava_settings.LOG_ENTRY_ARCHIVE_BATCH_SIZE
+
+    entries = BaseLogEntryModel.objects.filter(
+        action_time__gte=start, action_time__lt=end
+    )
+    # The entries added while the month is archived are left for a next run.
+    last_id = entries.order_by("-id").values_list("id", flat=True).first()
+    entries = entries.filter(id__lte=last_id)
+
+    archive = LogEntryArchive.objects.filter(period_start=start).first()
+    if archive is None:
+        archive = LogEntryArchive(
+            period_start=start,
+            period_end=end,
+            file_name=f"{timezone.localtime(start).strftime('%Y-%m')}.jsonl.gz",
+        )
+    path = archive.get_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # The file is written first, the entries are deleted once the archive is
+    # recorded: an interrupted run leaves the entries in the database, they
+    # are not appended again to the file it has replaced.
+    count = 0
+    archived_ids = set()
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as archive_file:
+        if archive.pk and os.path.exists(path):
+            with gzip.open(path, "rt", encoding="utf-8") as previous_file:
+                for line in previous_file:
+                    archive_file.write(line)
+                    archived_ids.add(json.loads(line)["id"])
+                    count += 1
+
+        rows = (
+            entries.annotate(
+                is_lava_entry=Exists(
+                    LogEntry.objects.filter(logentry_ptr=OuterRef("pk"))
+                )
+            )
+            .order_by("action_time", "id")
+            .values(*ARCHIVED_FIELDS, "is_lava_entry")
+        )
+        for row in rows.iterator(chunk_size=batch_size):
+            if row["id"] in archived_ids:
+                continue
+            archive_file.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+            count += 1
+    os.replace(tmp_path, path)
+
+    with transaction.atomic():
+        archive.entries_count = count
+        archive.save()
+        while True:
+            ids = list(entries.values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            BaseLogEntryModel.objects.filter(id__in=ids).delete()
+
+    return archive
+
+
+class ArchivedLogEntries:
+    """
+    Archived entries matching a search, the newest first. The archives are
+    read one month at a time when the entries are iterated or sliced, only the
+    months needed by a slice being loaded in memory, and the matching entries
+    of each month are counted once.
+
+    `match(row)` filters the rows, the entries of the deleted users (deleted
+    with them) and the ones that do not contain `query` are then left out.
+    """
+
+    def __init__(self, archives, match, EntryModel, query=""):
+        self.archives = list(archives.order_by("-period_start"))
+        self.match = match
+        self.EntryModel = EntryModel
+        self.query = query
+        self._counts = {}
+
+    def get_rows(self, archive):
+        rows = [row for row in archive.iter_rows() if self.match(row)]
+        users = User.objects.in_bulk({row["user_id"] for row in rows})
+        rows = [
+            row
+            for row in rows
+            if row["user_id"] in users
+            and self.contains_query(row, users[row["user_id"]])
+        ]
+        rows.sort(key=lambda row: (row["action_time"], row["id"]), reverse=True)
+        self._counts[archive.pk] = len(rows)
+        return rows
+
+    def get_count(self, archive):
+        if archive.pk in self._counts:
+            return self._counts[archive.pk]
+        if self.query:
+            return len(self.get_rows(archive))
+
+        # Only the users of the entries are kept in memory to count them.
+        user_counts = Counter(
+            row["user_id"] for row in archive.iter_rows() if self.match(row)
+        )
+        user_ids = User.objects.filter(id__in=user_counts.keys()).values_list(
+            "id", flat=True
+        )
+        self._counts[archive.pk] = sum(user_counts[user_id] for user_id in user_ids)
+        return self._counts[archive.pk]
+
+    def contains_query(self, row, user):
+        if not self.query:
+            return True
+        content_type = get_content_type(row["content_type_id"])
+        return any(
+            self.query in value.lower()
+            for value in [
+                user.first_name,
+                user.last_name,
+                row["object_repr"],
+                content_type.model if content_type else "",
+            ]
+        )
+
+    def get_entries(self, rows):
+        users = User.objects.in_bulk({row["user_id"] for row in rows})
+        entries = []
+        for row in rows:
+            entry = self.EntryModel(**{field: row[field] for field in ARCHIVED_FIELDS})
+            if self.EntryModel is LogEntry:
+                entry.logentry_ptr_id = entry.id
+            entry.user = users.get(row["user_id"])
+            entry.content_type = get_content_type(row["content_type_id"])
+            entries.append(entry)
+        return entries
+
+    def __len__(self):
+        return sum(self.get_count(archive) for archive in self.archives)
+
+    def __bool__(self):
+        return any(self.get_count(archive) for archive in self.archives)
+
+    def __iter__(self):
+        for archive in self.archives:
+            yield from self.get_entries(self.get_rows(archive))
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step:
+            raise TypeError("Only slices without steps are supported.")
+
+        start, stop = index.start or 0, index.stop
+        entries = []
+        offset = 0
+        for archive in self.archives:
+            if stop is not None and offset >= stop:
+                break
+            # The months before the slice are skipped once they are counted.
+            count = self._counts.get(archive.pk)
+            if count is not None and offset + count <= start:
+                offset += count
+                continue
+
+            rows = self.get_rows(archive)
+            archive_stop = None if stop is None else stop - offset
+            rows_slice = rows[max(start - offset, 0) : archive_stop]
+            entries.extend(self.get_entries(rows_slice))
+            offset += len(rows)
+        return entries
+
+
+def get_content_type(content_type_id):
+    if content_type_id is None:
+        return None
+    try:
+        return ContentType.objects.get_for_id(content_type_id)
+    except ContentType.DoesNotExist:
+        return None
+
+
+class LogEntrySearchResults:
+    """
+    Log entries of a search that reaches into the archives: the entries of
+    the queryset followed by the matching archived entries, which are older.
+
+    It supports the part of the QuerySet API used by the page paginators, the
+    serializers and the streamed lists, the archived entries being unsaved
+    LogEntry instances whose user and content type are set.
+    """
+
+    ordered = True
+    _fields = None
+    _prefetch_related_lookups = ()
+
+    def __init__(self, queryset, archived_entries, live_count=None):
+        self.queryset = queryset
+        self.model = queryset.model
+        self.archived_entries = archived_entries
+        self._live_count = live_count
+
+    @classmethod
+    def search(
+        cls, queryset, params, include_admin_entries=False, excluded_user_ids=()
+    ):
+        """
+        Returns the entries of the queryset followed by the archived entries
+        that match the filters of `LogEntry.get_filter_params()`, which are
+        read from the archives when they are needed.
+        """
+        start, end = LogEntry.get_date_range(params)
+        query = params.get("query", "").lower()
+        content_type_id = None
+        if "content_type" in params:
+            content_type = LogEntry.get_content_type(params["content_type"])
+            content_type_id = content_type.id if content_type else 0
+
+        def match(row):
+            return not (
+                (not include_admin_entries and not row["is_lava_entry"])
+                or row["user_id"] in excluded_user_ids
+                or (start is not None and row["action_time"] < start)
+                or (end is not None and row["action_time"] >= end)
+                or ("user" in params and str(row["user_id"]) != str(params["user"]))
+                or (
+                    "action_type" in params
+                    and str(row["action_flag"]) != str(params["action_type"])
+                )
+                or (
+                    content_type_id is not None
+                    and row["content_type_id"] != content_type_id
+                )
+            )
+
+        EntryModel = BaseLogEntryModel if include_admin_entries else LogEntry
+        archived_entries = ArchivedLogEntries(
+            LogEntryArchive.get_archives(start, end), match, EntryModel, query
+        )
+        return cls(queryset, archived_entries)
+
+    @property
+    def live_count(self):
+        if self._live_count is None:
+            self._live_count = self.queryset.count()
+        return self._live_count
+
+    def count(self):
+        return self.live_count + len(self.archived_entries)
+
+    def __len__(self):
+        return self.count()
+
+    def exists(self):
+        return self.queryset.exists() or bool(self.archived_entries)
+
+    def select_related(self, *fields):
+        return LogEntrySearchResults(
+            self.queryset.select_related(*fields),
+            self.archived_entries,
+            self._live_count,
+        )
+
+    def prefetch_related(self, *lookups):
+        return LogEntrySearchResults(
+            self.queryset.prefetch_related(*lookups),
+            self.archived_entries,
+            self._live_count,
+        )
+
+    def iterator(self, chunk_size=2000):
+        yield from self.queryset.iterator(chunk_size=chunk_size)
+        yield from self.archived_entries
+
+    def __iter__(self):
+        yield from self.queryset
+        yield from self.archived_entries
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            entries = list(self[index : index + 1])
+            if not entries:
+                raise IndexError(index)
+            return entries[0]
+
+        start, stop = index.start or 0, index.stop
+        if index.step or start < 0 or (stop is not None and stop < 0):
+            raise ValueError("Negative indexes and steps are not supported.")
+
+        live_count = self.live_count
+        live_start = min(start, live_count)
+        live_stop = live_count if stop is None else min(stop, live_count)
+        archived_stop = None if stop is None else max(stop - live_count, 0)
+        return LogEntrySearchResults(
+            self.queryset[live_start:live_stop],
+            self.archived_entries[max(start - live_count, 0) : archived_stop],
+            max(live_stop - live_start, 0),
+        )
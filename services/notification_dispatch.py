@@ -0,0 +1,124 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+from lava import settings as lava_settings
+
+
+class BaseNotificationDispatcher:
+    """
+    Delivers the notifications (NotificationDelivery objects) outside of the
+    request that created them.
+    """
+
+    def dispatch(self, deliveries):
+        raise NotImplementedError
+
+
+class SyncNotificationDispatcher(BaseNotificationDispatcher):
+    """Processes the deliveries immediately, the failed ones are not retried."""
+
+    def dispatch(self, deliveries):
+        for delivery in deliveries:
+            delivery.process()
+
+
+class OutboxNotificationDispatcher(BaseNotificationDispatcher):
+    """
+    Leaves the deliveries in the database, they are processed and retried by
+    the `lava_dispatch_notifications` command.
+    """
+
+    def dispatch(self, deliveries):
+        pass
+
+
+class ThreadPoolNotificationDispatcher(BaseNotificationDispatcher):
+    """
+    Processes the deliveries in a pool of threads once the current transaction
+    is committed. The failed deliveries are retried by the pool after the
+    delay computed by `NotificationDelivery.process()`.
+
+    The retries are lost when the process stops, the `lava_dispatch_notifications`
+    command must run alongside to process them. The deliveries are claimed
+    before being sent, a delivery is never sent by both the pool and the
+    command unless sending it takes more than NOTIFICATION_DELIVERY_CLAIM_TIMEOUT.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="lava-notifications",
+                )
+        return self._executor
+
+    def dispatch(self, deliveries):
+        for delivery in deliveries:
+            transaction.on_commit(
+                lambda delivery=delivery: self.submit(type(delivery), delivery.pk)
+            )
+
+    def submit(self, model, pk):
+        return self.executor.submit(self.run, model, pk)
+
+    def run(self, model, pk):
+        close_old_connections()
+        try:
+            # The delivery may have been sent, or retried, by another worker.
+            deliveries = model.claim_due_deliveries(limit=1, pk=pk)
+            if not deliveries:
+                return None
+            delivery = deliveries[0]
+            result = delivery.process()
+
+            if delivery.status == model.PENDING:
+                delay = delivery.next_attempt_at - delivery.last_attempt_at
+                timer = threading.Timer(
+                    delay.total_seconds(), self.submit, args=(model, pk)
+                )
+                timer.daemon = True
+                timer.start()
+            return result
+        finally:
+            close_old_connections()
+
+
+NOTIFICATION_DISPATCHERS = {
+    "sync": SyncNotificationDispatcher,
+    "thread": ThreadPoolNotificationDispatcher,
+    "outbox": OutboxNotificationDispatcher,
+}
+
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+
+def get_notification_dispatcher(backend=None):
+    """
+    Returns the dispatcher of the given backend, NOTIFICATION_DISPATCH_BACKEND
+    by default. Dispatchers are shared by the whole process.
+    """
+    backend = backend or lava_settings.NOTIFICATION_DISPATCH_BACKEND
+    with _dispatchers_lock:
+        if backend not in _dispatchers:
+            dispatcher_class = NOTIFICATION_DISPATCHERS.get(backend)
+            if dispatcher_class is None:
+                dispatcher_class = import_string(backend)
+            if dispatcher_class is ThreadPoolNotificationDispatcher:
+                dispatcher = dispatcher_class(
+                    max_workers=lava_settings.NOTIFICATION_DISPATCH_WORKERS
+                )
+            else:
+                dispatcher = dispatcher_class()
+            _dispatchers[backend] = dispatcher
+        return _dispatchers[backend]
@@ -0,0 +1,110 @@
+import threading
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from lava import settings as lava_settings
+
+
+class PermissionCache:
+    """
+    Process-wide cache of the permission sets of the users, used by the
+    authentication backend to avoid querying the permissions on every request.
+
+    Entries are keyed by the user id and two versions: a global one, bumped when
+    the permissions of a group change, and a per user one, bumped when the groups
+    or the permissions of the user change. Bumping a version never leaves a
+    stale entry behind, even if it was being computed at the same time.
+
+    The cache is stored in the Django cache `PERMISSION_CACHE_BACKEND` when it
+    is set (eg: a Redis cache shared by all the workers), otherwise in a local
+    memory cache private to the process, which is only suitable for a single
+    process since the invalidations do not reach the other ones.
+    """
+
+    key_prefix = "lava:permissions"
+
+    def __init__(self, backend=None, timeout=None):
+        self.backend = backend
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._cache = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            if self.backend:
+                self._cache = caches[self.backend]
+            else:
+                self._cache = LocMemCache(
+                    self.key_prefix, {"TIMEOUT": self.timeout, "OPTIONS": {}}
+                )
+        return self._cache
+
+    @property
+    def global_version_key(self):
+        return f"{self.key_prefix}:version"
+
+    def get_user_version_key(self, user_id):
+        return f"{self.key_prefix}:version:{user_id}"
+
+    def get_versions(self, user_id):
+        keys = [self.global_version_key, self.get_user_version_key(user_id)]
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                self.cache.add(key, uuid4().hex, timeout=None)
+                versions[key] = self.cache.get(key)
+        return [versions[key] for key in keys]
+
+    def get_key(self, user, versions):
+        superuser_flag = int(user.is_superuser)
+        return f"{self.key_prefix}:{user.pk}:{superuser_flag}:{':'.join(versions)}"
+
+    def get_or_set(self, user, compute):
+        """
+        Returns the cached permission set of the user, `compute()` is called to
+        get it when it is not cached.
+        """
+        key = self.get_key(user, self.get_versions(user.pk))
+        permissions = self.cache.get(key)
+        with self._lock:
+            if permissions is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if permissions is None:
+            permissions = compute()
+            self.cache.set(key, permissions, timeout=self.timeout)
+        return permissions
+
+    def invalidate_user(self, user_id):
+        self.cache.set(self.get_user_version_key(user_id), uuid4().hex, timeout=None)
+
+    def invalidate_all(self):
+        self.cache.set(self.global_version_key, uuid4().hex, timeout=None)
+
+    def get_stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+permission_cache = PermissionCache(
+    backend=lava_settings.PERMISSION_CACHE_BACKEND,
+    timeout=lava_settings.PERMISSION_CACHE_TIMEOUT,
+)
@@ -1,4 +1,5 @@
 import rest_framework.decorators
+from functools import lru_cache
 from typing import Union
 
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -7,10 +8,12 @@ from lava.enums import PermissionActionName
 
 
 # Generic Model PERMISSIONS
-def has_permission(user, model, action: Union[PermissionActionName, str]):
+@lru_cache(maxsize=None)
+def get_permission_names(model, action: Union[PermissionActionName, str]):
     """
-    Checks if a user has the permission to perform the action on the specified model.
-    If action type is 'str' the model param is not used.
+    Returns the full names of the permissions required to perform the action on
+    the specified model: ("<app_label>.<codename>", "auth.<codename>").
+    If action type is 'str' it is used as the codename.
     """
     app_label = model._meta.app_label
     permission_name = action
@@ -19,22 +22,34 @@ def has_permission(user, model, action: Union[PermissionActionName, str]):
         model_name = model.__name__.lower()
         permission_name = f"{action.value}_{model_name}"
 
-    has_perm = user.has_perm(f"{app_label}.{permission_name}")
-    has_auth_perm = user.has_perm(f"auth.{permission_name}")
-    return has_perm or has_auth_perm
+    return f"{app_label}.{permission_name}", f"auth.{permission_name}"
 
 
+def has_permission(user, model, action: Union[PermissionActionName, str]):
+    """
+    Checks if a user has the permission to perform the action on the specified model.
+    If action type is 'str' the model param is not used.
+    """
+    perm, auth_perm = get_permission_names(model, action)
+    return user.has_perm(perm) or user.has_perm(auth_perm)
+
+
+@lru_cache(maxsize=None)
 def get_model_permission_class(model, action: Union[PermissionActionName, str]):
     """
     Returns a PermissionClass that checks if a user has the permission to perform
     the action on the specified model.
+    The classes are created once per (model, action) and reused afterwards.
     """
+    perm, auth_perm = get_permission_names(model, action)
 
     class PermissionClass(IsAuthenticated):
         def has_permission(self, request, view):
             is_authenticated = super().has_permission(request, view)
             user = request.user
-            return is_authenticated and has_permission(user, model, action)
+            return is_authenticated and (
+                user.has_perm(perm) or user.has_perm(auth_perm)
+            )
 
     return PermissionClass
 
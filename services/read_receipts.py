@@ -0,0 +1,97 @@
+from datetime import datetime
+
+from django.utils import timezone
+
+from lava.models import (
+    ChatMessage,
+    MessageReceipt,
+    Notification,
+    NotificationReceipt,
+    User,
+)
+
+
+def sync_read_receipts(batch_size=2000):
+    """
+    Copies the read receipts stored in `ChatMessage.read_by` and
+    `Notification.seen_by` to the receipt tables, the receipts of the tables
+    that are not in the JSON fields being deleted. Run it before switching the
+    READ_RECEIPTS_STORAGE setting from "json" to "table", the receipts are only
+    written to the storage in use.
+    Returns the number of (created, deleted) receipts of each model.
+    """
+    user_ids = set(User.objects.values_list("id", flat=True))
+
+    def get_message_receipts(message_id, read_by, created_at):
+        for user_id, read_at in (read_by or {}).items():
+            if not user_id.isdigit() or int(user_id) not in user_ids:
+                continue
+            try:
+                read_at = datetime.strptime(read_at, "%Y-%m-%d %H:%M:%S %z")
+            except (TypeError, ValueError):
+                read_at = created_at or timezone.now()
+            yield MessageReceipt(
+                message_id=message_id, user_id=int(user_id), read_at=read_at
+            )
+
+    def get_notification_receipts(notification_id, seen_by, date):
+        for user_id in seen_by or []:
+            if user_id in user_ids:
+                yield NotificationReceipt(
+                    notification_id=notification_id, user_id=user_id, read_at=date
+                )
+
+    return {
+        "messages": _sync_receipts(
+            ChatMessage.objects.values_list("id", "read_by", "created_at"),
+            MessageReceipt,
+            "message_id",
+            get_message_receipts,
+            batch_size,
+        ),
+        "notifications": _sync_receipts(
+            Notification.objects.values_list("id", "seen_by", "date"),
+            NotificationReceipt,
+            "notification_id",
+            get_notification_receipts,
+            batch_size,
+        ),
+    }
+
+
+def _sync_receipts(rows, receipt_model, object_field, get_receipts, batch_size):
+    created = deleted = 0
+
+    def sync(batch):
+        nonlocal created, deleted
+        receipts = {
+            (getattr(receipt, object_field), receipt.user_id): receipt
+            for row in batch
+            for receipt in get_receipts(*row)
+        }
+        existing = receipt_model.objects.filter(
+            **{f"{object_field}__in": [row[0] for row in batch]}
+        ).values_list("id", object_field, "user_id")
+
+        stale_ids = []
+        for receipt_id, object_id, user_id in existing:
+            if receipts.pop((object_id, user_id), None) is None:
+                stale_ids.append(receipt_id)
+
+        if stale_ids:
+            deleted += receipt_model.objects.filter(id__in=stale_ids).delete()[0]
+        receipt_model.objects.bulk_create(
+            receipts.values(), batch_size=batch_size, ignore_conflicts=True
+        )
+        created += len(receipts)
+
+    batch = []
+    for row in rows.order_by("id").iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            sync(batch)
+            batch = []
+    if batch:
+        sync(batch)
+
+    return created, deleted
@@ -0,0 +1,136 @@
+from weakref import WeakKeyDictionary
+
+from django.core.exceptions import FieldDoesNotExist
+
+from rest_framework import serializers
+
+
+_lookups_cache = WeakKeyDictionary()
+
+
+def get_related_lookups(serializer_class, max_depth=5):
+    """
+    Returns the (select_related, prefetch_related) lookups needed to serialize
+    the instances of the serializer's model without a query per instance.
+
+    The relations are found from the `source` of the serializer fields, the
+    nested serializers being inspected as well. The relations used by the
+    SerializerMethodFields can not be guessed, they are declared with the
+    `select_related_fields` and `prefetch_related_fields` attributes of the
+    serializers.
+    """
+    if serializer_class in _lookups_cache:
+        return _lookups_cache[serializer_class]
+
+    select_related, prefetch_related = set(), set()
+    model = getattr(getattr(serializer_class, "Meta", None), "model", None)
+    if model is not None:
+        try:
+            serializer = serializer_class()
+        except TypeError:
+            serializer = None
+        if serializer is not None:
+            _collect_lookups(
+                serializer,
+                model,
+                "",
+                False,
+                select_related,
+                prefetch_related,
+                max_depth,
+            )
+
+    lookups = (sorted(select_related), sorted(prefetch_related))
+    _lookups_cache[serializer_class] = lookups
+    return lookups
+
+
+def _collect_lookups(
+    serializer, model, prefix, many, select_related, prefetch_related, depth
+):
+    def add(path, path_many):
+        if path_many:
+            prefetch_related.add(path)
+        else:
+            select_related.add(path)
+
+    def join(path, name):
+        return f"{path}__{name}" if path else name
+
+    for lookup in getattr(serializer, "select_related_fields", []):
+        add(join(prefix, lookup), many)
+    for lookup in getattr(serializer, "prefetch_related_fields", []):
+        add(join(prefix, lookup), True)
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == "*":
+            continue
+
+        relations = []
+        related_model = model
+        path, path_many = prefix, many
+        for attr in field.source.split("."):
+            try:
+                model_field = related_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                related_model = None
+                break
+            if not model_field.is_relation or model_field.related_model is None:
+                related_model = None
+                break
+            path = join(path, attr)
+            path_many = (
+                path_many or model_field.many_to_many or model_field.one_to_many
+            )
+            related_model = model_field.related_model
+            relations.append((path, path_many))
+
+        if (
+            relations
+            and related_model is not None
+            and not relations[-1][1]
+            and isinstance(field, serializers.RelatedField)
+            and field.use_pk_only_optimization()
+        ):
+            # The primary key is read from the foreign key column.
+            relations.pop()
+        for relation in relations:
+            add(*relation)
+
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if (
+            isinstance(nested, serializers.BaseSerializer)
+            and related_model is not None
+            and depth > 0
+        ):
+            _collect_lookups(
+                nested,
+                related_model,
+                path,
+                path_many,
+                select_related,
+                prefetch_related,
+                depth - 1,
+            )
+
+
+def prefetch_serializer_relations(queryset, serializer_class):
+    """
+    Applies the lookups returned by `get_related_lookups()` to the queryset,
+    which is returned unchanged if it is not a queryset of the serializer's
+    model.
+    """
+    model = getattr(getattr(serializer_class, "Meta", None), "model", None)
+    if (
+        model is None
+        or queryset._fields is not None
+        or not issubclass(queryset.model, model)
+    ):
+        return queryset
+
+    select_related, prefetch_related = get_related_lookups(serializer_class)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset
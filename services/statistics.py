@@ -9,9 +9,41 @@ from lava.models import *
 from lava.serializers.backup_serializers import BackupSerializer
 from lava.serializers.user_serializers import UserListSerializer
 from lava.serializers.log_entry_serializer import LogEntrySerializer
+from lava.services.statistics_cache import statistics_cache
+
+
+def get_cached_statistics(section, user, compute):
+    """
+    Returns the statistics of the section as seen by the user, read from the
+    statistics cache, see `StatisticsCache`.
+    """
+    if user is None:
+        return compute(user=user)
+    visibility = "admin" if user.is_admin_user else "user"
+    return statistics_cache.get_or_set(
+        section, visibility, lambda: compute(user=user)
+    )
+
+
+def refresh_statistics():
+    """
+    Computes all the sections of the dashboard for each visibility and stores
+    them in the statistics cache.
+    """
+    admin_user = User.objects.filter(username__in=User.admin_usernames).first()
+    users = {"admin": admin_user, "user": User()}
+    for visibility, user in users.items():
+        if user is None:
+            continue
+        for section, compute in STATISTICS_SECTIONS.items():
+            statistics_cache.set(section, visibility, compute(user=user))
 
 
 def collect_statistics(user=None):
+    return get_cached_statistics("statistics", user, compute_statistics)
+
+
+def compute_statistics(user=None):
 
     # active_sessions = Session.objects.filter(expire_date__gte=timezone.now())
     connected_users = User.filter(user=user, params={"is_active": "True"})[:7]
@@ -43,15 +75,19 @@ def collect_statistics(user=None):
 
 
 def get_daily_actions(user=None):
+    return get_cached_statistics("daily_actions", user, compute_daily_actions)
+
+
+def compute_daily_actions(user=None):
 
     daily_actions = (
         LogEntry.filter(user=user)
-        .order_by("-action_time")
         .annotate(action_day=TruncDate("action_time"))
         .values("action_day")
         .annotate(
             count=Count("id"),
         )
+        .order_by("-action_day")
     )[:30]
 
     actions_data = {
@@ -72,6 +108,10 @@ def get_daily_actions(user=None):
 
 
 def get_indicators(user=None):
+    return get_cached_statistics("indicators", user, compute_indicators)
+
+
+def compute_indicators(user=None):
 
     users_count = User.filter(user=user).count()
     groups_count = Group.filter(user=user).count()
@@ -116,6 +156,10 @@ def get_spaces(user=None):
 
 
 def get_active_users(user=None):
+    return get_cached_statistics("active_users", user, compute_active_users)
+
+
+def compute_active_users(user=None):
 
     connected_users = User.filter(user=user, params={"is_active": "True"})[:7]
 
@@ -125,9 +169,22 @@ def get_active_users(user=None):
 
 
 def get_latest_actions(user=None):
+    return get_cached_statistics("latest_actions", user, compute_latest_actions)
+
+
+def compute_latest_actions(user=None):
 
     latest_actions = LogEntry.filter(user=user)[:7]
 
     latest_actions_serializer = LogEntrySerializer(latest_actions, many=True)
 
     return latest_actions_serializer.data
+
+
+STATISTICS_SECTIONS = {
+    "statistics": compute_statistics,
+    "indicators": compute_indicators,
+    "active_users": compute_active_users,
+    "daily_actions": compute_daily_actions,
+    "latest_actions": compute_latest_actions,
+}
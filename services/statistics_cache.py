@@ -0,0 +1,107 @@
+import time
+
+from django.core.cache import caches
+
+from lava import settings as lava_settings
+
+
+class StatisticsCache:
+    """
+    Store of the precomputed dashboard statistics, read by the dashboard
+    endpoints instead of counting the objects on every request.
+
+    Each section of the dashboard (eg: "indicators") is stored for each
+    visibility ("admin" or "user", the admin users being hidden from the other
+    users) with the time it was computed. A section is computed again when it
+    is older than `max_staleness` seconds, or when it is invalidated because
+    the objects it is computed from have changed.
+
+    The statistics are stored in the Django cache `STATISTICS_CACHE_BACKEND`,
+    which must be shared by all the processes (eg: Redis) for the refreshed
+    and invalidated sections to be seen by every server.
+    """
+
+    key_prefix = "lava:statistics"
+    visibilities = ("admin", "user")
+
+    def __init__(self, backend="default", max_staleness=None):
+        self.backend = backend
+        self.max_staleness = max_staleness
+        self._cache = None
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            self._cache = caches[self.backend or "default"]
+        return self._cache
+
+    def get_key(self, section, visibility):
+        return f"{self.key_prefix}:{section}:{visibility}"
+
+    def get_or_set(self, section, visibility, compute):
+        """
+        Returns the statistics of the section, `compute()` is called to get
+        them when they are not stored or are too old.
+        """
+        entry = self.cache.get(self.get_key(section, visibility))
+        if entry is not None:
+            computed_at, value = entry
+            if self.max_staleness is None or (
+                time.time() - computed_at <= self.max_staleness
+            ):
+                return value
+
+        value = compute()
+        self.set(section, visibility, value)
+        return value
+
+    def set(self, section, visibility, value):
+        self.cache.set(
+            self.get_key(section, visibility), (time.time(), value), timeout=None
+        )
+
+    def invalidate(self, *sections):
+        self.cache.delete_many(
+            [
+                self.get_key(section, visibility)
+                for section in sections
+                for visibility in self.visibilities
+            ]
+        )
+
+    def invalidate_model(self, model):
+        """Invalidates the sections computed from the objects of the model."""
+        model_name = model._meta.concrete_model._meta.object_name
+        self.invalidate(
+            *[
+                section
+                for section, model_names in STATISTICS_DEPENDENCIES.items()
+                if model_name in model_names
+            ]
+        )
+
+    def clear(self):
+        self.cache.delete_many(
+            [
+                self.get_key(section, visibility)
+                for section in STATISTICS_DEPENDENCIES
+                for visibility in self.visibilities
+            ]
+        )
+
+
+# Models whose changes invalidate each section of the dashboard, the sections
+# computed from the journal are only refreshed when they are too old.
+STATISTICS_DEPENDENCIES = {
+    "statistics": ["User", "Group", "Backup"],
+    "indicators": ["User", "Group", "Backup"],
+    "active_users": ["User"],
+    "daily_actions": [],
+    "latest_actions": [],
+}
+
+
+statistics_cache = StatisticsCache(
+    backend=lava_settings.STATISTICS_CACHE_BACKEND,
+    max_staleness=lava_settings.STATISTICS_MAX_STALENESS,
+)
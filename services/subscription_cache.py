@@ -0,0 +1,54 @@
+from lava import settings as lava_settings
+from lava.models import Conversation, NotificationGroup
+from lava.services.permission_cache import PermissionCache
+
+
+class SubscriptionCache(PermissionCache):
+    """
+    Process-wide cache of the channel layer groups the WebSocket consumers of
+    the users subscribe to, so that reconnecting does not query the database.
+    It uses the same versioning as the permissions cache.
+    """
+
+    key_prefix = "lava:subscriptions"
+
+
+subscription_cache = SubscriptionCache(
+    backend=lava_settings.SUBSCRIPTION_CACHE_BACKEND,
+    timeout=lava_settings.SUBSCRIPTION_CACHE_TIMEOUT,
+)
+
+
+def get_user_subscriptions(user, refresh=False):
+    """
+    Returns the ids of the groups, notification groups and conversations of
+    the user:
+    {
+        "groups": [<id>, ...],
+        "notification_groups": [<id>, ...],
+        "conversations": [<id>, ...],
+    }
+    Set `refresh` to query them again, eg: when the cache of the process may
+    not have been invalidated by the process that changed them.
+    The subscriptions are only cached when SUBSCRIPTION_CACHE_ENABLED is set.
+    """
+
+    def get_subscriptions():
+        conversations = Conversation.get_user_conversations(user).order_by()
+        return {
+            "groups": list(user.groups.values_list("id", flat=True)),
+            "notification_groups": list(
+                NotificationGroup.objects.filter(user=user).values_list(
+                    "id", flat=True
+                )
+            ),
+            "conversations": list(conversations.values_list("id", flat=True)),
+        }
+
+    if not lava_settings.SUBSCRIPTION_CACHE_ENABLED:
+        return get_subscriptions()
+
+    if refresh:
+        subscription_cache.invalidate_user(user.pk)
+
+    return subscription_cache.get_or_set(user, get_subscriptions)
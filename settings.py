@@ -56,6 +56,34 @@ GENDER_CHOICES = (("", ""), ("F", _("Female")), ("M", _("Male")))
 
 NOTIFICATION_CATEGORY_CHOICES = (("alert", _("Alert")),)
 
+# How the notifications are delivered (WebSocket, Firebase):
+# - "thread": by a pool of threads of the process, after the transaction that
+#   created the notification is committed. The retries scheduled by a process
+#   are lost when it stops, run `lava_dispatch_notifications -interval <seconds>`
+#   as well so that they are still sent.
+# - "outbox": by the `lava_dispatch_notifications` command, which processes the
+#   deliveries stored in the database.
+# - "sync": immediately, in the thread that created the notification.
+# The dotted path of a BaseNotificationDispatcher subclass can be used as well.
+NOTIFICATION_DISPATCH_BACKEND = getattr(
+    settings, "NOTIFICATION_DISPATCH_BACKEND", "thread"
+)
+NOTIFICATION_DISPATCH_WORKERS = getattr(settings, "NOTIFICATION_DISPATCH_WORKERS", 4)
+NOTIFICATION_DELIVERY_MAX_ATTEMPTS = getattr(
+    settings, "NOTIFICATION_DELIVERY_MAX_ATTEMPTS", 5
+)
+# Delay before the first retry of a failed delivery in seconds, it is doubled
+# after each attempt.
+NOTIFICATION_DELIVERY_RETRY_DELAY = getattr(
+    settings, "NOTIFICATION_DELIVERY_RETRY_DELAY", 30
+)
+# The deliveries are claimed by a worker before being sent, outside of any
+# transaction: the claimed ones are not due for this many seconds, after which
+# another worker sends them again, eg: when the first one was stopped.
+NOTIFICATION_DELIVERY_CLAIM_TIMEOUT = getattr(
+    settings, "NOTIFICATION_DELIVERY_CLAIM_TIMEOUT", 300
+)
+
 ALLOWED_SIGNUP_GROUPS = getattr(
     settings,
     "ALLOWED_SIGNUP_GROUPS",
@@ -109,6 +137,9 @@ BREADCRUMBS_DEPTH_LEVEL = getattr(settings, "BREADCRUMBS_DEPTH_LEVEL", 3)
 LOGO_FILE_PATH = getattr(settings, "LOGO_FILE_PATH", "lava/assets/images/logo/logo.png")
 
 FIREBASE_ACTIVATED = init_firebase()[0]
+# Number of threads sending the batches of a Firebase notification at the
+# same time, each batch is sent to at most 500 devices.
+FIREBASE_SEND_WORKERS = getattr(settings, "FIREBASE_SEND_WORKERS", 4)
 
 REMOTE_BACKUP_CONF = getattr(
     settings,
@@ -204,6 +235,16 @@ CHAT_MESSAGE_CHOICES = (
     ("image", _("Image")),
 )
 
+# Where the read receipts of chat messages and notifications are stored:
+# - "json": in the `ChatMessage.read_by` and `Notification.seen_by` fields.
+# - "table": in the MessageReceipt and NotificationReceipt models, which are
+#   indexed and normalized (one row per reader) but not faster for the unread
+#   counts: `lava_benchmark_read_receipts` measured them about 2.5 to 4 times
+#   slower than "json" on 200k messages, which is why "json" is the default.
+# The receipts are only written to the storage in use, run the
+# `lava_sync_read_receipts` command before switching from "json" to "table".
+READ_RECEIPTS_STORAGE = getattr(settings, "READ_RECEIPTS_STORAGE", "json")
+
 
 # Backup settings
 MIN_HOURS_BETWEEN_BACKUPS = getattr(
@@ -212,3 +253,101 @@ MIN_HOURS_BETWEEN_BACKUPS = getattr(
 MAX_BACKUPS_PER_DAY = getattr(settings, "MAX_BACKUPS_PER_DAY", 1)
 AUTOMATIC_BACKUP_ACTIVE = getattr(settings, "AUTOMATIC_BACKUP_ACTIVE", None)
 backup_scheduler = None
+
+
+# Bulk actions settings
+BULK_ACTION_BATCH_SIZE = getattr(settings, "BULK_ACTION_BATCH_SIZE", 500)
+
+
+# Lists settings
+# The lists requested with `page_size=all` are streamed, the items being
+# fetched and serialized STREAMING_LIST_CHUNK_SIZE at a time. At most
+# STREAMING_LIST_MAX_ROWS items are sent, None to send all of them.
+STREAMING_LIST_CHUNK_SIZE = getattr(settings, "STREAMING_LIST_CHUNK_SIZE", 500)
+STREAMING_LIST_MAX_ROWS = getattr(settings, "STREAMING_LIST_MAX_ROWS", 100000)
+
+
+# Import/export settings
+# Number of objects read and serialized at a time by the XLSX exports.
+XLSX_EXPORT_CHUNK_SIZE = getattr(settings, "XLSX_EXPORT_CHUNK_SIZE", 1000)
+# The exports run as background jobs (ExportJob) call these functions, they
+# receive the job's parameters and a `progress` callback.
+EXPORT_JOB_FUNCTIONS = getattr(
+    settings,
+    "EXPORT_JOB_FUNCTIONS",
+    {"activity_journal": "lava.services.import_export.export_activity_journal"},
+)
+EXPORT_JOB_TYPE_CHOICES = getattr(
+    settings,
+    "EXPORT_JOB_TYPE_CHOICES",
+    (("activity_journal", _("Activity journal")),),
+)
+# The export jobs whose thread has not reported any progress for this number
+# of seconds are considered interrupted (eg: by a restart) and marked as failed.
+EXPORT_JOB_TIMEOUT = getattr(settings, "EXPORT_JOB_TIMEOUT", 300)
+# The activity journals having more entries are exported in the background.
+ACTIVITY_JOURNAL_SYNC_EXPORT_MAX_ROWS = getattr(
+    settings, "ACTIVITY_JOURNAL_SYNC_EXPORT_MAX_ROWS", 10000
+)
+
+
+# Activity journal settings
+# The months of log entries older than LOG_ENTRY_RETENTION_MONTHS are moved to
+# compressed files in LOG_ENTRY_ARCHIVE_ROOT by `lava_archive_log_entries`,
+# which deletes them LOG_ENTRY_ARCHIVE_BATCH_SIZE at a time.
+LOG_ENTRY_RETENTION_MONTHS = getattr(settings, "LOG_ENTRY_RETENTION_MONTHS", 24)
+LOG_ENTRY_ARCHIVE_ROOT = getattr(
+    settings,
+    "LOG_ENTRY_ARCHIVE_ROOT",
+    os.path.join(settings.BASE_DIR, "archive", "log_entries"),
+)
+LOG_ENTRY_ARCHIVE_BATCH_SIZE = getattr(settings, "LOG_ENTRY_ARCHIVE_BATCH_SIZE", 5000)
+# How the log entries of the actions are written: "sync" inserts each entry in
+# the current transaction, "buffered" queues the entries once the transaction
+# is committed and inserts them in bulk from a background thread every
+# AUDIT_LOG_BUFFER_SIZE entries or AUDIT_LOG_FLUSH_INTERVAL seconds.
+# A dotted path to a subclass of BaseAuditLogWriter can also be used.
+AUDIT_LOG_WRITER_BACKEND = getattr(settings, "AUDIT_LOG_WRITER_BACKEND", "sync")
+AUDIT_LOG_BUFFER_SIZE = getattr(settings, "AUDIT_LOG_BUFFER_SIZE", 500)
+AUDIT_LOG_FLUSH_INTERVAL = getattr(settings, "AUDIT_LOG_FLUSH_INTERVAL", 1)
+
+
+# Permissions cache settings
+# Alias of the Django cache (settings.CACHES) used to share the permission sets
+# between processes (eg: a Redis cache). The cache is only enabled by default
+# when it is set: a local memory cache would keep the revoked permissions of
+# the users granted in the other processes until PERMISSION_CACHE_TIMEOUT.
+PERMISSION_CACHE_BACKEND = getattr(settings, "PERMISSION_CACHE_BACKEND", None)
+PERMISSION_CACHE_ENABLED = getattr(
+    settings, "PERMISSION_CACHE_ENABLED", PERMISSION_CACHE_BACKEND is not None
+)
+PERMISSION_CACHE_TIMEOUT = getattr(settings, "PERMISSION_CACHE_TIMEOUT", 300)
+
+
+# WebSocket settings
+# Maximum number of channel layer groups a message is sent to at the same time.
+WS_FANOUT_CONCURRENCY = getattr(settings, "WS_FANOUT_CONCURRENCY", 100)
+# Cache of the channel layer groups the WebSocket consumers of each user
+# subscribe to, invalidated when the groups or the conversations of the users
+# change. Like the permissions cache, it is only enabled by default when a
+# cache shared by the processes is set (SUBSCRIPTION_CACHE_BACKEND): a local
+# cache would keep subscribing the users removed in the other processes from
+# their conversations and groups until SUBSCRIPTION_CACHE_TIMEOUT.
+SUBSCRIPTION_CACHE_BACKEND = getattr(settings, "SUBSCRIPTION_CACHE_BACKEND", None)
+SUBSCRIPTION_CACHE_ENABLED = getattr(
+    settings, "SUBSCRIPTION_CACHE_ENABLED", SUBSCRIPTION_CACHE_BACKEND is not None
+)
+SUBSCRIPTION_CACHE_TIMEOUT = getattr(settings, "SUBSCRIPTION_CACHE_TIMEOUT", 3600)
+# Read receipts sent by a WebSocket client within this delay (in seconds) are
+# written to the database at once, 0 writes each of them immediately.
+WS_READ_RECEIPTS_DELAY = getattr(settings, "WS_READ_RECEIPTS_DELAY", 0.5)
+
+
+# Dashboard settings
+# The dashboard statistics are computed once and read from a cache, they are
+# recomputed when the users, groups or backups change, or when they are older
+# than STATISTICS_MAX_STALENESS seconds. Run `lava_refresh_statistics` to keep
+# them computed ahead of the requests. The cache must be shared by all the
+# processes (eg: Redis), `lava_refresh_statistics` refuses a local memory cache.
+STATISTICS_CACHE_BACKEND = getattr(settings, "STATISTICS_CACHE_BACKEND", "default")
+STATISTICS_MAX_STALENESS = getattr(settings, "STATISTICS_MAX_STALENESS", 60)
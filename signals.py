@@ -1,9 +1,20 @@
 import os
 
+from django.contrib.auth.models import Permission as BasePermissionModel
 from django.core.files.storage import default_storage
 from django.db.models import FileField, signals, ObjectDoesNotExist
 
-from lava.models import User
+from lava.models import (
+    Backup,
+    Conversation,
+    User,
+    Group,
+    NotificationGroup,
+    Permission,
+)
+from lava.services.permission_cache import permission_cache
+from lava.services.statistics_cache import statistics_cache
+from lava.services.subscription_cache import subscription_cache
 
 
 def post_delete_file_cleanup(sender, **kwargs):
@@ -86,6 +97,80 @@ def pre_save_file_cleanup(sender, **kwargs):
                     pass
 
 
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidates the cached permissions of the users whose groups or permissions
+    have changed.
+    """
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    caches = [permission_cache]
+    if sender is User.groups.through:
+        caches.append(subscription_cache)
+
+    for cache in caches:
+        if not reverse:
+            cache.invalidate_user(instance.pk)
+        elif pk_set is None:
+            # The relation was cleared from the group/permission side.
+            cache.invalidate_all()
+        else:
+            for user_id in pk_set:
+                cache.invalidate_user(user_id)
+
+
+def group_permissions_changed(sender, action, **kwargs):
+    """
+    Invalidates all the cached permissions when the permissions of a group change.
+    """
+    if action in ("post_add", "post_remove", "post_clear"):
+        permission_cache.invalidate_all()
+
+
+def permissions_deleted(sender, **kwargs):
+    """
+    Deleting a group or a permission removes the relations without sending
+    m2m_changed signals.
+    """
+    permission_cache.invalidate_all()
+    if sender is not Permission and sender is not BasePermissionModel:
+        subscription_cache.invalidate_all()
+
+
+def conversation_members_changed(sender, instance, created=False, **kwargs):
+    """
+    Invalidates the cached subscriptions of the users who joined or left a
+    conversation, or of all its members when it is deleted or restored.
+    """
+    members = set(instance.members.keys())
+    snapshot = instance.__dict__.get("_snapshot")
+    if (
+        not created
+        and kwargs.get("signal") is signals.post_save
+        and snapshot is not None
+        and snapshot.has("members")
+        and snapshot.has("deleted_at")
+    ):
+        old_members = set(snapshot.get("members").keys())
+        if snapshot.get("deleted_at") == instance.deleted_at:
+            members ^= old_members
+        else:
+            members |= old_members
+
+    for user_id in members:
+        subscription_cache.invalidate_user(user_id)
+
+
+def statistics_changed(sender, **kwargs):
+    """
+    Invalidates the dashboard statistics computed from the objects of the
+    sender, the changes made without signals (eg: bulk updates) are taken into
+    account after STATISTICS_MAX_STALENESS seconds.
+    """
+    statistics_cache.invalidate_model(sender)
+
+
 # Connecting signals
 signals.post_delete.connect(
     post_delete_file_cleanup,
@@ -95,3 +180,42 @@ signals.post_delete.connect(
 signals.pre_save.connect(
     pre_save_file_cleanup, sender=User, dispatch_uid="lava.User.pre_save_file_cleanup"
 )
+
+signals.m2m_changed.connect(
+    user_permissions_changed,
+    sender=User.groups.through,
+    dispatch_uid="lava.User.groups.user_permissions_changed",
+)
+signals.m2m_changed.connect(
+    user_permissions_changed,
+    sender=User.user_permissions.through,
+    dispatch_uid="lava.User.user_permissions.user_permissions_changed",
+)
+signals.m2m_changed.connect(
+    group_permissions_changed,
+    sender=Group.permissions.through,
+    dispatch_uid="lava.Group.permissions.group_permissions_changed",
+)
+for model in (Group, NotificationGroup, Permission, BasePermissionModel):
+    signals.post_delete.connect(
+        permissions_deleted,
+        sender=model,
+        dispatch_uid=f"{model._meta.label}.permissions_deleted",
+    )
+signals.post_save.connect(
+    conversation_members_changed,
+    sender=Conversation,
+    dispatch_uid="lava.Conversation.post_save.conversation_members_changed",
+)
+signals.post_delete.connect(
+    conversation_members_changed,
+    sender=Conversation,
+    dispatch_uid="lava.Conversation.post_delete.conversation_members_changed",
+)
+for model in (User, Group, NotificationGroup, Backup):
+    for signal_name in ("post_save", "post_delete"):
+        getattr(signals, signal_name).connect(
+            statistics_changed,
+            sender=model,
+            dispatch_uid=f"{model._meta.label}.{signal_name}.statistics_changed",
+        )
@@ -7,6 +7,7 @@ from openpyxl.styles.named_styles import NamedStyle
 from openpyxl.styles.alignment import Alignment
 from openpyxl.styles.fills import PatternFill
 from openpyxl.styles.borders import Border, Side
+from openpyxl.styles.differential import DifferentialStyle
 
 from lava.utils import odict
 
@@ -113,3 +114,15 @@ class XLSXStyles:
             font=copy(self.fonts.title),
             alignment=self.alignments.centerleft,
         )
+
+        # Differential styles (conditional formats), the fill and the borders of
+        # the "colored" style applied to a range without styling its cells.
+        self.colored_differential_style = DifferentialStyle(
+            fill=PatternFill(fill_type="solid", fgColor="e5f3f1", bgColor="e5f3f1"),
+            border=Border(
+                left=default_side,
+                right=default_side,
+                top=default_side,
+                bottom=default_side,
+            ),
+        )
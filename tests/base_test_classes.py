@@ -11,6 +11,8 @@ from rest_framework.test import APITestCase, URLPatternsTestCase
 from lava.management.commands.lava_setup import Command as SetUpLava
 from lava.management.commands.lava_install_demo import Command as LavaInstallDemo
 from lava.models import User
+from lava.services.permission_cache import permission_cache
+from lava.services.subscription_cache import subscription_cache
 from lava.utils import odict
 
 
@@ -46,6 +48,9 @@ class BaseAPITest(APITestCase, URLPatternsTestCase, BaseTestMixin):
 
     def setUp(self):
         super().setUp()
+        # The database is rolled back between tests, the cache is not.
+        permission_cache.invalidate_all()
+        subscription_cache.invalidate_all()
         SetUpLava().handle(no_logs=True, reset_perms=None)
         options = {
             "num_users": 3,
@@ -80,6 +85,9 @@ class BaseModelTest(TestCase, BaseTestMixin):
 
     def setUp(self):
         super().setUp()
+        # The database is rolled back between tests, the cache is not.
+        permission_cache.invalidate_all()
+        subscription_cache.invalidate_all()
         SetUpLava().handle(no_logs=True, reset_perms=False)
         LavaInstallDemo().handle(
             num_users=2, suffix="testuser", skip_avatars=True, no_logs=True
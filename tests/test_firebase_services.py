@@ -0,0 +1,129 @@
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from lava import settings as lava_settings
+from lava.models.models import Notification, NotificationDelivery, User
+from lava.services import firebase
+from lava.services.firebase import FirebaseMulticastSender
+from lava.tests.base_test_classes import BaseModelTest
+
+
+class FakeMessaging:
+    """Local fake of the `firebase_admin.messaging` module."""
+
+    class UnregisteredError(Exception):
+        pass
+
+    def __init__(self, unregistered_tokens=(), failing_tokens=()):
+        self.unregistered_tokens = set(unregistered_tokens)
+        # The batches that contain one of these tokens fail as a whole.
+        self.failing_tokens = set(failing_tokens)
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def MulticastMessage(self, tokens, **kwargs):
+        return SimpleNamespace(tokens=tokens, **kwargs)
+
+    def Notification(self, **kwargs):
+        return SimpleNamespace(**kwargs)
+
+    def AndroidConfig(self, **kwargs):
+        return SimpleNamespace(**kwargs)
+
+    def AndroidNotification(self, **kwargs):
+        return SimpleNamespace(**kwargs)
+
+    def send_each_for_multicast(self, message):
+        if len(message.tokens) > 500:
+            raise ValueError("A multicast message can have at most 500 tokens.")
+
+        with self._lock:
+            self.batches.append(message.tokens)
+        if self.failing_tokens.intersection(message.tokens):
+            raise ConnectionError("Firebase is unavailable.")
+        responses = []
+        for token in message.tokens:
+            if token in self.unregistered_tokens:
+                exception = self.UnregisteredError("Unregistered token")
+                responses.append(SimpleNamespace(success=False, exception=exception))
+            else:
+                responses.append(SimpleNamespace(success=True, exception=None))
+        return SimpleNamespace(responses=responses)
+
+
+class FirebaseServicesTest(BaseModelTest):
+    def test_send_in_batches_success(self):
+        """
+        Ensure the tokens are sent in batches of 500 and that the unregistered
+        tokens are reported.
+        """
+        messaging = FakeMessaging(unregistered_tokens=["token_3", "token_1100"])
+        tokens = [f"token_{index}" for index in range(1200)]
+
+        report = FirebaseMulticastSender(messaging=messaging).send(
+            tokens, title="Title", body="Body"
+        )
+
+        batch_sizes = sorted(len(batch) for batch in messaging.batches)
+        self.assertEqual(batch_sizes, [200, 500, 500])
+        self.assertEqual(report["success_count"], 1198)
+        self.assertEqual(report["failure_count"], 2)
+        self.assertEqual(
+            sorted(report["unregistered_tokens"]), ["token_1100", "token_3"]
+        )
+
+    def test_send_firebase_notification_prune_devices(self):
+        """
+        Ensure the devices that are no longer registered are removed from the
+        devices lists of the users.
+        """
+        user_1 = self.users["testuser_1"]
+        user_2 = self.users["testuser_2"]
+        User.objects.filter(pk=user_1.pk).update(device_id_list=["a", "b"])
+        User.objects.filter(pk=user_2.pk).update(device_id_list=["b", "c"])
+        result = Notification(title="Notification").create(
+            send_notification=False, m2m_fields=[("target_users", [user_1, user_2])]
+        )
+        self.assertTrue(result.is_success, result.message)
+
+        messaging = FakeMessaging(unregistered_tokens=["b"])
+        result = result.instance.send_firebase_notification(messaging=messaging)
+        self.assertTrue(result.is_success, result.message)
+        self.assertEqual(result.instance["success_count"], 2)
+
+        self.assertEqual(User.objects.get(pk=user_1.pk).device_id_list, ["a"])
+        self.assertEqual(User.objects.get(pk=user_2.pk).device_id_list, ["c"])
+
+    def test_firebase_delivery_retries_failed_batches(self):
+        """
+        Ensure a failed Firebase delivery is only retried for the devices of
+        the batches that failed.
+        """
+        user = self.users["testuser_1"]
+        tokens = [f"token_{index}" for index in range(600)]
+        User.objects.filter(pk=user.pk).update(device_id_list=tokens)
+        result = Notification(title="Notification").create(
+            send_notification=False, m2m_fields=[("target_users", [user])]
+        )
+        self.assertTrue(result.is_success, result.message)
+        delivery = NotificationDelivery.objects.create(
+            notification=result.instance, channel="firebase"
+        )
+
+        messaging = FakeMessaging(failing_tokens=["token_550"])
+        with patch.object(firebase, "firebase_messaging", messaging), patch(
+            "lava.models.models.firebase_messaging", messaging
+        ), patch.object(lava_settings, "FIREBASE_ACTIVATED", True):
+            self.assertTrue(delivery.process().is_error)
+            self.assertEqual(delivery.status, NotificationDelivery.PENDING)
+            self.assertEqual(delivery.failed_targets, tokens[500:])
+
+            messaging.failing_tokens = set()
+            messaging.batches = []
+            self.assertTrue(delivery.process().is_success)
+
+        self.assertEqual(messaging.batches, [tokens[500:]])
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, NotificationDelivery.SENT)
+        self.assertEqual(delivery.failed_targets, [])
@@ -0,0 +1,186 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+import openpyxl
+from django.contrib.admin.models import CHANGE, LogEntry as BaseLogEntryModel
+from django.contrib.admin.options import get_content_type_for_model
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from lava.models import ExportJob, Group, LogEntry, Notification, Permission
+from lava.services.import_export import export_activity_journal, export_permissions
+from lava.tests.base_test_classes import BaseModelTest
+from lava.views.api_views import ExportActivityJournal, ExportJobAPIView
+
+
+class ImportExportTest(BaseModelTest):
+    def test_export_permissions_matrix(self):
+        """
+        Ensure the permissions of all the groups are fetched at once and that
+        the matrix marks the permissions of each group.
+        """
+        group = Group.objects.order_by("name").first()
+        permission = Permission.objects.first()
+        group.permissions.set([permission])
+
+        with self.assertNumQueries(3):
+            result = export_permissions()
+        self.assertTrue(result.is_success, result.message)
+        self.addCleanup(os.remove, result.instance)
+
+        ws = openpyxl.load_workbook(result.instance).active
+        self.assertEqual(ws["A5"].value, permission.name)
+        self.assertEqual(ws["B4"].value, group.name.upper())
+        self.assertEqual(ws["B5"].value, "X")
+        self.assertIsNone(ws["B6"].value)
+        self.assertEqual(ws.max_row, 4 + Permission.objects.count())
+        # The empty cells are styled by a conditional format of the matrix.
+        self.assertEqual(ws["B5"].style, "colored")
+        self.assertEqual(
+            [str(cf.sqref) for cf in ws.conditional_formatting],
+            [f"B5:{ws.cell(4, ws.max_column).column_letter}{ws.max_row}"],
+        )
+
+    def test_export_activity_journal_num_queries(self):
+        """
+        Ensure the journal is exported with a single query whatever the number
+        of entries, the users and the content types being joined.
+        """
+        user = self.users["testuser_1"]
+        for index in range(5):
+            LogEntry.objects.log_action(
+                user.id,
+                get_content_type_for_model(Group).pk,
+                index,
+                f"Group {index}",
+                CHANGE,
+            )
+        entries_count = BaseLogEntryModel.objects.count()
+
+        with self.assertNumQueries(1):
+            result = export_activity_journal()
+        self.assertTrue(result.is_success, result.message)
+        self.addCleanup(os.remove, result.instance)
+
+        ws = openpyxl.load_workbook(result.instance).active
+        self.assertEqual(ws.max_row, 4 + entries_count)
+        self.assertIn(user.first_name, ws["B5"].value)
+        self.assertEqual(ws["D5"].value, "GROUP")
+
+    def test_export_job_run_success(self):
+        """
+        Ensure an export job writes the file, records its progress and notifies
+        the user who requested it.
+        """
+        user = self.users["testuser_1"]
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+
+        with override_settings(MEDIA_ROOT=media_root):
+            job = ExportJob(user=user, export_type="activity_journal")
+            job.save()
+            job.run()
+
+            job = ExportJob.objects.get(pk=job.pk)
+            self.assertEqual(job.status, ExportJob.COMPLETED)
+            self.assertEqual(job.processed, BaseLogEntryModel.objects.count())
+            self.assertEqual(job.total, job.processed)
+            self.assertEqual(job.progress, 100)
+            self.assertTrue(os.path.exists(job.export_file.path))
+
+        notification = Notification.objects.filter(target_users=user).first()
+        self.assertEqual(notification.url, job.export_file.url)
+
+    def test_export_activity_journal_background(self):
+        """
+        Ensure the journal export can be started as a job whose progress is
+        returned to the user who requested it only.
+        """
+        superuser = self.users["eksuperuser"]
+        request = APIRequestFactory().get("/", {"background": "true"})
+        force_authenticate(request, user=superuser)
+        response = ExportActivityJournal.as_view()(request)
+        self.assertEqual(response.status_code, 202)
+        job = ExportJob.objects.get(pk=response.data["job"]["id"])
+        self.assertEqual(job.status, ExportJob.PENDING)
+
+        for user, status_code in [(superuser, 200), (self.users["testuser_1"], 404)]:
+            request = APIRequestFactory().get("/")
+            force_authenticate(request, user=user)
+            response = ExportJobAPIView.as_view()(request, pk=job.pk)
+            self.assertEqual(response.status_code, status_code)
+
+    def test_stale_export_job_failed(self):
+        """
+        Ensure a job whose thread stopped reporting its progress is marked as
+        failed when its status is requested, and that the user is notified.
+        """
+        user = self.users["testuser_1"]
+        job = ExportJob(user=user, export_type="activity_journal")
+        job.save()
+        ExportJob.objects.filter(pk=job.pk).update(
+            status=ExportJob.RUNNING,
+            heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, user=user)
+        response = ExportJobAPIView.as_view()(request, pk=job.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], ExportJob.FAILED)
+
+        job = ExportJob.objects.get(pk=job.pk)
+        self.assertIsNotNone(job.finished_at)
+        self.assertFalse(job.fail_if_stale())
+        self.assertEqual(
+            Notification.objects.filter(
+                target_users=user, title="Export failed"
+            ).count(),
+            1,
+        )
+
+    def test_failed_export_job_not_completed(self):
+        """
+        Ensure a job marked as failed while it is running, eg: because it was
+        too slow, is stopped and its user is not notified of its completion.
+        """
+        user = self.users["testuser_1"]
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        set_progress = ExportJob.set_progress
+        get_filename = ExportJob.get_filename
+
+        def fail_job(job):
+            ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.FAILED)
+
+        def set_progress_after_failure(job, processed, total):
+            fail_job(job)
+            set_progress(job, processed, total)
+
+        def get_filename_after_failure(job):
+            fail_job(job)
+            return get_filename(job)
+
+        with override_settings(MEDIA_ROOT=media_root):
+            # Failed while the rows are exported.
+            with patch.object(ExportJob, "set_progress", set_progress_after_failure):
+                job = ExportJob(user=user, export_type="activity_journal")
+                job.save()
+                job.run()
+            self.assertEqual(job.status, ExportJob.FAILED)
+            self.assertEqual(job.processed, 0)
+
+            # Failed while the file is uploaded, after the last chunk.
+            with patch.object(ExportJob, "get_filename", get_filename_after_failure):
+                job = ExportJob(user=user, export_type="activity_journal")
+                job.save()
+                job.run()
+            self.assertEqual(job.status, ExportJob.FAILED)
+            self.assertFalse(job.export_file)
+            self.assertEqual(os.listdir(os.path.join(media_root, "exports")), [])
+
+        self.assertFalse(Notification.objects.filter(target_users=user).exists())
@@ -0,0 +1,241 @@
+from unittest.mock import patch
+
+from django.contrib.admin.models import CHANGE
+from django.contrib.admin.options import get_content_type_for_model
+
+from lava import settings as lava_settings
+from lava.models import LogEntry
+from lava.models.chat_models import ChatMessage, Conversation, MessageReceipt
+from lava.serializers.chat_serializers import ConversationListSerializer
+from lava.services.read_receipts import sync_read_receipts
+from lava.services.subscription_cache import get_user_subscriptions
+from lava.tests.base_test_classes import BaseModelTest
+
+
+class ConversationModelTest(BaseModelTest):
+    def create_conversation(self, name="Conversation"):
+        user = self.users["testuser_1"]
+        conversation = Conversation(name=name, is_group_conversation=True)
+        result = conversation.create(user, members=[self.users["testuser_2"]])
+        self.assertTrue(result.is_success, result.message)
+        return conversation
+
+    def send_message(self, conversation, sender, text="Hello"):
+        message = ChatMessage(sender=sender, conversation=conversation, text=text)
+        result = message.create(sender)
+        self.assertTrue(result.is_success, result.message)
+        return message
+
+    def test_conversation_activity_success(self):
+        """
+        Ensure the last message and the unread counters of a conversation are
+        kept up to date when messages are sent, read and deleted.
+        """
+        sender = self.users["testuser_1"]
+        recipient = self.users["testuser_2"]
+        conversation = self.create_conversation()
+        first_message = self.send_message(conversation, sender, "First")
+        last_message = self.send_message(conversation, sender, "Second")
+
+        conversation = Conversation.objects.get(pk=conversation.pk)
+        self.assertEqual(conversation.last_message, last_message)
+        self.assertEqual(conversation.last_activity_at, last_message.created_at)
+        self.assertEqual(conversation.get_unread_count(recipient), 2)
+        self.assertEqual(conversation.get_unread_count(sender), 0)
+
+        result = first_message.mark_as_read(recipient)
+        self.assertTrue(result.is_success, result.message)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.get_unread_count(recipient), 1)
+
+        result = last_message.delete(sender)
+        self.assertTrue(result.is_success, result.message)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message, first_message)
+        self.assertEqual(conversation.get_unread_count(recipient), 0)
+
+        self.send_message(conversation, sender, "Third")
+        result = conversation.mark_as_read(recipient)
+        self.assertTrue(result.is_success, result.message)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.get_unread_count(recipient), 0)
+
+    def test_mark_as_read_bulk_unread_counts(self):
+        """
+        Ensure marking many messages as read updates the unread counters of
+        their conversations.
+        """
+        sender = self.users["testuser_1"]
+        recipient = self.users["testuser_2"]
+        conversation = self.create_conversation()
+        messages = [self.send_message(conversation, sender) for _ in range(3)]
+
+        result = ChatMessage.mark_as_read_bulk(messages[:2], recipient)
+        self.assertTrue(result.is_success, result.message)
+        self.assertEqual(result.instance, 2)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.get_unread_count(recipient), 1)
+
+    def test_send_message_bumps_conversation_activity(self):
+        """
+        Ensure sending a message bumps the conversation's last update date
+        without saving nor logging a change of the whole conversation.
+        """
+        sender = self.users["testuser_1"]
+        conversation = self.create_conversation()
+        last_updated_at = Conversation.objects.get(pk=conversation.pk).last_updated_at
+        members = {**conversation.members, "0": {"muted": False, "unmute_at": None}}
+        Conversation.objects.filter(pk=conversation.pk).update(members=members)
+
+        self.send_message(conversation, sender)
+
+        conversation = Conversation.objects.get(pk=conversation.pk)
+        self.assertGreater(conversation.last_updated_at, last_updated_at)
+        self.assertEqual(conversation.members, members)
+        self.assertFalse(
+            LogEntry.objects.filter(
+                content_type=get_content_type_for_model(Conversation),
+                object_id=str(conversation.pk),
+                action_flag=CHANGE,
+            ).exists()
+        )
+
+    def test_conversation_list_num_queries(self):
+        """
+        Ensure the number of queries of the conversations list does not depend
+        on the number of conversations.
+        """
+        sender = self.users["testuser_1"]
+        recipient = self.users["testuser_2"]
+
+        def serialize():
+            conversations = Conversation.get_user_conversations(
+                recipient
+            ).select_related("last_message__sender")
+            return ConversationListSerializer(
+                conversations, many=True, user=recipient
+            ).data
+
+        conversation = self.create_conversation()
+        self.send_message(conversation, sender)
+        with self.assertNumQueries(2):
+            data = serialize()
+        self.assertEqual(data[0]["unread"], 1)
+
+        for index in range(5):
+            conversation = self.create_conversation(f"Conversation {index}")
+            self.send_message(conversation, sender)
+        with self.assertNumQueries(2):
+            data = serialize()
+        self.assertEqual(len(data), 6)
+
+    def test_delete_restore_message_unread_counts(self):
+        """
+        Ensure the unread counters only change when a message is deleted from
+        or restored to the conversation.
+        """
+        sender = self.users["testuser_1"]
+        recipient = self.users["testuser_2"]
+        conversation = self.create_conversation()
+        first_message = self.send_message(conversation, sender, "First")
+        second_message = self.send_message(conversation, sender, "Second")
+
+        def get_unread_count():
+            return Conversation.objects.get(pk=conversation.pk).get_unread_count(
+                recipient
+            )
+
+        self.assertTrue(second_message.delete(sender).is_success)
+        self.assertFalse(second_message.delete(sender).is_error)
+        self.assertEqual(get_unread_count(), 1)
+
+        self.assertTrue(second_message.restore(sender).is_success)
+        self.assertEqual(get_unread_count(), 2)
+        self.assertEqual(
+            Conversation.objects.get(pk=conversation.pk).last_message, second_message
+        )
+
+        self.assertTrue(first_message.delete(sender).is_success)
+        self.assertTrue(first_message.delete(sender, soft_delete=False).is_success)
+        self.assertEqual(get_unread_count(), 1)
+
+        self.assertTrue(second_message.delete(sender, soft_delete=False).is_success)
+        self.assertEqual(get_unread_count(), 0)
+        self.assertIsNone(Conversation.objects.get(pk=conversation.pk).last_message)
+
+    def test_sync_read_receipts_success(self):
+        """
+        Ensure the read receipts written in the JSON fields are copied to the
+        receipts table, so that no receipt is lost when switching storages.
+        """
+        sender = self.users["testuser_1"]
+        recipient = self.users["testuser_2"]
+        conversation = self.create_conversation()
+        read_message = self.send_message(conversation, sender, "Read")
+        unread_message = self.send_message(conversation, sender, "Unread")
+        read_message.mark_as_read(recipient)
+        MessageReceipt.objects.create(message=unread_message, user=recipient)
+
+        report = sync_read_receipts()
+
+        self.assertEqual(report["messages"], (1, 1))
+        self.assertEqual(
+            list(
+                MessageReceipt.objects.filter(
+                    message__conversation=conversation
+                ).values_list("message", "user")
+            ),
+            [(read_message.pk, recipient.pk)],
+        )
+        with patch.object(lava_settings, "READ_RECEIPTS_STORAGE", "table"):
+            self.assertTrue(read_message.is_read_by(recipient))
+            self.assertFalse(unread_message.is_read_by(recipient))
+            conversation = Conversation.objects.get(pk=conversation.pk)
+            self.assertEqual(conversation.get_unread_count(recipient), 1)
+
+    def test_conversation_list_table_receipts_num_queries(self):
+        """
+        Ensure the read receipts of the latest messages are loaded with a
+        single query when they are stored in the receipts table.
+        """
+        sender = self.users["testuser_1"]
+        recipient = self.users["testuser_2"]
+        for index in range(3):
+            conversation = self.create_conversation(f"Conversation {index}")
+            self.send_message(conversation, sender).mark_as_read(recipient)
+        sync_read_receipts()
+
+        conversations = Conversation.get_user_conversations(recipient).select_related(
+            "last_message__sender"
+        )
+        with patch.object(lava_settings, "READ_RECEIPTS_STORAGE", "table"):
+            with self.assertNumQueries(3):
+                data = ConversationListSerializer(
+                    conversations, many=True, user=recipient
+                ).data
+
+        self.assertEqual(len(data), 3)
+        for conversation in data:
+            self.assertIn(str(recipient.pk), conversation["latest_message"]["read_by"])
+
+    @patch.object(lava_settings, "SUBSCRIPTION_CACHE_ENABLED", True)
+    def test_bulk_delete_restore_conversation_subscriptions(self):
+        """
+        Ensure the cached subscriptions of the members are invalidated when
+        conversations are trashed or restored in bulk.
+        """
+        member = self.users["testuser_2"]
+        conversation = self.create_conversation()
+        self.assertIn(conversation.id, get_user_subscriptions(member)["conversations"])
+
+        queryset = Conversation.objects.filter(pk=conversation.pk)
+        result = Conversation.bulk_delete(queryset)
+        self.assertFalse(result.is_error, result.message)
+        self.assertNotIn(
+            conversation.id, get_user_subscriptions(member)["conversations"]
+        )
+
+        queryset = Conversation.trash.filter(pk=conversation.pk)
+        result = Conversation.bulk_restore(queryset)
+        self.assertFalse(result.is_error, result.message)
+        self.assertIn(conversation.id, get_user_subscriptions(member)["conversations"])
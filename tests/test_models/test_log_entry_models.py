@@ -1,9 +1,25 @@
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
 from django.contrib.admin.options import get_content_type_for_model
-from django.contrib.admin.models import CHANGE
+from django.contrib.admin.models import ADDITION, CHANGE
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
 from django.http import QueryDict
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
 
+from lava import settings as lava_settings
+from lava.models import base_models
 from lava.models.models import *
+from lava.services.audit_log import BufferedAuditLogWriter
+from lava.services.log_entry_archive import LogEntrySearchResults, archive_log_entries
 from lava.tests.base_test_classes import BaseModelTest
+from lava.views.api_views.log_entry_api_views import LogEntryAPIViewSet
 
 
 class UserModelTest(BaseModelTest):
@@ -17,3 +33,283 @@ class UserModelTest(BaseModelTest):
         if index == -1:
             return log_entries
         return log_entries[index]
+
+    def log_actions(self, user, action_flag, count=3):
+        for index in range(count):
+            LogEntry.objects.log_action(
+                user.id,
+                get_content_type_for_model(Group).pk,
+                index,
+                f"Group {index}",
+                action_flag,
+            )
+
+    def test_filter_log_entries_narrow_results(self):
+        """Ensure the journal filters narrow the results down."""
+        user = self.users["testuser_1"]
+        other_user = self.users["testuser_2"]
+        self.log_actions(user, CHANGE)
+        self.log_actions(user, ADDITION)
+        self.log_actions(other_user, CHANGE)
+
+        params = QueryDict(mutable=True)
+        params.update(
+            {"user": user.id, "action_type": CHANGE, "content_type": "lava.Group"}
+        )
+        queryset = LogEntry.filter(params=params)
+        self.assertEqual(queryset.count(), 3)
+        self.assertFalse(queryset.exclude(user=user, action_flag=CHANGE).exists())
+
+        params = QueryDict(mutable=True)
+        params.update({"content_type": "lava.Unknown"})
+        self.assertFalse(LogEntry.filter(params=params).exists())
+
+    def test_filter_log_entries_use_indexes(self):
+        """
+        Ensure the journal queries filtered by user, content type or date use
+        the indexes on the action time.
+        """
+        if connection.vendor != "postgresql":
+            self.skipTest("The query plans are only checked on PostgreSQL.")
+
+        user = self.users["testuser_1"]
+        day = timezone.now().strftime("%m-%d-%Y")
+        querysets = {
+            "lava_logentry_user_time_idx": {"user": user.id},
+            "lava_logentry_ctype_time_idx": {"content_type": "lava.Group"},
+            "lava_logentry_time_idx": {"created_after": day},
+        }
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        for index_name, filters in querysets.items():
+            params = QueryDict(mutable=True)
+            params.update(filters)
+            queryset = LogEntry.filter(
+                user=self.users["eksuperuser"],
+                params=params,
+                include_admin_entries=True,
+            )
+            with self.subTest(index=index_name):
+                self.assertIn(index_name, queryset[:20].explain())
+
+    def test_archive_log_entries_search(self):
+        """
+        Ensure the old months of the journal are moved to the archives, and
+        that the searches reaching into these months return them.
+        """
+        user = self.users["testuser_1"]
+        other_user = self.users["testuser_2"]
+        action_time = timezone.now() - timedelta(days=3 * 365)
+        content_type_id = get_content_type_for_model(Group).pk
+        LogEntry.bulk_log_actions(
+            [
+                {
+                    "user_id": entry_user.id,
+                    "content_type_id": content_type_id,
+                    "object_id": index,
+                    "object_repr": f"Group {index}",
+                    "action_flag": CHANGE,
+                    "action_time": action_time,
+                }
+                for index, entry_user in enumerate([user, user, user, other_user])
+            ]
+        )
+        self.log_actions(user, CHANGE, count=2)
+
+        archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_root)
+        with patch.object(lava_settings, "LOG_ENTRY_ARCHIVE_ROOT", archive_root):
+            archives = archive_log_entries(months=24)
+            self.assertEqual(len(archives), 1)
+            self.assertEqual(archives[0].entries_count, 4)
+            self.assertFalse(
+                LogEntry.objects.filter(action_time__lte=action_time).exists()
+            )
+
+            params = QueryDict(mutable=True)
+            params.update({"user": str(user.id)})
+            self.assertEqual(LogEntry.filter(params=params).count(), 2)
+
+            params["created_after"] = action_time.strftime("%m-%d-%Y")
+            results = LogEntry.filter(params=params)
+            self.assertIsInstance(results, LogEntrySearchResults)
+            self.assertEqual(results.count(), 5)
+            self.assertEqual(len(list(results[1:4])), 3)
+            archived_entry = results[4]
+            self.assertEqual(archived_entry.user, user)
+            self.assertEqual(archived_entry.object_repr, "Group 0")
+
+            request = APIRequestFactory().get("/", {**params.dict(), "page_size": 4})
+            force_authenticate(request, user=self.users["eksuperuser"])
+            response = LogEntryAPIViewSet.as_view({"get": "list"})(request)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["count"], 5)
+            self.assertEqual(len(response.data["results"]), 4)
+
+    def test_archive_log_entries_after_failure(self):
+        """
+        Ensure the entries left in the database by a run that failed after
+        writing the archive file are not archived twice by the next run.
+        """
+        user = self.users["testuser_1"]
+        action_time = timezone.now() - timedelta(days=3 * 365)
+        content_type_id = get_content_type_for_model(Group).pk
+
+        def log_old_actions(count):
+            LogEntry.bulk_log_actions(
+                [
+                    {
+                        "user_id": user.id,
+                        "content_type_id": content_type_id,
+                        "object_id": index,
+                        "object_repr": f"Group {index}",
+                        "action_flag": CHANGE,
+                        "action_time": action_time,
+                    }
+                    for index in range(count)
+                ]
+            )
+
+        archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_root)
+        with patch.object(lava_settings, "LOG_ENTRY_ARCHIVE_ROOT", archive_root):
+            log_old_actions(2)
+            call_command("lava_archive_log_entries", months=24, stdout=StringIO())
+
+            log_old_actions(3)
+            with patch.object(
+                LogEntryArchive, "save", side_effect=DatabaseError("Failure")
+            ), self.assertRaises(DatabaseError):
+                call_command("lava_archive_log_entries", months=24, stdout=StringIO())
+            self.assertEqual(
+                LogEntry.objects.filter(action_time__lte=action_time).count(), 3
+            )
+
+            call_command("lava_archive_log_entries", months=24, stdout=StringIO())
+            archive = LogEntryArchive.objects.get()
+            self.assertEqual(archive.entries_count, 5)
+            ids = [row["id"] for row in archive.iter_rows()]
+            self.assertEqual(len(ids), 5)
+            self.assertEqual(len(set(ids)), 5)
+            self.assertFalse(
+                LogEntry.objects.filter(action_time__lte=action_time).exists()
+            )
+
+    def test_archived_log_entries_read_lazily(self):
+        """
+        Ensure the searches only read the archives of the months needed by the
+        requested entries, newest first.
+        """
+        user = self.users["testuser_1"]
+        content_type_id = get_content_type_for_model(Group).pk
+        now = timezone.now()
+        action_times = [now - timedelta(days=3 * 365), now - timedelta(days=4 * 365)]
+        LogEntry.bulk_log_actions(
+            [
+                {
+                    "user_id": user.id,
+                    "content_type_id": content_type_id,
+                    "object_id": index,
+                    "object_repr": f"Group {index}",
+                    "action_flag": CHANGE,
+                    "action_time": action_time,
+                }
+                for action_time in action_times
+                for index in range(3)
+            ]
+        )
+
+        archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_root)
+        with patch.object(lava_settings, "LOG_ENTRY_ARCHIVE_ROOT", archive_root):
+            self.assertEqual(len(archive_log_entries(months=24)), 2)
+
+            params = QueryDict(mutable=True)
+            params.update(
+                {
+                    "user": str(user.id),
+                    "created_after": action_times[1].strftime("%m-%d-%Y"),
+                }
+            )
+            results = LogEntry.filter(params=params)
+            live_count = results.live_count
+            read_archives = []
+            iter_rows = LogEntryArchive.iter_rows
+
+            def read_rows(archive):
+                read_archives.append(archive.file_name)
+                return iter_rows(archive)
+
+            with patch.object(LogEntryArchive, "iter_rows", read_rows):
+                list(results[:live_count])
+                self.assertEqual(read_archives, [])
+
+                entries = list(results[live_count : live_count + 2])
+                self.assertEqual(len(read_archives), 1)
+                self.assertEqual(
+                    [entry.action_time.year for entry in entries],
+                    [action_times[0].year] * 2,
+                )
+
+                # The entries of the months already read are counted once.
+                read_archives.clear()
+                self.assertEqual(results.count(), live_count + 6)
+                self.assertEqual(len(read_archives), 1)
+
+                read_archives.clear()
+                entries = list(results[live_count + 4 : live_count + 6])
+                self.assertEqual(len(read_archives), 1)
+                self.assertEqual(
+                    [entry.action_time.year for entry in entries],
+                    [action_times[1].year] * 2,
+                )
+
+    def test_buffered_log_action_success(self):
+        """
+        Ensure the buffered audit log writer queues the entries of the
+        committed transactions only, and writes them when it is closed.
+        """
+        user = self.users["testuser_1"]
+        group = Group.objects.first()
+        writer = BufferedAuditLogWriter(max_records=100, flush_interval=60)
+        entries = LogEntry.objects.filter(
+            content_type=get_content_type_for_model(Group), object_id=str(group.pk)
+        )
+        entries_count = entries.count()
+
+        with patch.object(base_models, "get_audit_log_writer", lambda: writer):
+            with self.captureOnCommitCallbacks(execute=True):
+                group.log_action(user, CHANGE, "Committed")
+                with self.assertRaises(ValueError), transaction.atomic():
+                    group.log_action(user, CHANGE, "Rolled back")
+                    raise ValueError
+            self.assertEqual(entries.count(), entries_count)
+
+        self.assertEqual(writer.close(), 1)
+        entry = entries.first()
+        self.assertEqual(entries.count(), entries_count + 1)
+        self.assertEqual(entry.change_message, "Committed")
+        self.assertEqual(entry.user, user)
+
+    def test_buffered_writer_flush_from_thread(self):
+        """
+        Ensure the queued entries are written by the writer's thread as soon as
+        the buffer is full.
+        """
+        batches = []
+        flushed = threading.Event()
+
+        def bulk_log_actions(entries, batch_size=None):
+            batches.append(entries)
+            flushed.set()
+            return len(entries)
+
+        writer = BufferedAuditLogWriter(max_records=2, flush_interval=60)
+        with patch.object(LogEntry, "bulk_log_actions", bulk_log_actions):
+            writer.enqueue({"object_id": 1})
+            self.assertFalse(flushed.wait(0.2))
+            writer.enqueue({"object_id": 2})
+            self.assertTrue(flushed.wait(5))
+            writer.close()
+
+        self.assertEqual(batches, [[{"object_id": 1}, {"object_id": 2}]])
@@ -1,9 +1,15 @@
+from unittest.mock import patch
+
 from django.contrib.admin.options import get_content_type_for_model
 from django.contrib.admin.models import CHANGE
 from django.http import QueryDict
 
+from lava import settings as lava_settings
 from lava.models.models import *
 from lava.tests.base_test_classes import BaseModelTest
+from lava.services.notification_dispatch import ThreadPoolNotificationDispatcher
+from lava.tests.test_ws_services import FakeChannelLayer
+from lava.ws import services as ws_services
 
 
 class UserModelTest(BaseModelTest):
@@ -17,3 +23,183 @@ class UserModelTest(BaseModelTest):
         if index == -1:
             return notifications
         return notifications[index]
+
+    def test_mark_as_read_bulk_success(self):
+        """
+        Ensure we can mark many notifications as read, and that the notifications
+        already read are not updated again.
+        """
+        user = self.users["testuser_1"]
+        for title in ["First notification", "Second notification"]:
+            result = Notification(title=title).create(
+                send_notification=False, m2m_fields=[("target_users", [user])]
+            )
+            self.assertTrue(result.is_success, result.message)
+
+        result = Notification.mark_as_read_bulk(Notification.objects.all(), user)
+        self.assertTrue(result.is_success, result.message)
+        self.assertEqual(result.instance, 2)
+        for notification in Notification.objects.all():
+            self.assertTrue(notification.seen(user))
+
+        result = Notification.mark_as_read_bulk(Notification.objects.all(), user)
+        self.assertEqual(result.instance, 0)
+
+    def test_mark_as_read_bulk_table_storage_success(self):
+        """
+        Ensure we can mark many notifications as read when the read receipts are
+        stored in the NotificationReceipt table.
+        """
+        user = self.users["testuser_1"]
+        for title in ["First notification", "Second notification"]:
+            result = Notification(title=title).create(
+                send_notification=False, m2m_fields=[("target_users", [user])]
+            )
+            self.assertTrue(result.is_success, result.message)
+
+        with patch.object(lava_settings, "READ_RECEIPTS_STORAGE", "table"):
+            self.assertEqual(user.get_unread_notifications().count(), 2)
+
+            result = Notification.mark_as_read_bulk(Notification.objects.all(), user)
+            self.assertTrue(result.is_success, result.message)
+            self.assertEqual(result.instance, 2)
+            self.assertEqual(user.get_unread_notifications().count(), 0)
+            for notification in user.get_notifications():
+                self.assertTrue(notification.seen(user))
+
+        self.assertEqual(NotificationReceipt.objects.filter(user=user).count(), 2)
+
+    def test_outbox_dispatch_retry_success(self):
+        """
+        Ensure the deliveries of a notification are recorded when it is created,
+        and that a failed delivery is retried until it is sent.
+        """
+        user = self.users["testuser_1"]
+        channel_layer = FakeChannelLayer(failing_group_names=[f"user_{user.id}"])
+
+        with patch.object(lava_settings, "NOTIFICATION_DISPATCH_BACKEND", "outbox"):
+            result = Notification(title="Notification").create(
+                m2m_fields=[("target_users", [user])]
+            )
+        self.assertTrue(result.is_success, result.message)
+        delivery = NotificationDelivery.objects.get(notification=result.instance)
+        self.assertEqual(delivery.status, NotificationDelivery.PENDING)
+        self.assertEqual(delivery.attempts, 0)
+
+        with patch.object(ws_services, "get_channel_layer", lambda: channel_layer):
+            self.assertEqual(NotificationDelivery.process_pending(), 1)
+            delivery.refresh_from_db()
+            self.assertEqual(delivery.status, NotificationDelivery.PENDING)
+            self.assertEqual(delivery.attempts, 1)
+            self.assertGreater(delivery.next_attempt_at, delivery.last_attempt_at)
+            # The retry is not due yet.
+            self.assertEqual(NotificationDelivery.process_pending(), 0)
+
+            channel_layer.failing_group_names = []
+            NotificationDelivery.objects.filter(pk=delivery.pk).update(
+                next_attempt_at=timezone.now()
+            )
+            self.assertEqual(NotificationDelivery.process_pending(), 1)
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, NotificationDelivery.SENT)
+        self.assertEqual(delivery.attempts, 2)
+        self.assertEqual(channel_layer.sent, [f"user_{user.id}"])
+
+    def test_thread_dispatch_skips_processed_delivery(self):
+        """
+        Ensure the thread pool does not send a delivery again once it has been
+        processed by another worker.
+        """
+        user = self.users["testuser_1"]
+        channel_layer = FakeChannelLayer(failing_group_names=[f"user_{user.id}"])
+        dispatcher = ThreadPoolNotificationDispatcher()
+
+        with patch.object(lava_settings, "NOTIFICATION_DISPATCH_BACKEND", "outbox"):
+            result = Notification(title="Notification").create(
+                m2m_fields=[("target_users", [user])]
+            )
+        delivery = NotificationDelivery.objects.get(notification=result.instance)
+
+        # close_old_connections() would close the test case's transaction.
+        with patch.object(
+            ws_services, "get_channel_layer", lambda: channel_layer
+        ), patch("lava.services.notification_dispatch.close_old_connections"):
+            self.assertEqual(NotificationDelivery.process_pending(), 1)
+            # The retry scheduled by the worker is not due yet.
+            self.assertIsNone(dispatcher.run(NotificationDelivery, delivery.pk))
+
+            channel_layer.failing_group_names = []
+            NotificationDelivery.objects.filter(pk=delivery.pk).update(
+                next_attempt_at=timezone.now()
+            )
+            self.assertTrue(dispatcher.run(NotificationDelivery, delivery.pk).is_success)
+            self.assertIsNone(dispatcher.run(NotificationDelivery, delivery.pk))
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, NotificationDelivery.SENT)
+        self.assertEqual(delivery.attempts, 2)
+        self.assertEqual(channel_layer.sent, [f"user_{user.id}"])
+
+    def test_outbox_dispatch_retry_failed_groups(self):
+        """
+        Ensure only the channel layer groups that could not be reached are sent
+        the notification again.
+        """
+        user = self.users["testuser_1"]
+        other_user = self.users["testuser_2"]
+        channel_layer = FakeChannelLayer(failing_group_names=[f"user_{user.id}"])
+
+        with patch.object(lava_settings, "NOTIFICATION_DISPATCH_BACKEND", "outbox"):
+            result = Notification(title="Notification").create(
+                m2m_fields=[("target_users", [user, other_user])]
+            )
+        self.assertTrue(result.is_success, result.message)
+        delivery = NotificationDelivery.objects.get(notification=result.instance)
+
+        with patch.object(ws_services, "get_channel_layer", lambda: channel_layer):
+            self.assertEqual(NotificationDelivery.process_pending(), 1)
+            delivery.refresh_from_db()
+            self.assertEqual(delivery.failed_targets, [f"user_{user.id}"])
+
+            channel_layer.failing_group_names = []
+            NotificationDelivery.objects.filter(pk=delivery.pk).update(
+                next_attempt_at=timezone.now()
+            )
+            self.assertEqual(NotificationDelivery.process_pending(), 1)
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, NotificationDelivery.SENT)
+        self.assertEqual(delivery.failed_targets, [])
+        self.assertEqual(
+            channel_layer.sent, [f"user_{other_user.id}", f"user_{user.id}"]
+        )
+
+    def test_process_pending_claims_deliveries(self):
+        """
+        Ensure the deliveries are claimed before being sent, so that they are
+        not due for the other workers while the notification is being sent.
+        """
+        user = self.users["testuser_1"]
+        with patch.object(lava_settings, "NOTIFICATION_DISPATCH_BACKEND", "outbox"):
+            result = Notification(title="Notification").create(
+                m2m_fields=[("target_users", [user])]
+            )
+        delivery = NotificationDelivery.objects.get(notification=result.instance)
+        due_deliveries = []
+
+        def deliver(notification, channel, targets=None):
+            due_deliveries.extend(
+                NotificationDelivery.objects.filter(
+                    status=NotificationDelivery.PENDING,
+                    next_attempt_at__lte=timezone.now(),
+                )
+            )
+            return Result.success()
+
+        with patch.object(Notification, "deliver", deliver):
+            self.assertEqual(NotificationDelivery.process_pending(), 1)
+
+        self.assertEqual(due_deliveries, [])
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, NotificationDelivery.SENT)
@@ -1,3 +1,5 @@
+import json
+
 from django.contrib.admin.options import get_content_type_for_model
 from django.contrib.admin.models import CHANGE
 from django.http import QueryDict
@@ -163,6 +165,50 @@ class UserModelTest(BaseModelTest):
         self.assertEqual(log.content_type, self.content_type)
         self.assertEqual(log.action_flag, CHANGE)
 
+    def test_update_user_changed_message_without_query(self):
+        """
+        Ensure the changed message of a loaded user is computed without fetching
+        the user again.
+        """
+        user = User.objects.get(pk=self.users["testuser_2"].pk)
+        old_first_name = user.first_name
+        user.first_name = "Changed"
+
+        with self.assertNumQueries(0):
+            message = user.get_changed_message(update_fields=["first_name"])
+
+        self.assertEqual(
+            json.loads(message),
+            {
+                "fields": {
+                    "first_name": {
+                        "old_value": old_first_name,
+                        "new_value": "Changed",
+                    }
+                }
+            },
+        )
+
+    def test_update_user_changed_message_json_field(self):
+        """
+        Ensure the JSON values modified in place are compared to the values
+        loaded from the database.
+        """
+        user = User.objects.get(pk=self.users["testuser_2"].pk)
+        old_device_id_list = list(user.device_id_list)
+        user.device_id_list.append("new-device")
+
+        with self.assertNumQueries(0):
+            message = user.get_changed_message(update_fields=["device_id_list"])
+
+        self.assertEqual(
+            json.loads(message)["fields"]["device_id_list"],
+            {
+                "old_value": str(old_device_id_list),
+                "new_value": str([*old_device_id_list, "new-device"]),
+            },
+        )
+
     def test_delete_user_success_log(self):
         """
         Ensure we can log the action of delete object user
@@ -185,3 +231,35 @@ class UserModelTest(BaseModelTest):
         self.assertEqual(log.user, user)
         self.assertEqual(log.content_type, self.content_type)
         self.assertEqual(log.action_flag, CHANGE)
+
+    def test_bulk_delete_and_restore_users_success(self):
+        """
+        Ensure bulk deletion renames the users and bulk restoration gives them
+        their usernames back.
+        """
+        user = self.users["testuser_1"]
+        queryset = User.objects.filter(pk=self.users["testuser_2"].pk)
+
+        result = User.bulk_delete(queryset, user=user)
+        self.assertTrue(result.is_success, result.message)
+
+        deleted_user = User.trash.get(pk=self.users["testuser_2"].pk)
+        self.assertEqual(deleted_user.username, "testuser_2_deleted")
+        log = LogEntry.objects.filter(object_id=str(deleted_user.pk)).first()
+        self.assertEqual(log.action_flag, CHANGE)
+        self.assertEqual(log.change_message, User.soft_delete_change_message)
+
+        result = User.bulk_restore(User.trash.filter(pk=deleted_user.pk), user=user)
+        self.assertTrue(result.is_success, result.message)
+        self.assertEqual(User.objects.get(pk=deleted_user.pk).username, "testuser_2")
+
+    def test_bulk_restore_user_not_deleted_error(self):
+        """
+        Ensure bulk restoration reports the objects that are not deleted.
+        """
+        user = self.users["testuser_1"]
+        queryset = User.objects.filter(pk=self.users["testuser_2"].pk)
+
+        result = User.bulk_restore(queryset, user=user)
+        self.assertTrue(result.is_error, result.message)
+        self.assertIn(str(self.users["testuser_2"]), result.errors)
@@ -0,0 +1,141 @@
+import json
+
+from django.db.models import F
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from lava.models import Conversation, LogEntry, User
+from lava.pagination import LavaCursorPagination, stream_serialized_items
+from lava.tests.base_test_classes import BaseModelTest
+
+
+class CursorPaginationTest(BaseModelTest):
+    def paginate(self, queryset, url, page_size=2):
+        paginator = LavaCursorPagination(page_size=page_size)
+        request = Request(APIRequestFactory().get(url))
+        page = paginator.paginate_queryset(queryset, request)
+        return page, paginator.get_next_link(), paginator.get_previous_link()
+
+    def assert_pages(self, queryset, expected_ids):
+        """
+        Ensure following the next links, then the previous links, goes through
+        all the items in order.
+        """
+        url, pages = "/items/", []
+        while url:
+            page, url, previous_url = self.paginate(queryset, url)
+            pages.append([item.pk for item in page])
+        self.assertEqual(sum(pages, []), expected_ids)
+
+        url, previous_pages = previous_url, [pages[-1]]
+        while url:
+            page, _next_url, url = self.paginate(queryset, url)
+            previous_pages.insert(0, [item.pk for item in page])
+        self.assertEqual(previous_pages, pages)
+
+    def test_cursor_pagination_ordering_tiebreak(self):
+        """
+        Ensure the items with the same ordering values are neither skipped nor
+        repeated, the primary key being used as a tiebreaker.
+        """
+        user = self.users["testuser_1"]
+        for _ in range(5):
+            LogEntry.objects.create(
+                user=user, action_flag=1, object_repr="Object", change_message=""
+            )
+        LogEntry.objects.update(action_time=LogEntry.objects.first().action_time)
+
+        queryset = LogEntry.objects.all()
+        expected_ids = list(
+            queryset.order_by("-action_time", "-pk").values_list("pk", flat=True)
+        )
+        with self.assertNumQueries(1):
+            self.paginate(queryset, "/items/")
+        self.assert_pages(queryset, expected_ids)
+
+        queryset = User.objects.order_by("last_name", "-date_joined")
+        expected_ids = list(
+            queryset.order_by("last_name", "-date_joined", "-pk").values_list(
+                "pk", flat=True
+            )
+        )
+        self.assert_pages(queryset, expected_ids)
+
+    def test_cursor_pagination_nullable_ordering(self):
+        """
+        Ensure the items whose ordering value is null are paginated after the
+        other ones.
+        """
+        user = self.users["testuser_1"]
+        for index in range(5):
+            result = Conversation(
+                name=f"Conversation {index}", is_group_conversation=True
+            ).create(user)
+            self.assertTrue(result.is_success, result.message)
+        conversations = list(Conversation.objects.order_by("pk"))
+        Conversation.objects.filter(
+            pk__in=[conversations[1].pk, conversations[3].pk]
+        ).update(pinned_at=F("created_at"))
+
+        queryset = Conversation.objects.all()
+        expected_ids = list(
+            queryset.order_by(
+                F("pinned_at").desc(nulls_last=True),
+                F("last_updated_at").desc(nulls_last=True),
+                "-pk",
+            ).values_list("pk", flat=True)
+        )
+        self.assert_pages(queryset, expected_ids)
+
+
+class StreamingListTest(BaseModelTest):
+    def serialize(self, users):
+        return [{"id": user.id, "groups": len(user.groups.all())} for user in users]
+
+    def test_stream_serialized_items_chunks(self):
+        """
+        Ensure the items are streamed in chunks, with their related objects
+        prefetched by chunk, and that no more than `max_rows` items are sent.
+        """
+        queryset = User.objects.prefetch_related("groups").order_by("pk")
+        expected_ids = list(queryset.values_list("pk", flat=True))
+
+        # One query for the users, and one for the groups of each chunk.
+        with self.assertNumQueries(1 + (len(expected_ids) + 1) // 2):
+            content = list(stream_serialized_items(queryset, self.serialize, 2))
+        data = json.loads("".join(content))
+        self.assertEqual([item["id"] for item in data["results"]], expected_ids)
+        self.assertEqual(data["count"], len(expected_ids))
+        self.assertFalse(data["truncated"])
+
+        content = stream_serialized_items(
+            queryset, self.serialize, chunk_size=2, max_rows=3
+        )
+        data = json.loads("".join(content))
+        self.assertEqual([item["id"] for item in data["results"]], expected_ids[:3])
+        self.assertEqual(data["count"], 3)
+        self.assertTrue(data["truncated"])
+
+        content = stream_serialized_items(
+            queryset, self.serialize, chunk_size=2, ndjson=True
+        )
+        lines = "".join(content).splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], expected_ids)
+
+    def test_list_page_size_all_streamed(self):
+        """
+        Ensure the lists requested with `page_size=all` are streamed with the
+        same envelope as the paginated lists.
+        """
+        from lava.views.api_views.user_api_views import UserAPIViewSet
+
+        view = UserAPIViewSet.as_view({"get": "list"})
+        request = APIRequestFactory().get("/users/", {"page_size": "all"})
+        force_authenticate(request, user=self.users["eksuperuser"])
+        response = view(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data["count"], len(data["results"]))
+        self.assertIsNone(data["next"])
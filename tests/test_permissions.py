@@ -1,8 +1,14 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
 from lava.tests.base_test_classes import BaseModelTest
+from lava.views.api_views.base_api_views import BaseModelViewSet
 
 from lava.enums import PermissionActionName
 from lava.models import *
 from lava.services.permissions import *
+from lava.services.permission_cache import permission_cache
 
 
 class PermissionsTest(BaseModelTest):
@@ -45,3 +51,93 @@ class PermissionsTest(BaseModelTest):
         has_perm = has_permission(ekadmin, User, action)
 
         self.assertEqual(has_perm, False)
+
+    @patch("lava.backends.PERMISSION_CACHE_ENABLED", True)
+    def test_permissions_cache_hit(self):
+        """
+        Ensure the permissions of a user are not queried again for a new request.
+        """
+        user_id = self.users.ekadmin.pk
+        has_permission(User.objects.get(pk=user_id), User, PermissionActionName.Add)
+
+        ekadmin = User.objects.get(pk=user_id)
+        hits = permission_cache.hits
+        with self.assertNumQueries(0):
+            has_perm = has_permission(ekadmin, User, PermissionActionName.Add)
+
+        self.assertEqual(has_perm, True)
+        self.assertEqual(permission_cache.hits, hits + 1)
+
+    @patch("lava.backends.PERMISSION_CACHE_ENABLED", True)
+    def test_permissions_cache_invalidated_on_user_permissions_change(self):
+        """
+        Ensure the cached permissions are invalidated when a permission is added
+        to the user.
+        """
+        user1 = self.users.testuser_1
+        user1.groups.clear()
+        user1.user_permissions.clear()
+        action = PermissionActionName.Add
+        self.assertEqual(has_permission(user1, User, action), False)
+
+        user1.user_permissions.add(Permission.objects.get(codename="add_user"))
+        user1 = User.objects.get(pk=user1.pk)
+
+        self.assertEqual(has_permission(user1, User, action), True)
+
+    @patch("lava.backends.PERMISSION_CACHE_ENABLED", True)
+    def test_permissions_cache_invalidated_on_group_permissions_change(self):
+        """
+        Ensure the cached permissions are invalidated when a permission is added
+        to a group of the user.
+        """
+        user1 = self.users.testuser_1
+        user1.groups.clear()
+        user1.user_permissions.clear()
+        action = PermissionActionName.Add
+        group = Group(name="Cache test group")
+        group.create()
+        user1.groups.add(group)
+        self.assertEqual(has_permission(user1, User, action), False)
+
+        group.permissions.add(Permission.objects.get(codename="add_user"))
+        user1 = User.objects.get(pk=user1.pk)
+
+        self.assertEqual(has_permission(user1, User, action), True)
+
+
+class PermissionClassesTest(SimpleTestCase):
+    class UserViewSet(BaseModelViewSet):
+        queryset = User.objects.none()
+
+    def get_view(self, action):
+        view = self.UserViewSet()
+        view.action = action
+        return view
+
+    def test_model_permission_class_is_reused(self):
+        """
+        Ensure the permission class of a (model, action) is only created once.
+        """
+        self.assertIs(
+            get_model_permission_class(User, PermissionActionName.List),
+            get_model_permission_class(User, PermissionActionName.List),
+        )
+        self.assertIsNot(
+            get_model_permission_class(User, PermissionActionName.List),
+            get_model_permission_class(User, PermissionActionName.Add),
+        )
+
+    def test_get_permissions_does_not_grow(self):
+        """
+        Ensure get_permissions does not add permissions to the view class.
+        """
+        class_permissions = list(self.UserViewSet.permission_classes)
+
+        view = self.get_view("list")
+        first_permissions = view.get_permissions()
+        second_permissions = view.get_permissions()
+
+        self.assertEqual(len(first_permissions), len(second_permissions))
+        self.assertEqual(len(view.permission_classes), len(class_permissions))
+        self.assertEqual(self.UserViewSet.permission_classes, class_permissions)
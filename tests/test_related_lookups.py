@@ -0,0 +1,94 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from lava.models import Group, LogEntry, Permission
+from lava.models.chat_models import ChatMessage, Conversation
+from lava.serializers.log_entry_serializer import LogEntrySerializer
+from lava.serializers.user_serializers import UserGetSerializer
+from lava.services.related_lookups import get_related_lookups
+from lava.tests.base_test_classes import BaseModelTest
+from lava.views.api_views.chat_api_views import ChatAPIViewSet
+from lava.views.api_views.group_api_views import GroupAPIViewSet
+from lava.views.api_views.log_entry_api_views import LogEntryAPIViewSet
+from lava.views.api_views.user_api_views import UserAPIViewSet
+
+
+class RelatedLookupsTest(BaseModelTest):
+    def count_queries(self, viewset, actions, user, **kwargs):
+        view = viewset.as_view(actions)
+        request = APIRequestFactory().get("/", {"page_size": 100})
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as context:
+            response = view(request, **kwargs)
+            response.render()
+        self.assertEqual(response.status_code, 200, response.data)
+        return len(context.captured_queries)
+
+    def test_get_related_lookups_success(self):
+        """
+        Ensure the relations of the nested serializers, of the dotted sources
+        and of the declared hints are selected or prefetched.
+        """
+        self.assertEqual(
+            get_related_lookups(LogEntrySerializer), (["content_type", "user"], [])
+        )
+        self.assertEqual(
+            get_related_lookups(UserGetSerializer),
+            ([], ["groups", "user_permissions", "user_permissions__content_type"]),
+        )
+
+    def test_endpoints_num_queries(self):
+        """
+        Ensure the number of queries of the endpoints does not depend on the
+        number of objects they return.
+        """
+        superuser = self.users["eksuperuser"]
+        user = self.users["testuser_1"]
+        group = Group.objects.first()
+        permissions = Permission.objects.all()[:10]
+        user.groups.add(group)
+        user.user_permissions.add(permissions[0])
+        group.permissions.add(permissions[0])
+        conversation = Conversation(name="Conversation", is_group_conversation=True)
+        result = conversation.create(user, members=[superuser])
+        self.assertTrue(result.is_success, result.message)
+
+        endpoints = [
+            (LogEntryAPIViewSet, {"get": "list"}, {}),
+            (UserAPIViewSet, {"get": "retrieve"}, {"pk": user.pk}),
+            (GroupAPIViewSet, {"get": "retrieve"}, {"pk": group.pk}),
+            (ChatAPIViewSet, {"get": "list"}, {}),
+        ]
+        queries = [
+            self.count_queries(viewset, actions, superuser, **kwargs)
+            for viewset, actions, kwargs in endpoints
+        ]
+
+        user.user_permissions.add(*permissions)
+        group.permissions.add(*permissions)
+        for index in range(5):
+            LogEntry.objects.log_action(
+                user_id=user.id,
+                content_type_id=permissions[index].content_type_id,
+                object_id=permissions[index].pk,
+                object_repr=str(permissions[index]),
+                action_flag=1,
+            )
+            other_conversation = Conversation(
+                name=f"Conversation {index}", is_group_conversation=True
+            )
+            result = other_conversation.create(user, members=[superuser])
+            self.assertTrue(result.is_success, result.message)
+            message = ChatMessage(
+                sender=user, conversation=other_conversation, text="Hello"
+            )
+            result = message.create(user)
+            self.assertTrue(result.is_success, result.message)
+
+        for (viewset, actions, kwargs), count in zip(endpoints, queries):
+            with self.subTest(viewset=viewset.__name__):
+                self.assertEqual(
+                    self.count_queries(viewset, actions, superuser, **kwargs), count
+                )
@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from lava.models import Group, User
+from lava.services import statistics
+from lava.services.statistics_cache import statistics_cache
+from lava.tests.base_test_classes import BaseModelTest
+
+
+class StatisticsTest(BaseModelTest):
+    def setUp(self):
+        super().setUp()
+        statistics_cache.clear()
+        self.addCleanup(statistics_cache.clear)
+
+    def get_indicator(self, user, index):
+        return statistics.get_indicators(user=user)[index]["value"]
+
+    def test_indicators_cache_success(self):
+        """
+        Ensure the indicators are read from the statistics cache, and computed
+        again when the groups change or when they are too old.
+        """
+        user = self.users["testuser_1"]
+        groups_count = self.get_indicator(user, 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_indicator(user, 1), groups_count)
+
+        Group.objects.create(name="Statistics group")
+        self.assertEqual(self.get_indicator(user, 1), groups_count + 1)
+
+        # The bulk updates do not send signals.
+        Group.objects.filter(name="Statistics group").update(deleted_at=timezone.now())
+        self.assertEqual(self.get_indicator(user, 1), groups_count + 1)
+        with patch.object(statistics_cache, "max_staleness", 0):
+            self.assertEqual(self.get_indicator(user, 1), groups_count)
+
+    def test_statistics_visibility(self):
+        """
+        Ensure the admin users are only counted in the statistics of the admin
+        users, and that the refreshed statistics are the computed ones.
+        """
+        user = self.users["testuser_1"]
+        admin_user = self.users["eksuperuser"]
+        admins_count = User.objects.filter(username__in=User.admin_usernames).count()
+        self.assertEqual(
+            self.get_indicator(admin_user, 0),
+            self.get_indicator(user, 0) + admins_count,
+        )
+
+        statistics_cache.clear()
+        statistics.refresh_statistics()
+        for section_user in [user, admin_user]:
+            with self.assertNumQueries(0):
+                indicators = statistics.get_indicators(user=section_user)
+                statistics.get_active_users(user=section_user)
+                statistics.get_daily_actions(user=section_user)
+                statistics.get_latest_actions(user=section_user)
+            self.assertEqual(
+                indicators, statistics.compute_indicators(user=section_user)
+            )
+
+    def test_bulk_delete_restore_invalidate_statistics(self):
+        """
+        Ensure the bulk deletion and restoration of the users, which do not
+        send the signals, invalidate the statistics.
+        """
+        user = self.users["testuser_1"]
+        users_count = self.get_indicator(user, 0)
+        queryset = User.objects.filter(pk=self.users["testuser_2"].pk)
+
+        result = User.bulk_delete(queryset)
+        self.assertFalse(result.is_error, result.message)
+        self.assertEqual(self.get_indicator(user, 0), users_count - 1)
+
+        result = User.bulk_restore(User.trash.filter(pk=self.users["testuser_2"].pk))
+        self.assertFalse(result.is_error, result.message)
+        self.assertEqual(self.get_indicator(user, 0), users_count)
+
+    def test_refresh_statistics_local_cache_error(self):
+        """
+        Ensure the statistics are not refreshed in a cache local to the
+        process, which the servers would never read.
+        """
+        with self.assertRaises(CommandError):
+            call_command("lava_refresh_statistics")
@@ -1,5 +1,107 @@
+import os
+from tempfile import NamedTemporaryFile
+
+import openpyxl
+from django.core.exceptions import ValidationError
 from django.test import SimpleTestCase
 
+from lava.utils.xlsx_utils import (
+    ExcelFileReader,
+    ExportDataType,
+    export_xlsx,
+    handle_excel_file,
+)
+
 
 class TestUtils(SimpleTestCase):
-    pass
+    def test_export_xlsx_layout(self):
+        """
+        Ensure the exported file keeps the heading and the table layout when
+        the rows are generated while the file is written.
+        """
+        rows = ([f"Value {index}", index] for index in range(3))
+        data = ExportDataType(
+            col_titles=["Permissions", "Group"],
+            row_titles=["First", "Second", "Third"],
+            data=rows,
+        )
+        result = export_xlsx(
+            data, header_title="Title", description="Description", sheet_title="Data"
+        )
+        self.assertTrue(result.is_success, result.message)
+
+        try:
+            ws = openpyxl.load_workbook(result.instance)["Data"]
+            self.assertEqual(
+                sorted(str(cells) for cells in ws.merged_cells.ranges),
+                ["B1:B2", "C1:I1", "C2:I2"],
+            )
+            self.assertEqual(ws["C1"].value, "Title")
+            self.assertEqual(ws["C1"].style, "title")
+            self.assertEqual(ws["C2"].value, "Description")
+            self.assertEqual(ws["A4"].value, "Permissions")
+            self.assertEqual(ws["A4"].style, "header")
+            self.assertEqual(ws["A7"].value, "Third")
+            self.assertEqual(ws["A7"].alignment.horizontal, "left")
+            self.assertEqual(ws["B7"].value, "Value 2")
+            self.assertEqual(ws["C7"].value, 2)
+            self.assertEqual(ws["C7"].style, "colored")
+            self.assertEqual(ws["C7"].alignment.horizontal, "center")
+            self.assertEqual(ws.freeze_panes, "A5")
+            self.assertEqual(ws.row_dimensions[4].height, 40)
+        finally:
+            os.remove(result.instance)
+
+    def create_excel_file(self, rows):
+        workbook = openpyxl.Workbook()
+        for row in rows:
+            workbook.active.append(row)
+        file = NamedTemporaryFile(suffix=".xlsx", delete=False)
+        file.close()
+        workbook.save(file.name)
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def test_excel_file_reader_row_errors(self):
+        """
+        Ensure the rows are read in batches and that the invalid rows are
+        reported with their row number without stopping the import.
+        """
+        file_name = self.create_excel_file(
+            [
+                ["Title"],
+                ["Full Name", "Age", "Address"],
+                ["John", 32, "Street 1"],
+                [None, None, None],
+                ["Jane", "#DIV/0!", "Street 2"],
+                ["Jack", -1, "Street 3"],
+                ["Jim", 40],
+            ]
+        )
+
+        def clean_row(row):
+            if row["age"] < 0:
+                raise ValidationError("The age must be positive.")
+            return row
+
+        reader = ExcelFileReader(
+            file_name,
+            start_row=2,
+            extract_columns=["full name", "age"],
+            clean_row=clean_row,
+        )
+        batches = list(reader.iter_batches(1))
+        self.assertEqual(
+            batches,
+            [
+                [(3, {"full_name": "John", "age": 32})],
+                [(7, {"full_name": "Jim", "age": 40})],
+            ],
+        )
+        self.assertEqual([error["row"] for error in reader.errors], [5, 6])
+        self.assertEqual(reader.errors[1]["errors"], ["The age must be positive."])
+
+        data = handle_excel_file(file_name, start_row=2)
+        self.assertEqual(data.column_names, ["full_name", "age", "address"])
+        self.assertEqual(len(data.data), 3)
+        self.assertEqual(data.errors[0]["row"], 5)
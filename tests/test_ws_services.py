@@ -0,0 +1,182 @@
+import asyncio
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+
+from lava.models.chat_models import Conversation
+from lava.models.models import NotificationGroup
+from lava.services.subscription_cache import get_user_subscriptions
+from lava.tests.base_test_classes import BaseModelTest
+from lava.ws import services
+from lava.ws.consumers import ReadReceiptsBuffer
+
+
+class FakeChannelLayer:
+    def __init__(self, failing_group_names=()):
+        self.failing_group_names = failing_group_names
+        self.sent = []
+
+    async def group_send(self, group_name, message):
+        if group_name in self.failing_group_names:
+            raise ConnectionError("Channel layer unavailable")
+        self.sent.append(group_name)
+
+
+class WSServicesTest(BaseModelTest):
+    def test_get_target_group_names_skip_group_members(self):
+        """
+        Ensure the users who receive a message through a target group are not
+        sent the message a second time.
+        """
+        group = NotificationGroup.objects.first()
+        member = self.users["testuser_1"]
+        member.groups.add(group)
+        other_user = self.users["testuser_2"]
+        # The demo adds the users to random groups.
+        other_user.groups.clear()
+
+        group_names = services.get_target_group_names(
+            target_users=[member, other_user], target_groups=[group]
+        )
+        self.assertEqual(
+            group_names, sorted([f"user_group_{group.id}", f"user_{other_user.id}"])
+        )
+
+    def test_send_message_to_groups_report_failures(self):
+        """
+        Ensure a message is sent to all the groups and that the groups that
+        could not be reached are reported.
+        """
+        channel_layer = FakeChannelLayer(failing_group_names=["user_2"])
+        group_names = [f"user_{index}" for index in range(10)]
+
+        with patch.object(services, "get_channel_layer", lambda: channel_layer):
+            failures = async_to_sync(services.send_message_to_groups)(
+                {"type": "send_notification"}, group_names, concurrency=3
+            )
+
+        self.assertEqual(list(failures.keys()), ["user_2"])
+        self.assertIsInstance(failures["user_2"], ConnectionError)
+        self.assertEqual(len(channel_layer.sent), 9)
+
+    @patch("lava.settings.SUBSCRIPTION_CACHE_ENABLED", True)
+    def test_user_subscriptions_cache_success(self):
+        """
+        Ensure the subscriptions of a user are cached, and invalidated when the
+        user joins a group or a conversation.
+        """
+        user = self.users["testuser_1"]
+        user.groups.clear()
+        get_user_subscriptions(user)
+        with self.assertNumQueries(0):
+            subscriptions = get_user_subscriptions(user)
+        self.assertEqual(subscriptions["groups"], [])
+        self.assertEqual(subscriptions["conversations"], [])
+
+        group = NotificationGroup.objects.first()
+        user.groups.add(group)
+        subscriptions = get_user_subscriptions(user)
+        self.assertEqual(subscriptions["notification_groups"], [group.id])
+
+        conversation = Conversation(name="Conversation", is_group_conversation=True)
+        result = conversation.create(self.users["testuser_2"])
+        self.assertTrue(result.is_success, result.message)
+        conversation = Conversation.objects.get(pk=conversation.pk)
+        result = conversation.add_members([user])
+        self.assertTrue(result.is_success, result.message)
+        subscriptions = get_user_subscriptions(user)
+        self.assertEqual(subscriptions["conversations"], [conversation.id])
+
+        result = conversation.delete()
+        self.assertTrue(result.is_success, result.message)
+        self.assertEqual(get_user_subscriptions(user)["conversations"], [])
+
+    @patch("lava.settings.SUBSCRIPTION_CACHE_ENABLED", True)
+    def test_user_subscriptions_refresh_success(self):
+        """
+        Ensure the subscriptions of a user can be queried again when a change
+        did not invalidate the cache, eg: a change made by another process.
+        """
+        user = self.users["testuser_1"]
+        conversation = Conversation(name="Conversation", is_group_conversation=True)
+        result = conversation.create(self.users["testuser_2"])
+        self.assertTrue(result.is_success, result.message)
+        get_user_subscriptions(user)
+
+        members = {**conversation.members, str(user.pk): {"muted": False}}
+        # update() does not send the signals that invalidate the cache.
+        Conversation.objects.filter(pk=conversation.pk).update(members=members)
+        self.assertNotIn(conversation.id, get_user_subscriptions(user)["conversations"])
+        self.assertIn(
+            conversation.id,
+            get_user_subscriptions(user, refresh=True)["conversations"],
+        )
+
+    def test_user_subscriptions_not_cached_by_default(self):
+        """
+        Ensure the subscriptions are queried on every connection when no shared
+        cache is set, so that the members removed by another process are not
+        subscribed to the conversation.
+        """
+        user = self.users["testuser_1"]
+        conversation = Conversation(name="Conversation", is_group_conversation=True)
+        result = conversation.create(self.users["testuser_2"])
+        self.assertTrue(result.is_success, result.message)
+        conversation = Conversation.objects.get(pk=conversation.pk)
+        result = conversation.add_members([user])
+        self.assertTrue(result.is_success, result.message)
+        self.assertIn(conversation.id, get_user_subscriptions(user)["conversations"])
+
+        members = {
+            user_id: member
+            for user_id, member in conversation.members.items()
+            if user_id != str(user.pk)
+        }
+        # update() does not send the signals that invalidate the cache.
+        Conversation.objects.filter(pk=conversation.pk).update(members=members)
+        self.assertNotIn(conversation.id, get_user_subscriptions(user)["conversations"])
+
+
+
+class ReadReceiptsBufferTest(SimpleTestCase):
+    def test_coalesce_read_receipts(self):
+        """
+        Ensure the read receipts added within the delay are written at once,
+        and that the pending ones are written when the buffer is closed.
+        """
+        writes = []
+
+        async def write(ids):
+            writes.append(ids)
+
+        async def run():
+            buffer = ReadReceiptsBuffer(write, delay=0.05)
+            for object_id in [1, 2, 2, 3]:
+                buffer.add(object_id)
+            await asyncio.sleep(0.1)
+            buffer.add(4)
+            await buffer.close()
+
+        async_to_sync(run)()
+        self.assertEqual(writes, [[1, 2, 3], [4]])
+
+    def test_failed_read_receipts_are_logged(self):
+        """
+        Ensure the errors raised while writing the read receipts are logged.
+        """
+
+        async def write(ids):
+            raise ConnectionError("Database unavailable")
+
+        async def run():
+            buffer = ReadReceiptsBuffer(write, delay=0)
+            buffer.add(1)
+            await asyncio.sleep(0.05)
+            buffer.add(2)
+            await buffer.close()
+
+        with self.assertLogs(level="ERROR") as logs:
+            async_to_sync(run)()
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn("Database unavailable", logs.records[0].getMessage())
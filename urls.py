@@ -108,6 +108,11 @@ if activate_api_urls:
             views.ExportActivityJournal.as_view(),
             name="api-export-activity-journal",
         ),
+        path(
+            "api/export_jobs/<int:pk>/",
+            views.ExportJobAPIView.as_view(),
+            name="api-export-job",
+        ),
     ]
 
 urlpatterns = [*base_urlpatterns, *api_urlpatterns, *api_router.urls]
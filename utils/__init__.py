@@ -38,11 +38,13 @@ from .utils import (
     build_absolute_uri,
     remove_html_tags,
     build_query_dict,
+    iter_queryset_chunks,
 )
 from .xlsx_utils import (
     ExportDataType,
     get_col_width,
     get_cell_str,
+    ExcelFileReader,
     handle_excel_file,
     export_xlsx,
     export_serializer_xlsx,
@@ -58,4 +60,5 @@ from .handle_upload_filenames import (
     get_chat_message_image_filename,
     get_document_filename,
     get_backup_file_filename,
+    get_export_file_filename,
 )
@@ -55,3 +55,7 @@ def get_document_filename(instance, filename):
 
 def get_backup_file_filename(instance, filename):
     return "backup/{}".format(instance.get_filename())
+
+
+def get_export_file_filename(instance, filename):
+    return "exports/{}".format(instance.get_filename())
@@ -24,7 +24,7 @@ from django.utils.translation import gettext_lazy as _
 from django.core.mail import get_connection, EmailMultiAlternatives
 from django.template.context import make_context
 from django.template.loader import render_to_string
-from django.db.models import Model
+from django.db.models import Model, prefetch_related_objects
 
 from templated_mail.mail import BaseEmailMessage
 
@@ -735,3 +735,22 @@ def generate_repo_backup(repo=None, out=None):
         json.dump(repositories, output)
 
     return filename
+
+
+def iter_queryset_chunks(queryset, chunk_size):
+    """
+    Iterates the queryset with a server side cursor and yields lists of at most
+    `chunk_size` items. The `prefetch_related` lookups, ignored by
+    `QuerySet.iterator()`, are applied to each chunk.
+    """
+    lookups = queryset._prefetch_related_lookups
+    chunk = []
+    for item in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            prefetch_related_objects(chunk, *lookups)
+            yield chunk
+            chunk = []
+    if chunk:
+        prefetch_related_objects(chunk, *lookups)
+        yield chunk
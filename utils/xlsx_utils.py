@@ -1,18 +1,26 @@
 import os
 import logging
+from copy import copy
 from datetime import datetime
+from itertools import zip_longest
 
 import openpyxl
 from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ERROR_CODES, Cell
 from openpyxl.writer import excel
 from openpyxl.styles.alignment import Alignment
+from openpyxl.formatting.rule import Rule
 from openpyxl.drawing.image import Image
 
 from django.core.exceptions import ValidationError
 from django.conf import settings
+from django.db.models import QuerySet
 from django.utils.translation import gettext_lazy as _, get_language
 
+from lava import settings as lava_settings
+from lava.services.related_lookups import prefetch_serializer_relations
 from lava.styles import XLSXStyles
 from lava.utils.utils import (
     imdict,
@@ -20,11 +28,16 @@ from lava.utils.utils import (
     get_tmp_root,
     map_interval,
     get_image,
+    iter_queryset_chunks,
     Result,
     slugify,
 )
 
 
+# Maximum number of distinct (style, value) cells shared by an export.
+SHARED_CELLS_MAX_SIZE = 1024
+
+
 class ExportDataType(imdict):
     def __init__(self, col_titles: list, data: list, row_titles: list = None):
         self.row_titles = row_titles
@@ -57,76 +70,96 @@ def get_field_name(mapping, column_name):
     return slugify(column_name)
 
 
-def handle_excel_file(
-    file_name,
-    start_row=1,
-    extract_columns=None,
-    target_sheet=None,
-    column_name_mapping=None,
-):
+class ExcelFileReader:
     """
+    Reads the rows of an excel file lazily, the workbook is opened in
+    read-only mode so that the memory used does not depend on the size of the
+    file.
+
     file_name | string: The path to open or a File like object
     start_row | int: the number of row where the header of the file is located.
     extract_columns | List of strings: the names of columns to extract from the file.
     The extract_columns param will be slugified as well as the columns from the excel file,
     so caps, spaces, and special characters are ignored, making it easier to match.
     target_sheet | string: Name of the target sheet
+    column_name_mapping | dict: Field names of the columns, by column name.
+    clean_row | callable: Called with each row, returns the cleaned row or raises a
+    ValidationError.
+
+    The rows that contain an error value (eg: #DIV/0!) or that are rejected by
+    `clean_row` are skipped and reported in `errors` with their row number.
 
     example:
-    >>> start_row = 1
-    >>> column_names = [
-    >>>     "name", "age", "address"
-    >>> ]
-    >>> data = handle_excel_file("file.xlsx", start_row, column_names)
+    >>> reader = ExcelFileReader("file.xlsx", 1, ["name", "age", "address"])
+    >>> for batch in reader.iter_batches(500):
+    >>>     Person.objects.bulk_create([Person(**row) for _row_number, row in batch])
+    >>> reader.errors
     """
 
-    if not column_name_mapping:
-        column_name_mapping = dict()
-
-    if type(start_row) != int or start_row <= 0:
-        raise Exception("'start_row' attribute is invalid!")
-    start_row -= 1
+    def __init__(
+        self,
+        file_name,
+        start_row=1,
+        extract_columns=None,
+        target_sheet=None,
+        column_name_mapping=None,
+        clean_row=None,
+    ):
+        if type(start_row) != int or start_row <= 0:
+            raise ValueError("'start_row' attribute is invalid!")
+
+        self.file_name = file_name
+        self.start_row = start_row
+        self.extract_columns = list(extract_columns or [])
+        self.target_sheet = target_sheet
+        self.column_name_mapping = column_name_mapping or dict()
+        self.clean_row = clean_row
+
+        self.column_names = []
+        self.column_names_display = []
+        self.columns = []
+        self.errors = []
+
+    def open_worksheet(self):
+        workbook = openpyxl.load_workbook(
+            self.file_name, read_only=True, data_only=True
+        )
+        if self.target_sheet:
+            return workbook, workbook[self.target_sheet]
+        return workbook, workbook.active
+
+    def read_header(self, worksheet):
+        """
+        Maps the indexes of the columns to extract to their field names, raises
+        a ValidationError if a column is missing.
+        """
+        header = next(
+            worksheet.iter_rows(
+                min_row=self.start_row, max_row=self.start_row, values_only=True
+            ),
+            (),
+        )
 
-    try:
-        # Slugify extract_columns
-        if not extract_columns:
-            extract_columns = []
-            slugified_extract_columns = []
-        else:
-            slugified_extract_columns = [
-                slugify(name) for name in extract_columns
-            ]
-        wb = openpyxl.load_workbook(file_name)
-        if target_sheet:
-            worksheet = wb[target_sheet]
-        else:
-            worksheet = wb.active
+        header_columns = []
+        for col_index, value in enumerate(header):
+            if value:
+                header_columns.append((col_index, str(value)))
+            elif header_columns:
+                break
 
-        # Extract columns names from the excel file
+        slugified_extract_columns = [slugify(name) for name in self.extract_columns]
+        fill_extract_columns = not slugified_extract_columns
         column_names = []
-        columns_indexes = []
-
-        fill_extract_columns = False if slugified_extract_columns else True
-
-        for index, row in enumerate(worksheet.iter_rows()):
-            if index != start_row:
-                continue
-
-            exit_on_null = False
-            for col_index, cell in enumerate(row):
-                value = cell.value
-                if value:
-                    slugified_value = get_field_name(column_name_mapping, str(value))
-                    if fill_extract_columns:
-                        extract_columns.append(str(value))
-                        slugified_extract_columns.append(slugified_value)
-                    column_names.append(slugified_value)
-                    columns_indexes.append(col_index)
-                    exit_on_null = True
-                elif exit_on_null:
-                    break
-
-        extract_columns_indexes = []
+        self.columns = []
+        for col_index, value in header_columns:
+            field_name = get_field_name(self.column_name_mapping, value)
+            column_names.append(field_name)
+            if fill_extract_columns:
+                self.extract_columns.append(value)
+                slugified_extract_columns.append(field_name)
+            if field_name in slugified_extract_columns:
+                self.columns.append((col_index, field_name))
+
         # Check if all extract_columns exist in the excel file.
         for column_name in slugified_extract_columns:
             if column_name not in column_names:
@@ -137,40 +170,113 @@ def handle_excel_file(
                     )
                 )
 
-        for index, column_name in enumerate(column_names):
-            if column_name in slugified_extract_columns:
-                extract_columns_indexes.append(index)
-
-        excel_data = list()
-        # iterating over the rows and
-        # getting value from each cell in row
-        for index, row in enumerate(worksheet.iter_rows()):
-            if index <= start_row:
-                continue
-
-            is_row_empty = True
-            row_data = odict()
-            for col_index, cell in enumerate(row):
-                if col_index in extract_columns_indexes:
-                    field_name = get_field_name(column_name_mapping, column_names[col_index])
-                    row_data[field_name] = cell.value
-                    if cell.value:
+        self.column_names = (
+            list(self.column_name_mapping.values()) or slugified_extract_columns
+        )
+        self.column_names_display = self.extract_columns
+
+    def iter_rows(self):
+        """
+        Yields the (row number, row data) of the non empty rows of the file.
+        """
+        self.errors = []
+        workbook, worksheet = self.open_worksheet()
+        try:
+            self.read_header(worksheet)
+            rows = worksheet.iter_rows(min_row=self.start_row + 1, values_only=True)
+            for row_number, values in enumerate(rows, self.start_row + 1):
+                row_data = odict()
+                is_row_empty = True
+                errors = []
+                for col_index, field_name in self.columns:
+                    value = values[col_index] if col_index < len(values) else None
+                    if isinstance(value, str) and value in ERROR_CODES:
+                        errors.append(
+                            _("Invalid value '%(value)s' in column '%(column)s'.")
+                            % {"value": value, "column": field_name}
+                        )
+                    row_data[field_name] = value
+                    if value:
                         is_row_empty = False
 
-            if not is_row_empty:
-                excel_data.append(row_data)
+                if is_row_empty:
+                    continue
+                if errors:
+                    self.errors.append(odict(row=row_number, errors=errors))
+                    continue
+                if self.clean_row is not None:
+                    try:
+                        row_data = self.clean_row(row_data)
+                    except ValidationError as e:
+                        self.errors.append(odict(row=row_number, errors=e.messages))
+                        continue
+                yield row_number, row_data
+        finally:
+            workbook.close()
+
+    def iter_batches(self, batch_size):
+        """
+        Yields lists of at most `batch_size` (row number, row data).
+        """
+        batch = []
+        for row in self.iter_rows():
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
-        # return odict object with the following format:
-        return odict(
-            column_names=list(column_name_mapping.values()) or slugified_extract_columns,
-            column_names_display=extract_columns,
-            data=excel_data,
-        )
 
+def handle_excel_file(
+    file_name,
+    start_row=1,
+    extract_columns=None,
+    target_sheet=None,
+    column_name_mapping=None,
+):
+    """
+    file_name | string: The path to open or a File like object
+    start_row | int: the number of row where the header of the file is located.
+    extract_columns | List of strings: the names of columns to extract from the file.
+    The extract_columns param will be slugified as well as the columns from the excel file,
+    so caps, spaces, and special characters are ignored, making it easier to match.
+    target_sheet | string: Name of the target sheet
+
+    The rows are read by an ExcelFileReader, use it directly to process the
+    rows of large files without loading them all in memory. The rows that could
+    not be read are listed in `errors` with their row number.
+
+    example:
+    >>> start_row = 1
+    >>> column_names = [
+    >>>     "name", "age", "address"
+    >>> ]
+    >>> data = handle_excel_file("file.xlsx", start_row, column_names)
+    """
+
+    reader = ExcelFileReader(
+        file_name,
+        start_row=start_row,
+        extract_columns=extract_columns,
+        target_sheet=target_sheet,
+        column_name_mapping=column_name_mapping,
+    )
+
+    try:
+        excel_data = [row_data for _row_number, row_data in reader.iter_rows()]
     except Exception as e:
         logging.error(e)
         return None
 
+    # return odict object with the following format:
+    return odict(
+        column_names=reader.column_names,
+        column_names_display=reader.column_names_display,
+        data=excel_data,
+        errors=reader.errors,
+    )
+
 
 def export_xlsx(
     data: ExportDataType,
@@ -186,6 +292,10 @@ def export_xlsx(
     This function creates a tmp .xlsx file based on the data provided and
     returns a result that has the tmp file path in it's instance attribute.
 
+    The file is written in write-only mode: the rows of `data.data` can be any
+    iterable (eg: a generator), they are written to the file as they are
+    consumed, so the memory used does not depend on the number of rows.
+
     :data:ExportDataType:Data to be exported to excel file.
     :header_title:str:The title that is displayed above the table.
     :description:str:Discription of the document, note, or a usage tip.
@@ -209,25 +319,35 @@ def export_xlsx(
     start_row_index = start_file_header_row + 3 if include_heading else start_file_header_row
     start_col_index = 1
 
-    row_titles = data.row_titles
-    data_rows_count = len(row_titles) if row_titles else 0
-    col_titles = data.col_titles
+    row_titles = list(data.row_titles) if data.row_titles else []
+    data_rows_count = len(row_titles)
+    col_titles = list(data.col_titles)
     data_cols_count = len(col_titles)
 
     language_code = get_language().upper()
 
+    # The alignments are shared by all the cells instead of being created for
+    # each of them.
+    row_title_alignment = Alignment(horizontal="left", vertical="center")
+    data_alignment = Alignment(horizontal="center", vertical="center")
+
+    last_col_index = max(
+        start_file_header_col + data_cols_count + 15, start_file_header_col + 25
+    )
+    last_row_index = start_row_index + data_rows_count + 50
+
+    ws = None
     try:
         # Workbook initialization
-        wb = Workbook()
+        wb = Workbook(write_only=True)
         wb.add_named_style(styles.white_style)
         wb.add_named_style(styles.default_style)
         wb.add_named_style(styles.colored_style)
         wb.add_named_style(styles.header_style)
         wb.add_named_style(styles.title_style)
 
-        # Sheet setup
-        ws = wb.active
-        ws.title = sheet_title
+        # Sheet setup, the dimensions must be set before the rows are written.
+        ws = wb.create_sheet(sheet_title)
 
         ws.row_dimensions[start_row_index].height = 40
         ws.row_dimensions[start_file_header_row].height = 40
@@ -236,106 +356,168 @@ def export_xlsx(
 
         # Freeze the table header
         if freeze_header:
-            ws.freeze_panes = ws.cell(row=start_row_index + 1, column=1)
+            ws.freeze_panes = get_cell_str(1, start_row_index + 1)
 
-        # Remove cell borders
-        if remove_cells_borders:
-            last_col_index = max(
-                start_file_header_col + data_cols_count + 15, start_file_header_col + 25
-            )
-            last_row_index = start_row_index + data_rows_count + 50
-            for col in range(1, last_col_index):
-                for row_index in range(1, last_row_index):
-                    ws.cell(row=row_index, column=col).style = "white"
+        start_column = ws.column_dimensions[get_column_letter(start_col_index)]
+        start_column.width = 37  # equivalent to 264px
+        header_font_size = styles.fonts.header.sz
+        for index, col_title in enumerate(col_titles):
+            col_name = get_column_letter(start_col_index + index)
+            column = ws.column_dimensions[col_name]
+            if column == start_column:
+                column.width = max(
+                    get_col_width(col_title, header_font_size), column.width
+                )
+            else:
+                column.width = get_col_width(col_title, header_font_size)
+        for row_title in row_titles:
+            col_width = get_col_width(row_title, header_font_size)
+            if col_width > start_column.width:
+                start_column.width = col_width
+
+        # Looking up a named style and registering an alignment is slow, it is
+        # done once for each combination and the result is copied to the cells.
+        cell_styles = {}
+        # The rows are written cell by cell as they are appended, so the cells
+        # of the repeated values (eg: the "X" marks) are shared by all
+        # their positions instead of being created for each of them.
+        shared_cells = {}
+
+        def get_cell(value=None, style=None, alignment=None):
+            if not style and not alignment:
+                return WriteOnlyCell(ws, value=value)
+
+            # Alignments are slow to hash, they are shared so their id is used.
+            key = (style, id(alignment))
+            if key not in cell_styles:
+                cell = WriteOnlyCell(ws)
+                if style:
+                    cell.style = style
+                if alignment:
+                    cell.alignment = alignment
+                cell_styles[key] = cell._style
+
+            shared_key = (key, type(value), value)
+            try:
+                cell = shared_cells.get(shared_key)
+            except TypeError:
+                shared_key = None
+                cell = None
+            if cell is None:
+                cell = Cell(
+                    ws, row=1, column=1, value=value, style_array=copy(cell_styles[key])
+                )
+                if shared_key is not None and len(shared_cells) < SHARED_CELLS_MAX_SIZE:
+                    shared_cells[shared_key] = cell
+            return cell
+
+        def append_row(row_index, cells, data_cells=()):
+            # Remove cell borders, the empty data cells are styled by the
+            # conditional format of the data range.
+            if remove_cells_borders and row_index < last_row_index:
+                padding = last_col_index - 1 - len(cells) - len(data_cells)
+                cells = [cell or get_cell(style="white") for cell in cells]
+                cells += [*data_cells, *[get_cell(style="white")] * padding]
+            else:
+                cells = [*cells, *data_cells]
+            ws.append(cells)
 
         if include_heading:
             # Logo cell
-            ws.merge_cells(
+            ws.merged_cells.add(
                 f"{get_cell_str(start_file_header_col, start_file_header_row)}:"
                 f"{get_cell_str(start_file_header_col, start_file_header_row + 1)}"
             )
-            cell = ws.cell(row=start_file_header_row, column=start_file_header_col)
-            cell.font = styles.fonts.white
-            cell.value = language_code
-
-        # Title cell
-        if header_title and include_heading:
-            ws.merge_cells(
-                f"{get_cell_str(start_file_header_col + 1, start_file_header_row)}:"
-                f"{get_cell_str(start_file_header_col + title_section_length, start_file_header_row)}"
-            )
-            title_cell = ws.cell(
-                row=start_file_header_row,
-                column=start_file_header_col + 1,
-                value=header_title,
+            logo_cell = get_cell(
+                language_code, style="white" if remove_cells_borders else None
             )
-            title_cell.style = "title"
+            logo_cell.font = styles.fonts.white
+            title_row = [None] * (start_file_header_col - 1) + [logo_cell]
+            description_row = [None] * start_file_header_col
+
+            # Title cell
+            if header_title:
+                ws.merged_cells.add(
+                    f"{get_cell_str(start_file_header_col + 1, start_file_header_row)}:"
+                    f"{get_cell_str(start_file_header_col + title_section_length, start_file_header_row)}"
+                )
+                title_row.append(get_cell(header_title, style="title"))
 
-        # Description cell
-        if description:
-            ws.merge_cells(
-                f"{get_cell_str(start_file_header_col + 1, start_file_header_row + 1)}:"
-                f"{get_cell_str(start_file_header_col + title_section_length, start_file_header_row + 1)}"
-            )
-            description_cell = ws.cell(
-                row=start_file_header_row + 1,
-                column=start_file_header_col + 1,
-                value=description,
-            )
-            description_cell.style = "default"
+            # Description cell
+            if description:
+                ws.merged_cells.add(
+                    f"{get_cell_str(start_file_header_col + 1, start_file_header_row + 1)}:"
+                    f"{get_cell_str(start_file_header_col + title_section_length, start_file_header_row + 1)}"
+                )
+                description_row.append(get_cell(description, style="default"))
+
+            append_row(start_file_header_row, title_row)
+            append_row(start_file_header_row + 1, description_row)
+            append_row(start_row_index - 1, [])
 
-        start_column = ws.column_dimensions[get_column_letter(start_col_index)]
-        if include_heading:
             logo = get_image(logo_filepath, target_width=250, margin=(18, 0, 18, 0))
             ws.add_image(
                 Image(logo), get_cell_str(start_file_header_col, start_file_header_row)
             )
-        start_column.width = 37  # equivalent to 264px
 
-        for index, col_title in enumerate(col_titles):
-            cell = ws.cell(
-                row=start_row_index, column=index + start_col_index, value=col_title
-            )
-            cell.style = "header"
-            col_name = get_column_letter(start_col_index + index)
-            column = ws.column_dimensions[col_name]
-            if column == start_column:
-                column.width = max(get_col_width(col_title, cell.font.sz), column.width)
-            else:
-                column.width = get_col_width(col_title, cell.font.sz)
+        append_row(
+            start_row_index,
+            [get_cell(col_title, style="header") for col_title in col_titles],
+        )
 
+        row_index = start_row_index + 1
         if row_titles:
-            for index, row_title in enumerate(row_titles):
-                cell = ws.cell(
-                    row=index + start_row_index + 1,
-                    column=start_col_index,
-                    value=row_title,
+            rows = zip_longest(row_titles, data.data, fillvalue=())
+        else:
+            rows = ((None, row) for row in data.data)
+        data_cols_count = 0
+        for row_title, row in rows:
+            cells = []
+            if row_titles:
+                cells.append(
+                    get_cell(row_title, style="header", alignment=row_title_alignment)
+                    if row_title is not None
+                    else None
                 )
-                cell.style = "header"
-                cell.alignment = Alignment(horizontal="left", vertical="center")
-
-                col_width = get_col_width(row_title, cell.font.sz)
-                if col_width > start_column.width:
-                    start_column.width = col_width
+            # Writing a cell is slow, the empty ones are left out.
+            data_cells = [
+                get_cell(value, style="colored", alignment=data_alignment)
+                if value is not None and value != ""
+                else None
+                for value in row
+            ]
+            data_cols_count = max(data_cols_count, len(data_cells))
+            append_row(row_index, cells, data_cells)
+            row_index += 1
+
+        if data_cols_count and row_index > start_row_index + 1:
+            data_start_col = start_col_index + (1 if row_titles else 0)
+            ws.conditional_formatting.add(
+                f"{get_cell_str(data_start_col, start_row_index + 1)}:"
+                f"{get_cell_str(data_start_col + data_cols_count - 1, row_index - 1)}",
+                Rule(
+                    type="expression",
+                    dxf=styles.colored_differential_style,
+                    formula=["TRUE"],
+                ),
+            )
 
-        start_data_col_index = start_col_index
-        if row_titles:
-            start_data_col_index += 1
-        for row_index, row in enumerate(data.data):
-            for col_index, value in enumerate(row):
-                cell = ws.cell(
-                    row=row_index + start_row_index + 1,
-                    column=col_index + start_data_col_index,
-                    value=value,
-                )
-                cell.style = "colored"
-                cell.alignment = Alignment(horizontal="center", vertical="center")
+        if remove_cells_borders:
+            for index in range(row_index, last_row_index):
+                append_row(index, [])
 
         export_timestamp = int(datetime.now().strftime("%Y%m%d%H%M%S"))
         filename = f"{slugify(sheet_title)}_{export_timestamp}.xlsx"
         tmp_file_path = os.path.join(get_tmp_root(), filename)
 
         saved = excel.save_workbook(wb, tmp_file_path)
+    except Exception:
+        # The export was interrupted, eg: by its progress callback, the rows
+        # already written to the temporary file of the sheet are discarded.
+        if ws is not None and ws._writer is not None and not ws.closed:
+            ws.close()
+            ws._writer.cleanup()
+        raise
     finally:
         if logo:
             logo.close()
@@ -362,6 +544,9 @@ def export_serializer_xlsx(
     This function creates a tmp .xlsx file based on the data provided and
     returns a result that has the tmp file path in it's instance attribute.
 
+    The querysets are read and serialized by chunks of XLSX_EXPORT_CHUNK_SIZE
+    objects while the file is written.
+
     :queryset:QuerySet:Data to be exported to excel file.
     :serializer_class:Serializer:Serializer model that is used to handle data.
     :header_title:str:The title that is displayed above the table.
@@ -377,15 +562,22 @@ def export_serializer_xlsx(
     empty_serializer = serializer_class()
     field_names = [field_name for field_name in empty_serializer.get_fields()]
     columns = [str(empty_serializer[field_name].label) for field_name in field_names]
-    serializer = serializer_class(instance=queryset, many=True, context=context or dict())
-    data_content = []
-    for data in serializer.data:
-        content = []
-        for field_name in field_names:
-            content.append(data.get(field_name, "---"))
-        data_content.append(content)
-
-    data = ExportDataType(col_titles=columns, data=data_content)
+
+    if isinstance(queryset, QuerySet):
+        queryset = prefetch_serializer_relations(queryset, serializer_class)
+        chunks = iter_queryset_chunks(queryset, lava_settings.XLSX_EXPORT_CHUNK_SIZE)
+    else:
+        chunks = [queryset]
+
+    def get_rows():
+        for chunk in chunks:
+            serializer = serializer_class(
+                instance=chunk, many=True, context=context or dict()
+            )
+            for data in serializer.data:
+                yield [data.get(field_name, "---") for field_name in field_names]
+
+    data = ExportDataType(col_titles=columns, data=get_rows())
     result = export_xlsx(
         data,
         header_title=header_title,
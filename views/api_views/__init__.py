@@ -3,7 +3,11 @@ from .group_api_views import GroupAPIViewSet
 from .user_api_views import UserAPIViewSet
 from .user_me_api_views import UserMeAPIView
 from .permissions_api_views import PermissionAPIViewSet
-from .import_export_views import ExportPermissions, ExportActivityJournal
+from .import_export_views import (
+    ExportPermissions,
+    ExportActivityJournal,
+    ExportJobAPIView,
+)
 from .log_entry_api_views import LogEntryAPIViewSet
 from .utility_apis import SettingsListAPI, ChoicesAPI, DashboardAPIViewSet
 from .backup_api_views import BackupAPIViewSet
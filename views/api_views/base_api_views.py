@@ -1,6 +1,7 @@
 from copy import deepcopy
 import importlib
 
+from django.http import StreamingHttpResponse
 from django.utils.translation import gettext_lazy as _
 
 from rest_framework import permissions, status
@@ -11,15 +12,21 @@ from rest_framework.fields import empty
 
 from drf_spectacular.utils import extend_schema
 
+from lava import settings as lava_settings
 from lava.enums import PermissionActionName
 from lava.messages import ACTION_NOT_ALLOWED
-from lava.pagination import LavaPageNumberPagination
+from lava.pagination import (
+    LavaPageNumberPagination,
+    get_cursor_pagination_class,
+    get_pagination_class,
+    stream_serialized_items,
+)
 from lava.serializers.serializers import BulkActionSerializer, ResultSerializer
 from lava.serializers import build_choices_serializer_class
 from lava.services.permissions import get_model_permission_class
+from lava.services.related_lookups import prefetch_serializer_relations
 from lava.services.class_permissions import ActionNotAllowed
 from lava.utils import Result
-from lava.pagination import get_pagination_class
 
 
 class BaseModelViewSet(ModelViewSet):
@@ -36,9 +43,31 @@ class BaseModelViewSet(ModelViewSet):
     delete_serializer_class = None
     view_excerpt_serializer_class = None
     page_size = None
+    # "page" (numbered pages) or "cursor" (keyset pagination, without counting
+    # the items), the client can choose with the `pagination` query parameter.
+    pagination_mode = "page"
+    # Select and prefetch the relations used by the serializer of the action.
+    optimize_related_lookups = True
 
     denied_actions = []
 
+    # Permission required by each action, in addition to `permission_classes`.
+    action_permissions = {
+        "create": PermissionActionName.Add,
+        "update": PermissionActionName.Change,
+        "partial_update": PermissionActionName.Change,
+        "destroy": PermissionActionName.SoftDelete,
+        "retrieve": PermissionActionName.View,
+        "view_excerpt": PermissionActionName.ViewExcerpt,
+        "list": PermissionActionName.List,
+        "choices": PermissionActionName.Choices,
+        "view_trash": PermissionActionName.ViewTrash,
+        "view_trash_item": PermissionActionName.ViewTrash,
+        "hard_delete": PermissionActionName.Delete,
+        "restore": PermissionActionName.Restore,
+        "duplicate": PermissionActionName.Duplicate,
+    }
+
     def __init__(self, *args, **kwargs):
 
         self.permission_classes = [permissions.IsAuthenticated]
@@ -47,10 +76,19 @@ class BaseModelViewSet(ModelViewSet):
 
     @property
     def paginator(self):
-        if self.page_size:
+        if self.get_pagination_mode() == "cursor":
+            self.pagination_class = get_cursor_pagination_class(self.page_size)
+        elif self.page_size:
             self.pagination_class = get_pagination_class(self.page_size)
         return super().paginator
 
+    def get_pagination_mode(self):
+        request = getattr(self, "request", None)
+        mode = request.GET.get("pagination") if request is not None else None
+        if mode in ("page", "cursor"):
+            return mode
+        return self.pagination_mode
+
     def get_override_field_values(self):
         """
         This function is used to override field values gotten from the API
@@ -62,9 +100,22 @@ class BaseModelViewSet(ModelViewSet):
         trash = getattr(self, "trash", False)
         user = getattr(self, "user", None)
         choices = getattr(self, "choices", False)
-        return ActiveModel.filter(
+        queryset = ActiveModel.filter(
             user=user, trash=trash, params=self.request.GET, choices=choices
         )
+        return self.optimize_queryset(queryset)
+
+    def optimize_queryset(self, queryset):
+        """
+        Selects and prefetches the relations used by the serializer of the
+        current action, see `get_related_lookups()`.
+        """
+        if not self.optimize_related_lookups:
+            return queryset
+        serializer_class = self.get_serializer_class()
+        if serializer_class is None:
+            return queryset
+        return prefetch_serializer_relations(queryset, serializer_class)
 
     def get_serializer_class(self):
         self.serializer_class = self.list_serializer_class or self.serializer_class
@@ -113,60 +164,14 @@ class BaseModelViewSet(ModelViewSet):
         return serializer_class or self.serializer_class
 
     def get_permissions(self):
-        # Reset self.permission_classes to avoid permission denied error
-        # on pages with valid perms.
-        permission_classes = self.permission_classes or []
+        # Copy self.permission_classes so that the permissions of an action are
+        # never added to the permissions of the following requests.
+        permission_classes = list(self.permission_classes or [])
 
-        ActiveModel = self.permissions_model or self.queryset.model
-
-        if self.action == "create":
-            permission_classes.append(
-                get_model_permission_class(ActiveModel, PermissionActionName.Add)
-            )
-        elif self.action in ["update", "partial_update"]:
-            permission_classes.append(
-                get_model_permission_class(ActiveModel, PermissionActionName.Change)
-            )
-        elif self.action == "destroy":
-            permission_classes.append(
-                get_model_permission_class(ActiveModel, PermissionActionName.SoftDelete)
-            )
-        elif self.action == "retrieve":
-            permission_classes.append(
-                get_model_permission_class(ActiveModel, PermissionActionName.View)
-            )
-        elif self.action == "view_excerpt":
-            permission_classes.append(
-                get_model_permission_class(
-                    ActiveModel, PermissionActionName.ViewExcerpt
-                )
-            )
-        elif self.action == "list":
-            permission_classes.append(
-                get_model_permission_class(ActiveModel, PermissionActionName.List)
-            )
-        elif self.action == "choices":
-            permission_classes.append(
-                get_model_permission_class(ActiveModel, PermissionActionName.Choices)
-            )
-        elif self.action in ["view_trash", "view_trash_item"]:
-            permission_classes.append(
-                get_model_permission_class(ActiveModel, PermissionActionName.ViewTrash)
-            )
-        elif self.action == "hard_delete":
-            permission_classes.append(
-                get_model_permission_class(ActiveModel, PermissionActionName.Delete)
-            )
-        elif self.action == "restore":
-            permission_classes.append(
-                get_model_permission_class(ActiveModel, PermissionActionName.Restore)
-            )
-        elif self.action == "duplicate":
-            permission_classes.append(
-                get_model_permission_class(ActiveModel, PermissionActionName.Duplicate)
-            )
-        # elif self.action == "metadata":
-        #     self.permission_classes = [permissions.AllowAny]
+        action = self.action_permissions.get(self.action)
+        if action is not None:
+            ActiveModel = self.permissions_model or self.queryset.model
+            permission_classes.append(get_model_permission_class(ActiveModel, action))
 
         return [permission() for permission in permission_classes]
 
@@ -179,18 +184,27 @@ class BaseModelViewSet(ModelViewSet):
 
         self.user = request.user
         if request.GET.get("page_size", None) == "all":
-            qset = self.get_queryset()
-            serializer = self.get_serializer(qset, many=True)
-            return Response(
-                {
-                    "count": len(serializer.data),
-                    "next": None,
-                    "previous": None,
-                    "results": serializer.data,
-                }
-            )
+            return self.stream_list(request)
         return super().list(request, *args, **kwargs)
 
+    def stream_list(self, request):
+        """
+        Streams all the items of the list, serialized by chunks of
+        STREAMING_LIST_CHUNK_SIZE items and limited to STREAMING_LIST_MAX_ROWS
+        items. The items are sent as a JSON document, or as JSON lines when the
+        `stream_format` query parameter is `ndjson`.
+        """
+        ndjson = request.GET.get("stream_format") == "ndjson"
+        content = stream_serialized_items(
+            self.filter_queryset(self.get_queryset()),
+            lambda items: self.get_serializer(items, many=True).data,
+            chunk_size=lava_settings.STREAMING_LIST_CHUNK_SIZE,
+            max_rows=lava_settings.STREAMING_LIST_MAX_ROWS,
+            ndjson=ndjson,
+        )
+        content_type = "application/x-ndjson" if ndjson else "application/json"
+        return StreamingHttpResponse(content, content_type=content_type)
+
     @action(detail=False, methods=["GET"])
     def choices(self, request, *args, **kwargs):
         if "choices" in self.denied_actions:
@@ -28,9 +28,10 @@ class ChatAPIViewSet(BaseModelViewSet):
     def get_queryset(self):
         user = getattr(self, "user", None)
         trash = getattr(self, "trash", False)
-        return Conversation.get_user_conversations(
+        queryset = Conversation.get_user_conversations(
             user=user, trash=trash, params=self.request.GET
         )
+        return self.optimize_queryset(queryset)
 
     def get_permissions(self):
         if self.action == "mark_as_read":
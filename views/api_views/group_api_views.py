@@ -15,11 +15,7 @@ class GroupAPIViewSet(BaseModelViewSet):
 
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = GroupListSerializer
+    retrieve_serializer_class = GroupGetSerializer
+    create_serializer_class = GroupCreateUpdateSerializer
+    update_serializer_class = GroupCreateUpdateSerializer
     queryset = Group.objects.none()
-
-    def get_serializer(self, *args, **kwargs):
-        if self.action == "retrieve":
-            self.serializer_class = GroupGetSerializer
-        elif self.action in ["create", "update", "partial_update"]:
-            self.serializer_class = GroupCreateUpdateSerializer
-        return super().get_serializer(*args, **kwargs)
@@ -5,8 +5,12 @@ from rest_framework import permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
+from lava import settings as lava_settings
+from lava.models import ExportJob
+from lava.serializers import ExportJobSerializer
 from lava.services import class_permissions as lava_permissions
 from lava.services import import_export
+from lava.utils import strtobool
 
 
 class ExportPermissions(APIView):
@@ -47,6 +51,23 @@ class ExportActivityJournal(APIView):
 
     def get(self, request, *args, **kwargs):
 
+        # Large journals are exported by a background job, the user is notified
+        # once the file is ready.
+        max_rows = lava_settings.ACTIVITY_JOURNAL_SYNC_EXPORT_MAX_ROWS
+        background = strtobool(request.query_params.get("background", "false"))
+        if background or (
+            max_rows is not None
+            and import_export.get_activity_journal()[max_rows:].exists()
+        ):
+            job = ExportJob(user=request.user, export_type="activity_journal")
+            result = job.start()
+            if result.is_error:
+                return Response(result.to_dict(), status=status.HTTP_400_BAD_REQUEST)
+            return Response(
+                {**result.to_dict(), "job": ExportJobSerializer(job).data},
+                status=status.HTTP_202_ACCEPTED,
+            )
+
         result = import_export.export_activity_journal()
         if result.is_error:
             return Response(result.to_dict(), status=status.HTTP_400_BAD_REQUEST)
@@ -59,3 +80,19 @@ class ExportActivityJournal(APIView):
             response["content-disposition"] = f"attachment; filename=activities.xlsx"
 
             return response
+
+
+class ExportJobAPIView(APIView):
+    """Returns the status and the progress of an export job of the user."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        job = ExportJob.objects.filter(pk=pk, user=request.user).first()
+        if job is None:
+            return Response(
+                {"detail": _("Export job not found.")},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        job.fail_if_stale()
+        return Response(ExportJobSerializer(job).data)
@@ -3,6 +3,7 @@ from django.utils.translation import gettext_lazy as _
 from lava.serializers.log_entry_serializer import LogEntrySerializer
 from lava.models.models import LogEntry
 from lava.services import class_permissions as lava_permissions
+from lava.services.log_entry_archive import LogEntrySearchResults
 from lava.views.api_views.base_api_views import ReadOnlyBaseModelViewSet
 
 
@@ -11,3 +12,15 @@ class LogEntryAPIViewSet(ReadOnlyBaseModelViewSet):
     permission_classes = [lava_permissions.CanListLogEntry]
     serializer_class = LogEntrySerializer
     queryset = LogEntry.objects.none()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        self.reaches_archives = isinstance(queryset, LogEntrySearchResults)
+        return queryset
+
+    def get_pagination_mode(self):
+        # The archived entries can not be selected by keyset, the searches that
+        # reach into the archives are paginated by page.
+        if getattr(self, "reaches_archives", False):
+            return "page"
+        return super().get_pagination_mode()
@@ -1,4 +1,6 @@
+import asyncio
 import json
+import logging
 
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
@@ -6,15 +8,62 @@ from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 
+from lava import settings as lava_settings
 from lava.models.chat_models import ChatMessage, Conversation
 from lava.models.models import Notification, Group, NotificationGroup
+from lava.services.subscription_cache import get_user_subscriptions
 from lava.utils import Result
 from channels.layers import get_channel_layer
 
 
+class ReadReceiptsBuffer:
+    """
+    Coalesces the read receipts sent by a WebSocket client: the ids added within
+    `delay` seconds are passed at once to the `write` coroutine.
+    """
+
+    def __init__(self, write, delay):
+        self.write = write
+        self.delay = delay
+        self.ids = []
+        self._task = None
+
+    def add(self, object_id):
+        if object_id not in self.ids:
+            self.ids.append(object_id)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        self._task = None
+        await self.flush()
+
+    async def flush(self):
+        ids, self.ids = self.ids, []
+        if not ids:
+            return
+        # The flush task is never awaited, its errors would not be reported.
+        try:
+            await self.write(ids)
+        except Exception as e:
+            logging.error(f"Read receipts {ids} could not be written: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
 class BaseConsumer(AsyncWebsocketConsumer):
     async def prepare_connection(self):
         self.user = self.scope["user"]
+        self.group_names = set()
+        self.disconnected = False
+        self.read_receipts = ReadReceiptsBuffer(
+            self.write_read_receipts, delay=lava_settings.WS_READ_RECEIPTS_DELAY
+        )
 
         headers = self.scope["headers"]
         media_protocol = "https" if settings.DEBUG is False else "http"
@@ -24,69 +73,99 @@ class BaseConsumer(AsyncWebsocketConsumer):
             if key.decode() == "host":
                 self.base_url = f"{media_protocol}://{value.decode()}"
 
-        user_groups = await database_sync_to_async(list)(
-            NotificationGroup.objects.filter(user=self.user)
-        )
-
+        # Cached when SUBSCRIPTION_CACHE_ENABLED, no queries are made when the
+        # user reconnects.
         self.user_group_name = f"user_{self.user.id}"
-        await self.channel_layer.group_add(self.user_group_name, self.channel_name)
+        await self.load_subscriptions()
+
+    async def load_subscriptions(self, refresh=False):
+        """
+        Subscribes the channel to the user's groups, `refresh` queries them
+        again instead of reading them from the cache.
+        """
+        self.subscriptions = await database_sync_to_async(get_user_subscriptions)(
+            self.user, refresh=refresh
+        )
+        self.user_notification_group_names = [
+            f"user_group_{group_id}"
+            for group_id in self.subscriptions["notification_groups"]
+        ]
+        await self.subscribe(
+            [self.user_group_name, *self.user_notification_group_names]
+        )
 
-        setattr(
-            self,
-            f"user_notification_group_names",
-            [f"user_group_{group.id}" for group in user_groups],
+    async def subscribe(self, group_names):
+        """Adds the channel to the given groups concurrently."""
+        group_names = [name for name in group_names if name not in self.group_names]
+        self.group_names.update(group_names)
+        await asyncio.gather(
+            *[
+                self.channel_layer.group_add(group_name, self.channel_name)
+                for group_name in group_names
+            ]
         )
-        for user_group in user_groups:
-            await self.channel_layer.group_add(
-                f"user_group_{user_group.id}", self.channel_name
-            )
 
     async def connect(self):
         await self.prepare_connection()
         await self.accept()
 
-    async def disconnect(self, close_code):
-        # Clean up
-        client_groups = getattr(self, "user_groups_names", [])
-        for group_name in client_groups:
-            await self.channel_layer.group_discard(group_name, self.channel_name)
+    async def write_read_receipts(self, object_ids):
+        pass
 
-        await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+    async def send_error(self, message):
+        await self.send(
+            text_data=json.dumps(
+                {"action": "error_message", "error": Result.error(message).to_dict()}
+            )
+        )
 
-        for notification_id in self.user_notification_group_names:
-            await self.channel_layer.group_discard(notification_id, self.channel_name)
+    async def disconnect(self, close_code):
+        # Clean up, the pending read receipts are written without acknowledging
+        # them.
+        self.disconnected = True
+        read_receipts = getattr(self, "read_receipts", None)
+        if read_receipts is not None:
+            await read_receipts.close()
+
+        await asyncio.gather(
+            *[
+                self.channel_layer.group_discard(group_name, self.channel_name)
+                for group_name in getattr(self, "group_names", [])
+            ]
+        )
 
 
 class ChatConsumer(BaseConsumer):
     async def connect(self):
         await super().prepare_connection()
         conversation_id = self.scope["url_route"]["kwargs"].get("conversation_id", 0)
+        self.conversation = None
         if conversation_id:
-            self.conversation = await database_sync_to_async(
-                lambda: Conversation.objects.get(pk=conversation_id)
-            )()
-            members = await database_sync_to_async(list)(
-                self.conversation.get_members()
-            )
-            if self.user not in members:
+            if conversation_id not in self.subscriptions["conversations"]:
+                # The conversation may have been joined in another process,
+                # whose changes do not invalidate a local cache.
+                await self.load_subscriptions(refresh=True)
+            if conversation_id not in self.subscriptions["conversations"]:
                 return await self.close()
 
+            self.conversation_id = conversation_id
             self.conversation_group_name = f"conversation_{conversation_id}"
-            await self.channel_layer.group_add(
-                self.conversation_group_name, self.channel_name
-            )
 
-        user_conversations = await database_sync_to_async(list)(
-            Conversation.get_user_conversations(self.user).exclude(id=conversation_id)
+        await self.subscribe(
+            [
+                f"conversation_{conversation_id}"
+                for conversation_id in self.subscriptions["conversations"]
+            ]
         )
-
-        for conversation in user_conversations:
-            conversation_group_name = f"conversation_{conversation.id}"
-            await self.channel_layer.group_add(
-                conversation_group_name, self.channel_name
-            )
         await self.accept()
 
+    async def get_conversation(self):
+        if self.conversation is None:
+            self.conversation = await database_sync_to_async(
+                Conversation.objects.get
+            )(pk=self.conversation_id)
+        return self.conversation
+
     async def receive(self, text_data):
         if not text_data:
             return
@@ -104,22 +183,26 @@ class ChatConsumer(BaseConsumer):
             sender=user,
             type=data.get("type", ""),
             text=data.get("text", ""),
-            conversation=self.conversation,
+            conversation=await self.get_conversation(),
         )
         image = data.get("image", None)
         result = await database_sync_to_async(message.create)(
             user=user, file_fields=(("image", image),) if image else None
         )
         if result.is_error:
-            await self.send({"type": "error_message", "error": result.to_dict()})
+            await self.send(
+                text_data=json.dumps(
+                    {"action": "error_message", "error": result.to_dict()}
+                )
+            )
             return
 
+        # The frame is encoded once here, the consumers of the conversation
+        # members forward it as is.
         avatar = message.sender.photo.url if message.sender.photo else None
-        await self.channel_layer.group_send(
-            self.conversation_group_name,
+        text_data = json.dumps(
             {
-                "type": "chat_message",
-                "conversation_id": self.conversation.id,
+                "action": "chat_message",
                 "message": {
                     "id": message.id,
                     "image": self.base_url + image if image else "",
@@ -133,33 +216,57 @@ class ChatConsumer(BaseConsumer):
                     "created_at": message.created_at.strftime("%Y-%m-%d %H:%M:%S %z"),
                     "conversation": self.conversation.id,
                 },
+            }
+        )
+        await self.channel_layer.group_send(
+            self.conversation_group_name,
+            {
+                "type": "chat_message",
+                "conversation_id": self.conversation.id,
+                "text_data": text_data,
             },
         )
 
     async def mark_as_read(self, data):
         try:
-            message_id = data["message_id"]
-            message = ChatMessage.objects.get(id=message_id)
-            message.mark_as_read(self.user)
-            await self.send(
-                text_data=json.dumps(
-                    {"action": "message_read", "message_id": message_id}
+            self.read_receipts.add(int(data["message_id"]))
+        except (KeyError, TypeError, ValueError):
+            await self.send_error(_("Message ID is not valid!"))
+
+    def mark_messages_as_read(self, message_ids):
+        messages = ChatMessage.objects.filter(
+            pk__in=message_ids, conversation__in=self.subscriptions["conversations"]
+        )
+        read_ids = set(messages.values_list("pk", flat=True))
+        if read_ids:
+            ChatMessage.mark_as_read_bulk(messages, self.user)
+        return read_ids
+
+    async def write_read_receipts(self, message_ids):
+        read_ids = await database_sync_to_async(self.mark_messages_as_read)(
+            message_ids
+        )
+        if self.disconnected:
+            return
+
+        for message_id in message_ids:
+            if message_id in read_ids:
+                await self.send(
+                    text_data=json.dumps(
+                        {"action": "message_read", "message_id": message_id}
+                    )
                 )
-            )
-        except ChatMessage.DoesNotExist:
-            await self.send(
-                {
-                    "type": "error_message",
-                    "error": Result.error(_("Message ID is not valid!")),
-                }
-            )
+            else:
+                await self.send_error(_("Message ID is not valid!"))
 
     async def chat_message(self, event):
-        await self.send(
-            text_data=json.dumps(
+        text_data = event.get("text_data")
+        if text_data is None:
+            # Sent by a process that does not pre-encode the messages yet.
+            text_data = json.dumps(
                 {"action": "chat_message", "message": event["message"]}
             )
-        )
+        await self.send(text_data=text_data)
 
     async def error_message(self, event):
         error = event["error"]
@@ -171,13 +278,10 @@ class ChatConsumer(BaseConsumer):
 class NotificationConsumer(BaseConsumer):
     async def connect(self):
         await super().prepare_connection()
-        user_groups = await database_sync_to_async(list)(self.user.groups.all())
-
-        self.user_groups_names = []
-        for group in user_groups:
-            user_group_name = f"user_group_{group.id}"
-            await self.channel_layer.group_add(user_group_name, self.channel_name)
-            self.user_groups_names.append(user_group_name)
+        self.user_groups_names = [
+            f"user_group_{group_id}" for group_id in self.subscriptions["groups"]
+        ]
+        await self.subscribe(self.user_groups_names)
         await self.accept()
 
     async def receive(self, text_data):
@@ -191,22 +295,37 @@ class NotificationConsumer(BaseConsumer):
             await self.mark_as_read(data)
 
     async def mark_as_read(self, data):
-        notification_id = data["notification_id"]
         try:
-            notification = Notification.objects.get(id=notification_id)
-            notification.mark_as_read(self.user)
-            await self.send(
-                text_data=json.dumps(
-                    {"action": "notification_read", "notification_id": notification_id}
+            self.read_receipts.add(int(data["notification_id"]))
+        except (KeyError, TypeError, ValueError):
+            await self.send_error(_("Notification ID is not valid!"))
+
+    def mark_notifications_as_read(self, notification_ids):
+        notifications = Notification.objects.filter(pk__in=notification_ids)
+        read_ids = set(notifications.values_list("pk", flat=True))
+        if read_ids:
+            Notification.mark_as_read_bulk(notifications, self.user)
+        return read_ids
+
+    async def write_read_receipts(self, notification_ids):
+        read_ids = await database_sync_to_async(self.mark_notifications_as_read)(
+            notification_ids
+        )
+        if self.disconnected:
+            return
+
+        for notification_id in notification_ids:
+            if notification_id in read_ids:
+                await self.send(
+                    text_data=json.dumps(
+                        {
+                            "action": "notification_read",
+                            "notification_id": notification_id,
+                        }
+                    )
                 )
-            )
-        except Notification.DoesNotExist:
-            await self.send(
-                {
-                    "type": "error_message",
-                    "error": Result.error(_("Notification ID is not valid!")),
-                }
-            )
+            else:
+                await self.send_error(_("Notification ID is not valid!"))
 
     async def send_notification(self, event):
         data = event["message"]
@@ -238,13 +357,10 @@ class NotificationConsumer(BaseConsumer):
 class BackUpConsumer(BaseConsumer):
     async def connect(self):
         await super().prepare_connection()
-        user_groups = await database_sync_to_async(list)(self.user.groups.all())
-
-        self.user_groups_names = []
-        for group in user_groups:
-            user_group_name = f"user_group_{group.id}"
-            await self.channel_layer.group_add(user_group_name, self.channel_name)
-            self.user_groups_names.append(user_group_name)
+        self.user_groups_names = [
+            f"user_group_{group_id}" for group_id in self.subscriptions["groups"]
+        ]
+        await self.subscribe(self.user_groups_names)
         await self.accept()
 
     async def send_notification(self, event):
@@ -1,75 +1,112 @@
 import asyncio
+import logging
 from datetime import datetime
 
+from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
 from lava.utils import humanize_datetime, guess_protocol
-from lava.settings import HOST
+from lava.settings import HOST, WS_FANOUT_CONCURRENCY
+
+
+def get_target_group_names(target_users=None, target_groups=None):
+    """
+    Returns the names of the channel layer groups to send a message to, the
+    users who are members of a target group are skipped as they receive the
+    message through their group.
+    """
+    from lava.models.models import NotificationGroup
+
+    target_groups = target_groups or []
+    group_names = {f"user_group_{group.id}" for group in target_groups}
+
+    user_ids = {user.id for user in target_users or []}
+    if user_ids and target_groups:
+        user_ids -= set(
+            NotificationGroup.objects.filter(
+                pk__in=[group.id for group in target_groups], user__in=user_ids
+            ).values_list("user", flat=True)
+        )
+    group_names.update(f"user_{user_id}" for user_id in user_ids)
+    return sorted(group_names)
+
+
+async def send_message_to_groups(message, group_names, concurrency=None):
+    """
+    Sends a message to the given channel layer groups concurrently, at most
+    `concurrency` sends are awaited at the same time.
+    Returns the groups that could not be reached: {"<group_name>": <exception>}
+    """
+    channel_layer = get_channel_layer()
+    semaphore = asyncio.Semaphore(concurrency or WS_FANOUT_CONCURRENCY)
+
+    async def send(group_name):
+        async with semaphore:
+            await channel_layer.group_send(group_name, message)
+
+    results = await asyncio.gather(
+        *[send(group_name) for group_name in group_names], return_exceptions=True
+    )
+    failures = {
+        group_name: result
+        for group_name, result in zip(group_names, results)
+        if isinstance(result, Exception)
+    }
+    for group_name, exception in failures.items():
+        logging.warning(f"Could not send message to group {group_name}: {exception}")
+    return failures
 
 
 async def send_message_to_clients(
     message, alias="default", target_users=None, target_groups=None
 ):
-    """Send a message to a specific WebSocket clients."""
-    channel_layer = get_channel_layer()
+    """
+    Send a message to a specific WebSocket clients.
+    Returns the groups that could not be reached, see `send_message_to_groups`.
+    """
+    group_names = [
+        *[f"user_group_{group.id}" for group in target_groups or []],
+        *[f"user_{user.id}" for user in target_users or []],
+    ]
+    return await send_message_to_groups(message, list(dict.fromkeys(group_names)))
+
 
-    if target_groups:
-        group_name_prefix = "user_group_"
-        for group in target_groups:
-            try:
-                await channel_layer.group_send(
-                    f"{group_name_prefix}{group.id}", message
-                )
-            except Exception:
-                pass
-
-    if target_users:
-        group_name_prefix = "user_"
-        for user in target_users:
-            try:
-                await channel_layer.group_send(f"{group_name_prefix}{user.id}", message)
-            except Exception:
-                pass
-
-
-def send_ws_notification(instance, target_groups, target_users):
+def send_ws_notification(instance, target_groups, target_users, group_names=None):
     """
-    Send a notification via WebSocket to the target users and groups
+    Send a notification via WebSocket to the target users and groups.
+    `group_names` replaces the channel layer groups of the targets, eg: the
+    ones a previous attempt could not reach.
+    Returns the groups that could not be reached, see `send_message_to_groups`.
     """
+    if group_names is None:
+        group_names = get_target_group_names(target_users, target_groups)
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
     photo = ""
     if instance.sender and instance.sender.photo:
         photo = f"{guess_protocol()}://{HOST}{instance.sender.photo.url}"
 
-    loop.run_until_complete(
-        send_message_to_clients(
-            message={
-                "type": "send_notification",
-                "message": {
-                    "timestamp": datetime.now().timestamp().as_integer_ratio()[0],
-                    "title": str(instance.title),
-                    "sender": {
-                        "id": instance.sender.id,
-                        "first_name": instance.sender.first_name,
-                        "last_name": instance.sender.last_name,
-                        "photo": photo,
-                    }
-                    if instance.sender
-                    else None,
-                    "date": humanize_datetime(instance.date),
-                    "content": str(instance.content),
-                    "category": instance.category,
-                    "url": instance.url,
-                },
+    return async_to_sync(send_message_to_groups)(
+        message={
+            "type": "send_notification",
+            "message": {
+                "timestamp": datetime.now().timestamp().as_integer_ratio()[0],
+                "title": str(instance.title),
+                "sender": {
+                    "id": instance.sender.id,
+                    "first_name": instance.sender.first_name,
+                    "last_name": instance.sender.last_name,
+                    "photo": photo,
+                }
+                if instance.sender
+                else None,
+                "date": humanize_datetime(instance.date),
+                "content": str(instance.content),
+                "category": instance.category,
+                "url": instance.url,
             },
-            alias="notification",
-            target_users=target_users,
-            target_groups=target_groups,
-        )
+        },
+        group_names=group_names,
     )
-    loop.close()
 
 
 def send_ws_backup_status(instance):
@@ -77,19 +114,14 @@ def send_ws_backup_status(instance):
     Send initiated backup status via WebSocket to the target users and groups
     """
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(
-        send_message_to_clients(
-            message={
-                "type": "send_backup_status",
-                "backup": {
-                    "id": instance.id,
-                    "status": instance.status,
-                },
+    return async_to_sync(send_message_to_clients)(
+        message={
+            "type": "send_backup_status",
+            "backup": {
+                "id": instance.id,
+                "status": instance.status,
             },
-            alias="backup",
-            target_users=[instance.created_by],
-        )
+        },
+        alias="backup",
+        target_users=[instance.created_by],
     )
-    loop.close()